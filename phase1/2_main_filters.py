@@ -26,7 +26,7 @@ Phase 1: The noise reduction filters.
 
 import os
 
-from helpers.loadsave import get_data_scans, create_dir, save_data_pickle
+from helpers.loadsave import get_data_scans, create_dir, save_data_pickle, build_catalog, get_datasetnames
 from modules.add_noise import *
 from modules.calc_filters import *
 
@@ -39,7 +39,8 @@ RESULTS_IMG_PATH = os.path.join(RESULTS_PATH, 'results_filters_img')
 
 def main():
     # load the original 3D image and show this in a dataset
-    folders = [f for f in os.listdir(DATA_PATH) if os.path.isdir(os.path.join(DATA_PATH, f))]
+    catalog = build_catalog(DATA_PATH)
+    folders = get_datasetnames(catalog)
     datasets = get_data_scans(DATA_PATH, folders)
 
     print('Create directories')
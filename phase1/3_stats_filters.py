@@ -35,11 +35,15 @@ RESULTS_PATH = 'results_filters'
 RESULTS_IMG_PATH = os.path.join(RESULTS_PATH, 'results_filters_img')
 RESULTS_STATS_PATH = os.path.join(RESULTS_PATH, 'results_filters_stats')
 
+# compute the per-slice MSE profiles along the three axes as well
+SLICE_PROFILES = True
+
 
 def main():
     # load the original, ground truth, and filtered 3D images
     # and show this in a dataset
-    folders = [f for f in os.listdir(DATA_PATH) if os.path.isdir(os.path.join(DATA_PATH, f))]
+    catalog = build_catalog(DATA_PATH)
+    folders = get_datasetnames(catalog)
     filternames = get_filternames(RESULTS_IMG_PATH)
     datasets = get_data_filters(DATA_PATH, RESULTS_IMG_PATH, folders, filternames)
 
@@ -53,6 +57,8 @@ def main():
     results_ssim = {}
     results_psnr = {}
 
+    results_profiles = {}
+
     for filter in filternames:
         results_mse[filter] = []
         results_ssim[filter] = []
@@ -67,6 +73,7 @@ def main():
         imgOrg = values['org']
         # imgGT = values['gt']
         imgFilters = values['filters']
+        results_profiles[dataset] = {}
 
         # calculate and save results
         for filtername, filter in imgFilters.items():
@@ -75,6 +82,9 @@ def main():
             psnr = calc_psnr(imgOrg, filter)
             print(filtername, mse, ssim, psnr)
 
+            if SLICE_PROFILES == True:
+                results_profiles[dataset][filtername] = {'MSE': calc_mse_profile(imgOrg, filter)}
+
             for f in filternames:
                 if filtername == f:
                     results_mse[f].append(mse)
@@ -85,6 +95,10 @@ def main():
     results_pickle = {'MSE': results_mse, 'SSIM': results_ssim,'PSNR': results_psnr}
     save_dict_pickle(PATH = RESULTS_STATS_PATH, data= results_pickle, filename='results_pickle')
 
+    # save the per-slice profiles: {dataset: {filter: {'MSE': (axis0, axis1, axis2)}}}
+    if SLICE_PROFILES == True:
+        save_dict_pickle(PATH = RESULTS_STATS_PATH, data= results_profiles, filename='results_profiles')
+
     # save all results with mean and standard deviation
     results = [('MSE:', results_mse), ('SSIM:', results_ssim), ('PSNR:', results_psnr)]
     show_results(results)
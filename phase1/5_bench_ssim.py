@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the noise reduction filters.
+# You can run this main file to benchmark the SSIM engines on the cropped
+# datasets, namely the runtime and the peak memory.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 1: The noise reduction filters.
+- Benchmark of the structural similarity index measure (SSIM):
+  skimage (float64) versus the uniform window engine (float32)
+"""
+
+import os
+import time
+import tracemalloc
+
+from helpers.loadsave import get_data_scans, create_dir, build_catalog, get_datasetnames
+from modules.add_noise import *
+from modules.calc_statistics import calc_ssim, calc_ssim_skimage
+
+
+# Constants
+DATA_PATH = '../datasets/'
+RESULTS_PATH = 'results_filters'
+RESULTS_BENCH_PATH = os.path.join(RESULTS_PATH, 'results_filters_bench')
+
+# the number of threads of the parallel mode
+WORKERS = os.cpu_count()
+
+
+def measure(function, *args, **kwargs):
+    """ Measure the runtime (sec) and the peak memory (MB) of a function. """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    runtime = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1024. ** 2
+    tracemalloc.stop()
+    return result, runtime, peak
+
+
+def main():
+    # load the original 3D images and show this in a dataset
+    catalog = build_catalog(DATA_PATH)
+    folders = get_datasetnames(catalog)
+    datasets = get_data_scans(DATA_PATH, folders)
+
+    print('Create directories')
+    create_dir(RESULTS_PATH)
+    create_dir(RESULTS_BENCH_PATH)
+
+    engines = [('skimage', calc_ssim_skimage, {}),
+               ('uniform', calc_ssim, {'workers': 1}),
+               ('uniform_' + str(WORKERS) + 'threads', calc_ssim, {'workers': WORKERS})]
+
+    with open(RESULTS_BENCH_PATH + '/bench_ssim.txt', 'w') as file:
+        file.write("dataset shape engine ssim runtime(sec) peak(MB) difference\n")
+
+        # iterate over datasets dictionary
+        for key, value in datasets.items():
+            # compare the original image with the speckled image
+            img_org = sitk.GetArrayFromImage(value['org'])
+            img_speckle = sitk.GetArrayFromImage(add_specklenoise(value['org'], std = 0.2))
+
+            reference = None
+            for name, function, kwargs in engines:
+                ssim, runtime, peak = measure(function, img_org, img_speckle, **kwargs)
+                if reference is None:
+                    reference = ssim
+                line = "%s %s %s %.6f %.3f %.1f %.2e" %(key, 'x'.join(str(s) for s in img_org.shape),
+                                                      name, ssim, runtime, peak, abs(ssim - reference))
+                print(line)
+                file.write(line + "\n")
+
+    print('results saved in:' + RESULTS_BENCH_PATH + '/bench_ssim.txt')
+
+
+if __name__ == '__main__':
+    main()
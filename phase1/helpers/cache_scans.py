@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the noise reduction filters.
+# You can run this file to cache the decoded DICOM series, so every series
+# is decoded only once over all the phases.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 1: The noise reduction filters.
+- Cache of the decoded DICOM series (.npy volume + .pkl metadata)
+"""
+
+import os
+import hashlib
+import pickle
+import numpy as np
+import SimpleITK as sitk
+
+
+# Constants
+# the cache is shared by all phases: <repository>/cache/scans
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'cache', 'scans')
+USE_CACHE = True
+
+
+def get_cachename(pathDicom):
+    """ The filename of the cache of a DICOM directory, e.g.
+        dataset1_crop_org_<hash>, with the hash of the absolute path. """
+    path = os.path.abspath(pathDicom)
+    parts = os.path.normpath(path).split(os.sep)[-2:]
+    digest = hashlib.md5(path.encode('utf-8')).hexdigest()[:8]
+    return '_'.join(parts + [digest])
+
+def get_signature(pathDicom):
+    """ The signature of a DICOM directory: the names, sizes and
+        modification times of the files. Only the directory is read. """
+    signature = []
+    for entry in sorted(os.scandir(pathDicom), key=lambda e: e.name):
+        if entry.is_file():
+            stat = entry.stat()
+            signature.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    return signature
+
+def load_cache(pathDicom, as_array=False):
+    """ Load a decoded DICOM series from the cache.
+        Output: the sitk image (or numpy array when as_array is True),
+        or None when the series is not cached or the files have changed.
+    """
+    if USE_CACHE == False:
+        return None
+
+    filename = os.path.join(CACHE_PATH, get_cachename(pathDicom))
+    try:
+        with open(filename + '.pkl', 'rb') as f:
+            metadata = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+    if metadata['signature'] != get_signature(pathDicom):
+        return None
+
+    array = np.load(filename + '.npy')
+    if as_array == True:
+        return array
+
+    img = sitk.GetImageFromArray(array, isVector=metadata['components'] > 1)
+    img.SetSpacing(metadata['spacing'])
+    img.SetOrigin(metadata['origin'])
+    img.SetDirection(metadata['direction'])
+    return img
+
+def save_cache(pathDicom, img):
+    """ Save a decoded DICOM series (sitk image) in the cache.
+        The files are first written under a temporary name (per process),
+        so an interrupted run never leaves a half written cache behind and
+        runs which fill the cache at the same time do not mix their files. """
+    if USE_CACHE == False:
+        return
+
+    os.makedirs(CACHE_PATH, exist_ok=True)
+    filename = os.path.join(CACHE_PATH, get_cachename(pathDicom))
+    metadata = {'signature': get_signature(pathDicom),
+                'spacing': img.GetSpacing(),
+                'origin': img.GetOrigin(),
+                'direction': img.GetDirection(),
+                'components': img.GetNumberOfComponentsPerPixel()}
+
+    # the volume before the metadata: valid metadata implies a valid volume
+    temporary = filename + '.' + str(os.getpid()) + '.tmp'
+    with open(temporary + '.npy', 'wb') as f:
+        np.save(f, sitk.GetArrayViewFromImage(img))
+    os.replace(temporary + '.npy', filename + '.npy')
+    with open(temporary + '.pkl', 'wb') as f:
+        pickle.dump(metadata, f)
+    os.replace(temporary + '.pkl', filename + '.pkl')
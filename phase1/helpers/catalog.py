@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the noise reduction filters.
+# You can run this file to build the catalog of the datasets from the DICOM
+# headers only, so no pixel data is decoded.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 1: The noise reduction filters.
+- Catalog of the datasets: datasets/*/{crop_org, crop_gt, real_org}
+"""
+
+import os
+import hashlib
+import pickle
+import numpy as np
+import SimpleITK as sitk
+
+from helpers.cache_scans import CACHE_PATH, get_signature
+
+
+# Constants
+CATALOG_PATH = os.path.join(CACHE_PATH, '..', 'catalog.pkl')
+SERIES = ['crop_org', 'crop_gt', 'real_org']
+
+
+def read_header(filename):
+    """ Read the image information of one DICOM file without the pixel data. """
+    reader = sitk.ImageFileReader()
+    reader.SetFileName(filename)
+    reader.ReadImageInformation()
+    return reader
+
+def calc_checksum(filenames):
+    """ Calculate the MD5 checksum over the bytes of the files. """
+    checksum = hashlib.md5()
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                checksum.update(block)
+    return checksum.hexdigest()
+
+def read_series(path, signature):
+    """ Read the headers of a series (crop_org, crop_gt) or of a multi-frame
+        file (real_org) and summarise them.
+        Output: dictionary with the files, dimensions (x,y,z), spacing,
+        origin, orientation, dtype, number of bytes and checksum. The list
+        of files is empty when the directory does not contain DICOM files.
+    """
+    filenames = []
+    if len(signature) > 0:
+        filenames = list(sitk.ImageSeriesReader.GetGDCMSeriesFileNames(path))
+    if len(filenames) == 0:
+        # a single (multi-frame) file is not seen as a series by GDCM
+        filenames = [os.path.join(path, name) for name, size, mtime in signature if name.endswith('.dcm')]
+    if len(filenames) == 0:
+        return {'files': [], 'signature': signature}
+
+    first = read_header(filenames[0])
+    size = list(first.GetSize()) + [1] * (3 - first.GetDimension())
+    spacing = list(first.GetSpacing()) + [1.] * (3 - first.GetDimension())
+    origin = list(first.GetOrigin()) + [0.] * (3 - first.GetDimension())
+
+    if len(filenames) > 1:
+        # one slice per file: the slices are stacked in the z direction
+        size[2] = len(filenames)
+        distance = np.linalg.norm(np.subtract(read_header(filenames[1]).GetOrigin(), first.GetOrigin()))
+        if distance > 0:
+            spacing[2] = float(distance)
+
+    # the numpy datatype of the pixels
+    components = first.GetNumberOfComponents()
+    dtype = sitk.GetArrayViewFromImage(sitk.Image([1, 1], first.GetPixelID(), components)).dtype
+
+    series = {'files': [os.path.basename(f) for f in filenames],
+              'signature': signature,
+              'dims': tuple(size),
+              'spacing': tuple(spacing),
+              'origin': tuple(origin),
+              'direction': tuple(first.GetDirection()),
+              'dtype': dtype.name,
+              'components': components,
+              'nbytes': int(np.prod(size)) * components * dtype.itemsize,
+              'filesize': sum(s for name, s, mtime in signature),
+              'checksum': calc_checksum(filenames)}
+    return series
+
+def load_catalog(PATH=CATALOG_PATH):
+    """ Load the catalog using pickle. """
+    try:
+        with open(PATH, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {'root': None, 'datasets': {}}
+
+def build_catalog(rootdir, PATH=CATALOG_PATH):
+    """ Build the catalog of all datasets in the root directory.
+        The catalog is rebuilt incrementally: only the series of which the
+        signature (names, sizes and mtimes of the files) has changed are
+        read again, and removed datasets are dropped.
+        Output: the catalog {'root', 'datasets': {dataset: {series: info}}}.
+    """
+    root = os.path.abspath(rootdir)
+    catalog = load_catalog(PATH)
+    if catalog['root'] != root:
+        catalog = {'root': root, 'datasets': {}}
+
+    changed = False
+    datasetnames = sorted(f for f in os.listdir(rootdir) if os.path.isdir(os.path.join(rootdir, f)))
+    for name in list(catalog['datasets']):
+        if name not in datasetnames:
+            del catalog['datasets'][name]
+            changed = True
+
+    for dataset in datasetnames:
+        entry = catalog['datasets'].setdefault(dataset, {})
+        for serie in SERIES:
+            path = os.path.join(rootdir, dataset, serie)
+            signature = get_signature(path) if os.path.isdir(path) else []
+            if serie in entry and entry[serie]['signature'] == signature:
+                continue
+
+            print('catalog:', dataset, serie)
+            entry[serie] = read_series(path, signature)
+            changed = True
+
+    if changed == True:
+        os.makedirs(os.path.dirname(os.path.abspath(PATH)), exist_ok=True)
+        # a temporary name per process: the runs of the experiments may
+        # build the catalog at the same time
+        temporary = PATH + '.' + str(os.getpid()) + '.tmp'
+        with open(temporary, 'wb') as f:
+            pickle.dump(catalog, f)
+        os.replace(temporary, PATH)
+
+    return catalog
+
+def get_datasetnames(catalog, serie='crop_org'):
+    """ The names of the datasets which contain the given series. """
+    return sorted(name for name, entry in catalog['datasets'].items() if len(entry[serie]['files']) > 0)
+
+def get_metadata(catalog, dataset, serie='crop_org'):
+    """ The metadata of a series with the same keys as the VTK metadata of
+        phase 3 (Reader.generate_metadata). """
+    series = catalog['datasets'][dataset][serie]
+    if len(series['files']) == 0:
+        raise ValueError(dataset + '/' + serie + " is not in the catalog.")
+
+    dims = series['dims']
+    metadata = {"ConstPixelDims": dims,
+                "ConstExtent": (0, dims[0] - 1, 0, dims[1] - 1, 0, dims[2] - 1),
+                "ConstPixelSpacing": series['spacing'],
+                "ConstOrigin": series['origin'],
+                "ConstOrientation": series['direction'][0::3] + series['direction'][1::3]}
+    return metadata
@@ -24,9 +24,11 @@ import os
 import numpy as np
 import SimpleITK as sitk
 import pickle
-import time
 from tqdm import tqdm
 
+from helpers.cache_scans import load_cache, save_cache
+from helpers.catalog import build_catalog, get_datasetnames, get_metadata
+
 """ Create directory. """
 def create_dir(PATH):
     """ Create a directory. """
@@ -38,15 +40,26 @@ def create_dir(PATH):
 
 
 """ Loading functions. """
-def load_scans(pathDicom):
+def load_scans(pathDicom, as_array=False):
     """ Load the dicom files into sitk with the image series reader.
-    Input: path of the directory with the dicom files.
+    The decoded series is cached (see helpers/cache_scans.py), so the dicom
+    files are only decoded again when they have changed.
+    Input: path of the directory with the dicom files, and whether to
+    return a numpy array instead of a sitk image.
     Output: the 3D image.
     """
+    img = load_cache(pathDicom, as_array=as_array)
+    if img is not None:
+        return img
+
     reader = sitk.ImageSeriesReader()
     filenamesDICOM = reader.GetGDCMSeriesFileNames(pathDicom)
     reader.SetFileNames(filenamesDICOM)
     img = reader.Execute()
+    save_cache(pathDicom, img)
+
+    if as_array == True:
+        return sitk.GetArrayFromImage(img)
     return img
 
 def get_data_scans(rootdir, datasetnames):
@@ -58,8 +71,6 @@ def get_data_scans(rootdir, datasetnames):
 
     print('Loading: ' + str(len(datasetnames)) + ' datasets')
     for dataset in tqdm(datasetnames):
-        time.sleep(0.1)
-
         # Original images (to predict)
         images_org = load_scans(rootdir + dataset + '/crop_org')
 
@@ -97,15 +108,11 @@ def get_data_filters(rootdir, img_path, datasetnames, filternames):
 
     print('Loading: ' + str(len(datasetnames)) + ' datasets')
     for dataset in tqdm(datasetnames):
-        time.sleep(0.1)
-
         # Original images (to predict)
-        images_org = load_scans(rootdir + dataset + '/crop_org')
-        images_org = sitk.GetArrayFromImage(images_org)
+        images_org = load_scans(rootdir + dataset + '/crop_org', as_array=True)
 
         # Ground truth images (mask image of expert)
-        images_gt = load_scans(rootdir + dataset + '/crop_gt')
-        images_gt = sitk.GetArrayFromImage(images_gt)
+        images_gt = load_scans(rootdir + dataset + '/crop_gt', as_array=True)
 
         # Filter images
         images_filters = {}
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the noise reduction filters.
+# You can run this file to calculate the structural similarity index measure
+# (SSIM) of 3D volumes with separable box filters in float32.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 1: The noise reduction filters.
+Excecutes the following algorithms:
+- Structural similarity index measure (SSIM) with uniform windows
+"""
+
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from scipy.ndimage import uniform_filter1d
+
+
+def box_filter(image, win_size):
+    """ The uniform (box) filter as three separable 1D running means.
+        Identical to scipy's uniform_filter with mode 'reflect', which is the
+        window used by skimage, but each pass stays in float32. """
+    result = image
+    for axis in range(image.ndim):
+        result = uniform_filter1d(result, win_size, axis=axis, mode='reflect')
+    return result
+
+def calc_ssim_map(image_org, image_filter, data_range, win_size=7, K1=0.01, K2=0.03):
+    """ Calculate the SSIM map of two float32 volumes.
+        The window statistics are computed in place to keep the number of
+        volume-sized temporaries low. """
+    NP = win_size ** image_org.ndim
+    cov_norm = NP / (NP - 1)
+    C1 = np.float32((K1 * data_range) ** 2)
+    C2 = np.float32((K2 * data_range) ** 2)
+
+    # the means of the windows
+    ux = box_filter(image_org, win_size)
+    uy = box_filter(image_filter, win_size)
+
+    # the (co)variances of the windows
+    vx = box_filter(image_org * image_org, win_size)
+    vx -= ux * ux
+    vx *= cov_norm
+    vy = box_filter(image_filter * image_filter, win_size)
+    vy -= uy * uy
+    vy *= cov_norm
+    vxy = box_filter(image_org * image_filter, win_size)
+    vxy -= ux * uy
+    vxy *= cov_norm
+
+    # numerator: (2 ux uy + C1)(2 vxy + C2)
+    vxy *= 2
+    vxy += C2
+    # denominator: (ux^2 + uy^2 + C1)(vx + vy + C2)
+    vx += vy
+    vx += C2
+    del vy
+
+    ssim_map = ux * uy
+    ssim_map *= 2
+    ssim_map += C1
+    ssim_map *= vxy
+    del vxy
+
+    ux *= ux
+    uy *= uy
+    ux += uy
+    ux += C1
+    del uy
+    ux *= vx
+    ssim_map /= ux
+
+    return ssim_map
+
+def calc_ssim_slab(image_org, image_filter, data_range, win_size, start, stop):
+    """ Calculate the SSIM map of the slices start until stop of axis 0.
+        The slab is extended with a halo of half a window, so the result is
+        the same as the part of the SSIM map of the whole volume. """
+    pad = (win_size - 1) // 2
+    low = max(start - pad, 0)
+    high = min(stop + pad, image_org.shape[0])
+
+    ssim_map = calc_ssim_map(image_org[low:high], image_filter[low:high], data_range, win_size)
+    return ssim_map[start - low:stop - low]
+
+def calc_ssim_uniform(imgorg, imgfilter, data_range=None, win_size=7, full=False, workers=1):
+    """ Calculate the structural similarity index measure (SSIM) of two
+        volumes with uniform windows, equivalent to skimage's
+        structural_similarity with the default (uniform) window.
+        Input: the original and filtered images, the data range (default:
+        range of the filtered image), the window size, whether to return the
+        SSIM map as well, and the number of threads. With more than one
+        worker the volume is split in slabs along axis 0 which are computed
+        in parallel.
+        Output: the mean SSIM, or (mean SSIM, SSIM map) when full is True.
+    """
+    image_org = np.asarray(imgorg, dtype=np.float32)
+    image_filter = np.asarray(imgfilter, dtype=np.float32)
+    if image_org.shape != image_filter.shape:
+        raise ValueError("The images must have the same dimensions.")
+    if data_range is None:
+        data_range = float(image_filter.max()) - float(image_filter.min())
+
+    if workers is None or workers <= 1:
+        ssim_map = calc_ssim_map(image_org, image_filter, data_range, win_size)
+    else:
+        # split axis 0 in slabs and write them in one output volume
+        ssim_map = np.empty(image_org.shape, dtype=np.float32)
+        bounds = np.linspace(0, image_org.shape[0], workers + 1).astype(int)
+
+        def compute(slab):
+            start, stop = bounds[slab], bounds[slab + 1]
+            if stop > start:
+                ssim_map[start:stop] = calc_ssim_slab(image_org, image_filter, data_range, win_size, start, stop)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(compute, range(workers)))
+
+    # ignore the filter radius strip around the edges
+    pad = (win_size - 1) // 2
+    inner = tuple(slice(pad, size - pad) for size in ssim_map.shape)
+    mssim = ssim_map[inner].mean(dtype=np.float64)
+
+    if full == True:
+        return mssim, ssim_map
+    return mssim
@@ -11,7 +11,7 @@
 #
 # This file contains code for the noise reduction filters.
 # You can run this file to calculate statistics on the images, namely the
-# MSE, SSIM, and PSNR.
+# MSE, SSIM, and PSNR, and the per-slice MSE profiles.
 #
 # Made by Romy Meester
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -23,6 +23,7 @@ Excecutes the following algorithms:
 - Mean squared error (MSE)
 - Structural similarity index measure (SSIM)
 - Peak signal-to-noise ratio (PSNR).
+- Per-slice MSE profiles along the three axes.
 """
 
 import numpy as np
@@ -30,14 +31,24 @@ import SimpleITK as sitk
 import math
 from skimage.metrics import structural_similarity as ssim
 
+from modules.calc_ssim import calc_ssim_uniform
+
 def calc_mse(imgorg, imgfilter):
     """ Calculate the mean squared error (MSE). """
     image_org = imgorg.astype(np.float64) / 255.
     image_filter = imgfilter.astype(np.float64) / 255.
     return np.mean((image_org - image_filter) ** 2)
 
-def calc_ssim(imgorg, imgfilter):
-    """ Calculate the structural similarity index measure (SSIM). """
+def calc_ssim(imgorg, imgfilter, workers=1):
+    """ Calculate the structural similarity index measure (SSIM) with the
+    float32 uniform window engine (see modules/calc_ssim.py). """
+    image_org = imgorg.astype(np.float32) / 255.
+    image_filter = imgfilter.astype(np.float32) / 255.
+    return calc_ssim_uniform(image_org, image_filter, workers=workers)
+
+def calc_ssim_skimage(imgorg, imgfilter):
+    """ Calculate the structural similarity index measure (SSIM) with
+    skimage in float64. This is the reference of calc_ssim. """
     image_org = imgorg.astype(np.float64) / 255.
     image_filter = imgfilter.astype(np.float64) / 255.
     return ssim(image_org, image_filter, data_range= image_filter.max() - image_filter.min())
@@ -54,3 +65,27 @@ def calc_psnr(imgorg, imgfilter):
     PIXEL_MAX = 255.0
 
     return 20 * math.log10(PIXEL_MAX / math.sqrt(mse))
+
+
+""" Per-slice profiles. """
+def calc_axis_sums(volume):
+    """ Sum a 3D volume per slice along each of the three axes.
+        The volume is reduced once to a 2D plane, from which the first two
+        profiles are taken, so no loop over the slices is needed.
+        Output: tuple with the sums per slice of axis 0, 1 and 2.
+    """
+    plane = volume.sum(axis=2)
+    return plane.sum(axis=1), plane.sum(axis=0), volume.sum(axis=(0, 1))
+
+def calc_mse_profile(imgorg, imgfilter):
+    """ Calculate the mean squared error (MSE) of every slice along the
+        three axes. Output: tuple with a float32 array per axis. """
+    image_org = imgorg.astype(np.float64) / 255.
+    image_filter = imgfilter.astype(np.float64) / 255.
+    squared_error = (image_org - image_filter) ** 2
+
+    # divide the sums by the number of pixels of one slice
+    shape = squared_error.shape
+    sums = calc_axis_sums(squared_error)
+    return tuple((total / (squared_error.size / shape[axis])).astype(np.float32)
+                 for axis, total in enumerate(sums))
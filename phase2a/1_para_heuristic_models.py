@@ -34,13 +34,13 @@ from modules.calc_parameters import *
 DATA_PATH = '../datasets/'
 RESULTS_PATH = 'results_heuristic_models'
 RESULTS_PARA_PATH = os.path.join(RESULTS_PATH, 'results_heuristics_para')
-RESULTS_META_PATH_VTK = '../phase3/VTK/results_VTK/results_VTK_metadata'
 
 
 def main():
     # load the original 3D image, ground truth 3D image and the smoothed
     # filtered 3D image and show this in a dataset
-    folders = [f for f in os.listdir(DATA_PATH) if os.path.isdir(os.path.join(DATA_PATH, f))]
+    catalog = build_catalog(DATA_PATH)
+    folders = get_datasetnames(catalog)
     filterdata = {'filtername': 'anisodiff', 'parameters': [10, 0.04, 4]}
     datasets = get_data_parascans(DATA_PATH, folders, filterdata)
     print(datasets.keys())
@@ -82,8 +82,8 @@ def main():
         level1 = np.arange(0.5, 5.2, 0.5)
         level2 = np.arange(0.5, 5.2, 0.5)
 
-        # load the metadata
-        metadata = load_metadata(PATH = RESULTS_META_PATH_VTK, filename = datasetkey)
+        # the metadata of the cropped original image from the catalog
+        metadata = get_metadata(catalog, datasetkey, 'crop_org')
 
         # compute the watershed on the original image
         calc_params_ws_fullyauto(img_org, img_gt, metadata, sigma, level1, level2, PATH= RESULTS_PARA_PATH, dataset=datasetkey, filename='ws_fullyauto_org')
@@ -24,7 +24,7 @@ Phase 2a: The heuristic segmentation models:
 
 import os
 
-from helpers.loadsave import get_data_scans, create_dir, save_data_pickle, load_metadata
+from helpers.loadsave import get_data_scans, create_dir, save_data_pickle, build_catalog, get_datasetnames, get_metadata
 from modules.calc_heuristic_models import *
 
 
@@ -32,12 +32,12 @@ from modules.calc_heuristic_models import *
 DATA_PATH = '../datasets/'
 RESULTS_PATH = 'results_heuristic_models'
 RESULTS_IMG_PATH = os.path.join(RESULTS_PATH, 'results_heuristics_img')
-RESULTS_META_PATH_VTK = '../phase3/VTK/results_VTK/results_VTK_metadata'
 
 def main():
     # load the original 3D image and the smoothed filtered image
     # and show this in a dataset
-    folders = [f for f in os.listdir(DATA_PATH) if os.path.isdir(os.path.join(DATA_PATH, f))]
+    catalog = build_catalog(DATA_PATH)
+    folders = get_datasetnames(catalog)
     filterdata = {'filtername': 'curvatureflow', 'parameters': [5, 0.125]}
     datasets = get_data_scans(DATA_PATH, folders, filterdata)
 
@@ -71,8 +71,8 @@ def main():
 
         if 'ws_fullyauto' in models:
             # the fully-automatic watershed segmentation model
-            # load the metadata
-            metadata = load_metadata(PATH = RESULTS_META_PATH_VTK, filename = key)
+            # the metadata of the cropped original image from the catalog
+            metadata = get_metadata(catalog, key, 'crop_org')
 
             # compute the watershed on the original image save the numpy image in pickle file
             img_ws_org = calc_ws_fullyauto(img_org, metadata, sigma=1.2, level1=4, level2=1, showing=False)
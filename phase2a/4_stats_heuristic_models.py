@@ -36,11 +36,15 @@ RESULTS_PATH = 'results_heuristic_models'
 RESULTS_IMG_PATH = os.path.join(RESULTS_PATH, 'results_heuristics_img')
 RESULTS_STATS_PATH = os.path.join(RESULTS_PATH, 'results_heuristics_stats')
 
+# compute the per-slice DSC and IoU profiles along the three axes as well
+SLICE_PROFILES = True
+
 
 def main():
     # load the ground truth 3D images and the heuristic model images
     # and show this in a dataset
-    folders = [f for f in os.listdir(DATA_PATH) if os.path.isdir(os.path.join(DATA_PATH, f))]
+    catalog = build_catalog(DATA_PATH)
+    folders = get_datasetnames(catalog)
     heuristicnames = get_heuristicnames(RESULTS_IMG_PATH)
     datasets = get_data_heuristics(DATA_PATH, RESULTS_IMG_PATH, folders, heuristicnames)
 
@@ -53,6 +57,7 @@ def main():
     results_dsc = {}
     results_iou = {}
     results_hd = {}
+    results_profiles = {}
 
     for model in heuristicnames:
         results_dsc[model] = []
@@ -68,6 +73,7 @@ def main():
         # images to be used
         imgGT = values['gt']
         imgModels = values['models']
+        results_profiles[dataset] = {}
 
         # calculate and save results
         for modelname, model in imgModels.items():
@@ -76,6 +82,9 @@ def main():
             hd = calc_hd(imgGT, model)
             print(modelname, dice, iou, hd)
 
+            if SLICE_PROFILES == True:
+                results_profiles[dataset][modelname] = calc_slice_profiles(imgGT, model)
+
             for m in heuristicnames:
                 if modelname == m:
                     results_dsc[m].append(dice)
@@ -86,6 +95,10 @@ def main():
     results_pickle = {'DSC': results_dsc, 'IoU': results_iou, 'HD': results_hd}
     save_dict_pickle(PATH = RESULTS_STATS_PATH, data= results_pickle, filename='results_pickle')
 
+    # save the per-slice profiles: {dataset: {model: {'DSC', 'IoU': (axis0, axis1, axis2)}}}
+    if SLICE_PROFILES == True:
+        save_dict_pickle(PATH = RESULTS_STATS_PATH, data= results_profiles, filename='results_profiles')
+
     # save specific results with mean and standard deviation
     results = [('DSC:', results_dsc), ('IoU:', results_iou), ('HD:', results_hd)]
     show_results(results)
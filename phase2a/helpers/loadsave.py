@@ -26,11 +26,12 @@ import sys
 import numpy as np
 import SimpleITK as sitk
 import pickle
-import time
 from tqdm import tqdm
 
 sys.path.append('../phase1/modules/..')
 from modules.calc_filters import *
+from helpers.cache_scans import load_cache, save_cache
+from helpers.catalog import build_catalog, get_datasetnames, get_metadata
 
 
 """ Create directory. """
@@ -44,15 +45,26 @@ def create_dir(PATH):
 
 
 """ Loading functions. """
-def load_scans(pathDicom):
+def load_scans(pathDicom, as_array=False):
     """ Load the dicom files into sitk with the image series reader.
-    Input: path of the directory with the dicom files.
+    The decoded series is cached (see helpers/cache_scans.py), so the dicom
+    files are only decoded again when they have changed.
+    Input: path of the directory with the dicom files, and whether to
+    return a numpy array instead of a sitk image.
     Output: the 3D image.
     """
+    img = load_cache(pathDicom, as_array=as_array)
+    if img is not None:
+        return img
+
     reader = sitk.ImageSeriesReader()
     filenamesDICOM = reader.GetGDCMSeriesFileNames(pathDicom)
     reader.SetFileNames(filenamesDICOM)
     img = reader.Execute()
+    save_cache(pathDicom, img)
+
+    if as_array == True:
+        return sitk.GetArrayFromImage(img)
     return img
 
 def load_scans_filter(img_org, filterdata):
@@ -90,8 +102,6 @@ def get_data_scans(rootdir, datasetnames, filterdata):
 
     print('Loading: ' + str(len(datasetnames)) + ' datasets')
     for dataset in tqdm(datasetnames):
-        time.sleep(0.1)
-
         # Original images (to predict)
         images_org = load_scans(rootdir + dataset + '/crop_org')
 
@@ -114,14 +124,11 @@ def get_data_parascans(rootdir, datasetnames, filterdata):
 
     print('Loading: ' + str(len(datasetnames)) + ' datasets')
     for dataset in tqdm(datasetnames):
-        time.sleep(0.1)
-
         # Original images (to predict)
         images_org = load_scans(rootdir + dataset + '/crop_org')
 
         # Ground truth images (mask image of expert)
-        images_gt = load_scans(rootdir + dataset + '/crop_gt')
-        images_gt = sitk.GetArrayFromImage(images_gt)
+        images_gt = load_scans(rootdir + dataset + '/crop_gt', as_array=True)
 
         # Smoothed images by specific filter
         images_smoothed = load_scans_filter(images_org, filterdata)
@@ -163,11 +170,8 @@ def get_data_heuristics(rootdir, img_path, datasetnames, heuristicnames):
 
     print('Loading: ' + str(len(datasetnames)) + ' datasets')
     for dataset in tqdm(datasetnames):
-        time.sleep(0.1)
-
         # Ground truth images (mask image of expert)
-        images_gt = load_scans(rootdir + dataset + '/crop_gt')
-        images_gt = sitk.GetArrayFromImage(images_gt)
+        images_gt = load_scans(rootdir + dataset + '/crop_gt', as_array=True)
 
         # Heuristic model images (predictions of models)
         images_models = {}
@@ -182,15 +186,6 @@ def get_data_heuristics(rootdir, img_path, datasetnames, heuristicnames):
     return datasets
 
 
-def load_metadata(PATH, filename):
-    """ Load the metadata from pickle. """
-    with open(PATH + '/' + filename + '_croporg' + ".pkl","rb") as f:
-        new_data = pickle.load(f)
-
-    print(filename, "opened")
-    return new_data
-
-
 """ Save functions. """
 def save_data_pickle(PATH, data, dataset, filename):
     """ Save data in pickle file. """
@@ -11,7 +11,7 @@
 #
 # This file contains code for the heuristic segmentation models.
 # You can run this file to compute the statisical evaluation metrics on the images,
-# namely the DSC, IoU, and HD.
+# namely the DSC, IoU, and HD, and the per-slice DSC and IoU profiles.
 #
 # Made by Romy Meester
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -22,6 +22,7 @@ Phase 2a: The statistics of the heuristic segmentation models:
 - Dice Similarity Coefficient (DSC)
 - Intersection over Union (IoU)
 - Haussdorff Distance (HD)
+- Per-slice DSC and IoU profiles along the three axes
 """
 
 import numpy as np
@@ -57,3 +58,45 @@ def calc_hd(y_true, y_pred):
     distance = hd.GetHausdorffDistance()
 
     return distance
+
+
+""" Per-slice profiles. """
+def calc_axis_sums(volume):
+    """ Sum a 3D volume per slice along each of the three axes.
+        The volume is reduced once to a 2D plane, from which the first two
+        profiles are taken, so no loop over the slices is needed.
+        Output: tuple with the sums per slice of axis 0, 1 and 2.
+    """
+    plane = volume.sum(axis=2)
+    return plane.sum(axis=1), plane.sum(axis=0), volume.sum(axis=(0, 1))
+
+def calc_slice_profiles(y_true, y_pred):
+    """ Calculate the DSC and IoU of every slice along the three axes from
+        the confusion counts. The smoothing terms are the same as in
+        calc_dsc and calc_iou, so a profile value equals the metric of
+        that single slice.
+        Output: dict {'DSC', 'IoU'} with a tuple of float32 arrays per axis.
+    """
+    y_true = y_true.astype(np.int64)
+    y_pred = y_pred.astype(np.int64)
+
+    # the counts per slice: product, sums, intersection and union
+    product = calc_axis_sums(y_true * y_pred)
+    sum_true = calc_axis_sums(y_true)
+    sum_pred = calc_axis_sums(y_pred)
+    intersection = calc_axis_sums(np.logical_and(y_true, y_pred))
+    union = calc_axis_sums(np.logical_or(y_true, y_pred))
+
+    smooth_dsc = 1.0
+    smooth_iou = np.finfo(float).eps
+    profiles = {'DSC': [], 'IoU': []}
+    for axis in range(3):
+        # number of pixels in one slice along this axis
+        pixels = y_true.size / y_true.shape[axis]
+
+        dice = (2. * product[axis] + smooth_dsc) / (sum_true[axis] + sum_pred[axis] + smooth_dsc)
+        iou = (intersection[axis] + pixels * smooth_iou) / (union[axis] + pixels * smooth_iou)
+        profiles['DSC'].append(dice.astype(np.float32))
+        profiles['IoU'].append(iou.astype(np.float32))
+
+    return {'DSC': tuple(profiles['DSC']), 'IoU': tuple(profiles['IoU'])}
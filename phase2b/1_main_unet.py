@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this main file to train the U-net, e.g.
+# python 1_main_unet.py 32 ordered relu
+# or with the random state, the number of threads and the name of the run
+# python 1_main_unet.py 32 ordered relu 42 4 32_ordered_seed42
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- Input image: original image
+- Activation function: ReLU or ELU
+"""
+
+import os
+import sys
+import matplotlib
+# the plots are saved without a display (e.g. on the nodes of the cluster)
+matplotlib.use('Agg')
+
+from keras.callbacks import EarlyStopping, ModelCheckpoint
+
+from helpers.loadsave import *
+from helpers.cache_slices import load_slices, get_splits
+from helpers.showing import plot_trace
+from modules.generate_slices import *
+from modules.calc_unet import *
+from modules.predict_volumes import configure_cpu
+
+
+# Constants
+DATA_PATH = '../datasets/'
+RESULTS_PATH = 'results_unet_experiment'
+RESULTS_MODEL_PATH = os.path.join(RESULTS_PATH, 'results_unet_model')
+RESULTS_DATA_PATH = os.path.join(RESULTS_PATH, 'results_unet_data')
+RESULTS_TRACE_PATH = os.path.join(RESULTS_PATH, 'results_unet_trace')
+
+EPOCHS = 30
+
+# the preprocessing of the 2D slices: the size (width, height) or None to pad
+# the slices to the size of their shape bucket, the mode (pad or resize), and
+# the directions
+PREPROCESS = {'size': None, 'mode': 'pad', 'axes': (0, 1, 2)}
+# read the preprocessed slices from the cache (memory map) instead of slicing
+# the 3D images on the fly (which can only pad)
+USE_SLICE_CACHE = True
+
+# the keras history names and the names in the saved results
+METRICS = {'loss': 'loss', 'acc': 'acc', 'dice_coef': 'dice', 'mean_iou': 'mean_iou',
+           'precision_m': 'precision', 'recall_m': 'recall'}
+
+
+def train_model(datasets, splits, samples, metadata, size, batchsize, activation, name, random_state):
+    """ Train the model on batches which are generated on the fly.
+        The splits are the samples of the datasets (3D images or cached
+        stacks), the samples the same splits as rows (dataset index, axis,
+        slice) with the keys of the datasets. """
+    modelname = 'experimentmodel_unet_' + activation + '_org'
+    filename = modelname + str(name)
+    print('run: ' + filename)
+
+    # the generators of the padded 2D slices (size None: the shape buckets)
+    train_generator = SliceGenerator(datasets, splits['train'], size, batchsize=batchsize,
+                                     shuffle=True, random_state=random_state)
+    val_generator = SliceGenerator(datasets, splits['val'], size, batchsize=batchsize,
+                                   shuffle=False)
+
+    # run the model
+    earlystopper = EarlyStopping(patience=10, verbose=1)
+    if size is None:
+        model = U_net(img_height=None, img_width=None, activation=activation)
+    else:
+        model = U_net(img_height=size[1], img_width=size[0], activation=activation)
+    checkpoint_path = os.path.join(RESULTS_MODEL_PATH, filename)
+    checkpointer = ModelCheckpoint(filepath=checkpoint_path, verbose=1, save_best_only=True)
+    time_callback = TimeHistory()
+    trace_callback = TrainingTrace(train_generator)
+    try:
+        # the generators prefetch themselves: no extra keras workers
+        results = model.fit_generator(train_generator, steps_per_epoch=len(train_generator), epochs=EPOCHS,
+                                      validation_data=val_generator, validation_steps=len(val_generator),
+                                      callbacks=[earlystopper, checkpointer, time_callback, trace_callback],
+                                      workers=0)
+    finally:
+        train_generator.stop()
+        val_generator.stop()
+
+    # save the splits, metadata, and metric results
+    unetdata = {'splits': samples, 'size': size, 'preprocess': PREPROCESS, 'metadata': metadata,
+                'best': checkpointer.best, 'timings': time_callback.times}
+    for metric, key in METRICS.items():
+        unetdata[key + '_train'] = results.history[metric]
+        unetdata[key + '_val'] = results.history['val_' + metric]
+
+    # save from the model the data in pickle
+    save_data_pickle(PATH = RESULTS_DATA_PATH, data=unetdata, filename=filename)
+
+    # save and plot the trace per batch
+    save_trace(PATH=RESULTS_TRACE_PATH, trace=trace_callback, filename=filename)
+    plot_trace(PATH=RESULTS_TRACE_PATH, trace=trace_callback.trace, filename=filename)
+    print(trace_callback.summary())
+    print('U-net finished')
+
+    # save the model
+    modelpath = os.path.join(RESULTS_MODEL_PATH, 'results_' + filename)
+    model.save(modelpath)
+
+    return results
+
+
+def main():
+    # the batch size, dataorder (fixed, ordered, mixed) and activation function
+    batchsize = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    dataorder = sys.argv[2] if len(sys.argv) > 2 else 'ordered'
+    activation = sys.argv[3] if len(sys.argv) > 3 else 'relu'
+    # the random state, the number of CPU threads (0: all), and the name of the run
+    random_state = int(sys.argv[4]) if len(sys.argv) > 4 else 42
+    threads = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+    name = sys.argv[6] if len(sys.argv) > 6 else str(batchsize)
+
+    if threads > 0:
+        configure_cpu(intra_threads=threads, inter_threads=1)
+
+    catalog = build_catalog(DATA_PATH)
+    if USE_SLICE_CACHE == True:
+        # the preprocessed 2D slices with a memory map, and the cached splits
+        datasets, index = load_slices(DATA_PATH, catalog, PREPROCESS)
+        splits, samples, metadata = get_splits(index, dataorder=dataorder, test_size=0.30,
+                                               val_size=0.20, random_state=random_state)
+    else:
+        # load the 3D images once; the 2D slices are generated on the fly
+        datasets = get_data(DATA_PATH, catalog)
+        splits, metadata = create_splits(datasets, dataorder=dataorder, test_size=0.30,
+                                         val_size=0.20, random_state=random_state, axes=PREPROCESS['axes'])
+        samples = splits
+    size = PREPROCESS['size']
+
+    print('Create directories')
+    create_dir(RESULTS_PATH)
+    create_dir(RESULTS_MODEL_PATH)
+    create_dir(RESULTS_DATA_PATH)
+    create_dir(RESULTS_TRACE_PATH)
+
+    train_model(datasets, splits, samples, metadata, size, batchsize=batchsize, activation=activation,
+                name=name, random_state=random_state)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this main file to segment the whole 3D images with a trained
+# U-net on the CPU, e.g. (activation, model number, fusion)
+# python 2_predict_unet.py relu 32 mean
+# The masks are saved in the format of the volume visualisation (phase 3).
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- Input image: original image
+- Output: 3D masks, fused from the predictions in 3 directions
+"""
+
+import os
+import sys
+import time
+
+from helpers.loadsave import *
+from modules.predict_volumes import *
+
+
+# Constants
+DATA_PATH = '../datasets/'
+RESULTS_PATH = 'results_unet_experiment'
+RESULTS_MODEL_PATH = os.path.join(RESULTS_PATH, 'results_unet_model')
+RESULTS_DATA_PATH = os.path.join(RESULTS_PATH, 'results_unet_data')
+RESULTS_PREDICT_PATH = os.path.join(RESULTS_PATH, 'results_unet_predict')
+
+# the folder which is read by the volume visualisation (phase 3)
+RESULTS_VOLUMES_PATH = '../phase3/results_volumes'
+RESULTS_CONVERT_PATH = os.path.join(RESULTS_VOLUMES_PATH, 'results_volumes_convert')
+RESULTS_UNET_PATH = os.path.join(RESULTS_CONVERT_PATH, 'convert_unet')
+
+# the preprocessing of the models which were trained before it was saved
+DEFAULT_PREPROCESS = {'size': None, 'mode': 'pad', 'axes': (0, 1, 2)}
+
+# the fixed batch size and the threads of the CPU
+BATCHSIZE = 64
+INTRA_THREADS = os.cpu_count()
+INTER_THREADS = 2
+
+
+def load_unet(filename):
+    """ Load the trained U-net (without compiling) and the preprocessing of
+        its training: the image size (w, h) on which it is trained (None:
+        trained on the shape buckets), the mode (pad or resize) and the axes. """
+    from keras.models import load_model
+    from modules.calc_unet import CUSTOM_OBJECTS
+
+    model = load_model(os.path.join(RESULTS_MODEL_PATH, 'results_' + filename),
+                       custom_objects=CUSTOM_OBJECTS, compile=False)
+    unetdata = load_data_pickle(RESULTS_DATA_PATH, filename)
+    preprocess = dict(DEFAULT_PREPROCESS, **unetdata.get('preprocess', {}))
+    preprocess['size'] = unetdata.get('size', preprocess['size'])
+    return model, preprocess
+
+
+def main():
+    # the activation function, the model number (the simulation), and the fusion
+    activation = sys.argv[1] if len(sys.argv) > 1 else 'relu'
+    simulation = sys.argv[2] if len(sys.argv) > 2 else '32'
+    fusion = sys.argv[3] if len(sys.argv) > 3 else 'mean'
+    filename = 'experimentmodel_unet_' + activation + '_org' + simulation
+
+    # the model on the CPU
+    configure_cpu(INTRA_THREADS, INTER_THREADS)
+    model, preprocess = load_unet(filename)
+
+    # load the 3D images
+    catalog = build_catalog(DATA_PATH)
+    datasets = get_data(DATA_PATH, catalog)
+
+    print('Create directories')
+    for PATH in [RESULTS_PATH, RESULTS_PREDICT_PATH, RESULTS_VOLUMES_PATH, RESULTS_CONVERT_PATH, RESULTS_UNET_PATH]:
+        create_dir(PATH)
+
+    org_images, gt_images, pred_images = {}, {}, {}
+    total_timings = dict.fromkeys(STAGES, 0.)
+    start = time.perf_counter()
+
+    with open(RESULTS_PREDICT_PATH + '/predict_' + filename + '.txt', 'w') as file:
+        file.write("dataset shape " + " ".join(stage + "(sec)" for stage in STAGES) + " total(sec)\n")
+
+        # segment each whole 3D image
+        for key, images in datasets.items():
+            mask, timings = segment_volume(model, images['org'], preprocess['size'], batchsize=BATCHSIZE,
+                                           axes=preprocess['axes'], fusion=fusion, mode=preprocess['mode'])
+
+            # the keys of the volume visualisation, e.g. dataset1_relu_org32
+            datakey = key + '_' + activation + '_org' + simulation
+            org_images[datakey] = images['org']
+            pred_images[datakey] = mask
+            if images['gt'] is not None:
+                gt_images[datakey] = images['gt']
+
+            for stage in STAGES:
+                total_timings[stage] += timings[stage]
+            line = "%s %s %s %.3f" %(key, 'x'.join(str(s) for s in mask.shape),
+                                     " ".join("%.3f" %timings[stage] for stage in STAGES),
+                                     sum(timings.values()))
+            print(line)
+            file.write(line + "\n")
+
+        # the throughput of the whole run
+        runtime = time.perf_counter() - start
+        line = "volumes per minute: %.2f (%d volumes, %.1f sec, fusion: %s)" %(
+            len(datasets) / runtime * 60., len(datasets), runtime, fusion)
+        print(line)
+        file.write(line + "\n")
+        line = "latency per volume: " + " ".join("%s %.3f" %(stage, total_timings[stage] / max(len(datasets), 1))
+                                                  for stage in STAGES)
+        print(line)
+        file.write(line + "\n")
+
+    # save the images for the volume visualisation
+    save_data_pickle(PATH=RESULTS_UNET_PATH, data=org_images, filename='org_unet_images' + simulation)
+    save_data_pickle(PATH=RESULTS_UNET_PATH, data=gt_images, filename='gt_unet_images' + simulation)
+    save_data_pickle(PATH=RESULTS_UNET_PATH, data=pred_images, filename='pred_unet_images' + simulation)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this main file to compare the padding to the global maximum size
+# with the padding to the shape buckets (padded pixels, training and inference).
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- Benchmark of the padding: global maximum size versus shape buckets
+"""
+
+import os
+import time
+
+from helpers.loadsave import *
+from modules.generate_slices import *
+from modules.predict_volumes import segment_volume
+from modules.calc_unet import U_net
+
+
+# Constants
+DATA_PATH = '../datasets/'
+RESULTS_PATH = 'results_unet_experiment'
+RESULTS_BENCH_PATH = os.path.join(RESULTS_PATH, 'results_unet_bench')
+
+BATCHSIZE = 32
+
+
+def time_training(model, generator):
+    """ The runtime (sec) of one training epoch. """
+    start = time.perf_counter()
+    try:
+        model.fit_generator(generator, steps_per_epoch=len(generator), epochs=1, verbose=0, workers=0)
+    finally:
+        generator.stop()
+    return time.perf_counter() - start
+
+def time_inference(model, datasets, size):
+    """ The runtime (sec) of the segmentation of all 3D images. """
+    start = time.perf_counter()
+    for key, images in datasets.items():
+        segment_volume(model, images['org'], size, batchsize=BATCHSIZE)
+    return time.perf_counter() - start
+
+
+def main():
+    # load the 3D images and all the samples with a ground truth
+    catalog = build_catalog(DATA_PATH)
+    datasets = get_data(DATA_PATH, catalog)
+    keys_train, keys_test = check_groundtruth(datasets)
+    samples = get_samples(datasets, keys_train)
+
+    print('Create directories')
+    create_dir(RESULTS_PATH)
+    create_dir(RESULTS_BENCH_PATH)
+
+    # one fully convolutional model runs both schemes
+    model = U_net(img_height=None, img_width=None)
+    schemes = [('global', get_sizes(datasets)), ('buckets', None)]
+
+    # warm up: build the training and prediction functions once
+    time_training(model, SliceGenerator(datasets, samples[:BATCHSIZE], None, batchsize=BATCHSIZE))
+
+    with open(RESULTS_BENCH_PATH + '/bench_buckets.txt', 'w') as file:
+        file.write("scheme pixels padded_pixels padding(%) training(sec) inference(sec)\n")
+
+        results = {}
+        for name, size in schemes:
+            pixels, padded = calc_padded_pixels(datasets, samples, size)
+            generator = SliceGenerator(datasets, samples, size, batchsize=BATCHSIZE, random_state=42)
+            training = time_training(model, generator)
+            inference = time_inference(model, datasets, size)
+            results[name] = (padded, training, inference)
+
+            line = "%s %d %d %.1f %.3f %.3f" %(name, pixels, padded, 100. * (padded - pixels) / padded,
+                                               training, inference)
+            print(line)
+            file.write(line + "\n")
+
+        # the reduction of the padded pixels and the speedup of the buckets
+        line = "padded pixels reduction: %.2fx, training speedup: %.2fx, inference speedup: %.2fx" %(
+            results['global'][0] / float(results['buckets'][0]), results['global'][1] / results['buckets'][1],
+            results['global'][2] / results['buckets'][2])
+        print(line)
+        file.write(line + "\n")
+
+    print('results saved in:' + RESULTS_BENCH_PATH + '/bench_buckets.txt')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this main file to compare the resizing of the 2D slices one at a
+# time (skimage) with the resizing of whole stacks at once.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- Benchmark of the preprocessing: per slice (skimage) versus per stack
+- The references per slice: the settings of the stacks (bilinear, edge mode,
+  no anti-aliasing), and the call of the notebook (skimage defaults: reflect
+  mode, anti-aliasing when downsampling)
+"""
+
+import os
+import time
+import numpy as np
+from skimage.transform import resize
+from skimage import img_as_bool
+
+from helpers.loadsave import *
+from modules.preprocess_slices import *
+
+
+# Constants
+DATA_PATH = '../datasets/'
+RESULTS_PATH = 'results_unet_experiment'
+RESULTS_BENCH_PATH = os.path.join(RESULTS_PATH, 'results_unet_bench')
+
+OUTPUT_SHAPE = (128, 128)
+
+
+def preprocess_per_slice(datasets, output_shape):
+    """ Resize the 2D slices in 3 directions one at a time, with the settings
+        of resize_stack (bilinear, edge mode, no anti-aliasing). """
+    results = {}
+    for key, images in datasets.items():
+        frames = [resize(image, output_shape, order=1, mode='edge', anti_aliasing=False, preserve_range=True)
+                  for axis in range(3) for image in get_stack(images['org'], axis)]
+        masks = None
+        if images['gt'] is not None:
+            masks = [resize(image.astype(bool).astype(float), output_shape, order=1, mode='edge',
+                            anti_aliasing=False) > 0.5
+                     for axis in range(3) for image in get_stack(images['gt'], axis)]
+        results[key] = {'org': np.array(frames, dtype=np.float32), 'gt': masks if masks is None else np.array(masks)}
+    return results
+
+def preprocess_notebook(datasets, output_shape):
+    """ Resize the 2D slices in 3 directions one at a time as in the notebook,
+        with the defaults of skimage; the frames are scaled back from [0, 1]
+        to the grey levels. """
+    results = {}
+    for key, images in datasets.items():
+        frames = [resize(image.astype(np.uint8), output_shape) * 255.
+                  for axis in range(3) for image in get_stack(images['org'], axis)]
+        masks = None
+        if images['gt'] is not None:
+            masks = [img_as_bool(resize(image.astype(bool), output_shape))
+                     for axis in range(3) for image in get_stack(images['gt'], axis)]
+        results[key] = {'org': np.array(frames, dtype=np.float32), 'gt': masks if masks is None else np.array(masks)}
+    return results
+
+
+def main():
+    # load the 3D images
+    catalog = build_catalog(DATA_PATH)
+    datasets = get_data(DATA_PATH, catalog)
+
+    print('Create directories')
+    create_dir(RESULTS_PATH)
+    create_dir(RESULTS_BENCH_PATH)
+
+    start = time.perf_counter()
+    notebook = preprocess_notebook(datasets, OUTPUT_SHAPE)
+    runtime_notebook = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = preprocess_per_slice(datasets, OUTPUT_SHAPE)
+    runtime_slices = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = preprocess_datasets(datasets, OUTPUT_SHAPE)
+    runtime_stacks = time.perf_counter() - start
+
+    with open(RESULTS_BENCH_PATH + '/bench_preprocess.txt', 'w') as file:
+        file.write("method runtime(sec)\n")
+        for name, runtime in [('notebook', runtime_notebook), ('per_slice', runtime_slices),
+                              ('per_stack', runtime_stacks)]:
+            line = "%s %.3f" %(name, runtime)
+            print(line)
+            file.write(line + "\n")
+
+        # the largest difference of the frames (grey levels) and the fraction
+        # of equal mask pixels of the stacks with each reference
+        for name, images, runtime in [('notebook', notebook, runtime_notebook),
+                                      ('per_slice', reference, runtime_slices)]:
+            difference = max(np.abs(results[key]['org'][..., 0] - images[key]['org']).max() for key in datasets)
+            equal = np.mean([np.mean(results[key]['gt'][..., 0] == images[key]['gt'])
+                             for key in datasets if images[key]['gt'] is not None])
+            line = "versus %s: speedup: %.2fx, max difference frames: %.2e, equal mask pixels: %.4f" %(
+                name, runtime / runtime_stacks, difference, equal)
+            print(line)
+            file.write(line + "\n")
+
+    print('results saved in:' + RESULTS_BENCH_PATH + '/bench_preprocess.txt')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this main file to compare the U-net with lighter variants and
+# their TensorFlow Lite exports on the CPU (DSC, parameters, latency).
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- Benchmark of the U-net variants: width, depth, separable convolutions,
+  and the TensorFlow Lite exports (fp32, fp16, int8)
+"""
+
+import os
+import time
+import numpy as np
+
+from keras.models import load_model
+
+from helpers.loadsave import *
+from modules.generate_slices import *
+from modules.predict_volumes import configure_cpu, segment_volume
+from modules.calc_unet import U_net_light, CUSTOM_OBJECTS
+from modules.calc_statistics import calc_dsc
+from modules.export_tflite import PRECISIONS, convert_tflite, save_tflite, TFLiteModel
+
+
+# Constants
+DATA_PATH = '../datasets/'
+RESULTS_PATH = 'results_unet_experiment'
+RESULTS_BENCH_PATH = os.path.join(RESULTS_PATH, 'results_unet_bench')
+RESULTS_VARIANTS_PATH = os.path.join(RESULTS_BENCH_PATH, 'variants')
+
+EPOCHS = 10
+BATCHSIZE = 32
+INTRA_THREADS = os.cpu_count()
+INTER_THREADS = 2
+
+# the variants of the U-net: width multiplier, depth, separable convolutions
+VARIANTS = [('unet', {'width': 1.0, 'depth': 4, 'separable': False}),
+            ('unet_w050', {'width': 0.5, 'depth': 4, 'separable': False}),
+            ('unet_w050_d3', {'width': 0.5, 'depth': 3, 'separable': False}),
+            ('unet_sep', {'width': 1.0, 'depth': 4, 'separable': True}),
+            ('unet_sep_w050', {'width': 0.5, 'depth': 4, 'separable': True})]
+
+
+def get_frames(datasets, samples, size):
+    """ All the frames and masks of the samples in one batch. """
+    generator = SliceGenerator(datasets, samples, size, batchsize=len(samples), shuffle=False)
+    return generator.make_batch(tuple(size), samples)
+
+def train_or_load(name, params, datasets, splits, size):
+    """ Train a variant on the training samples, or load it when it has been
+        trained before. """
+    modelpath = os.path.join(RESULTS_VARIANTS_PATH, name + '.h5')
+    if os.path.exists(modelpath):
+        return load_model(modelpath, custom_objects=CUSTOM_OBJECTS)
+
+    model = U_net_light(img_height=size[1], img_width=size[0], summary=False, **params)
+    train_generator = SliceGenerator(datasets, splits['train'], size, batchsize=BATCHSIZE, random_state=42)
+    try:
+        model.fit_generator(train_generator, steps_per_epoch=len(train_generator), epochs=EPOCHS,
+                            verbose=0, workers=0)
+    finally:
+        train_generator.stop()
+    model.save(modelpath)
+    return model
+
+def evaluate(model, frames, masks, volume, size):
+    """ The DSC of the test frames, the latency per slice (ms) and per
+        3D image (ms). """
+    # warm up
+    model.predict(frames[:BATCHSIZE], batch_size=BATCHSIZE)
+
+    start = time.perf_counter()
+    predictions = np.concatenate([model.predict(frames[i:i + BATCHSIZE], batch_size=BATCHSIZE)
+                                  for i in range(0, len(frames), BATCHSIZE)])
+    per_slice = (time.perf_counter() - start) / len(frames) * 1000.
+
+    dice = calc_dsc(masks, (predictions > 0.5).astype(np.float32))
+
+    start = time.perf_counter()
+    segment_volume(model, volume, size, batchsize=BATCHSIZE)
+    per_volume = (time.perf_counter() - start) * 1000.
+    return dice, per_slice, per_volume
+
+
+def main():
+    # the model on the CPU
+    configure_cpu(INTRA_THREADS, INTER_THREADS)
+
+    # load the 3D images, and the same split and fixed size for all variants
+    catalog = build_catalog(DATA_PATH)
+    datasets = get_data(DATA_PATH, catalog)
+    splits, metadata = create_splits(datasets, dataorder='mixed', test_size=0.30, val_size=0.20, random_state=42)
+    size = get_sizes(datasets)
+    frames, masks = get_frames(datasets, splits['test'], size)
+    volume = datasets[sorted(datasets)[0]]['org']
+
+    print('Create directories')
+    create_dir(RESULTS_PATH)
+    create_dir(RESULTS_BENCH_PATH)
+    create_dir(RESULTS_VARIANTS_PATH)
+
+    with open(RESULTS_BENCH_PATH + '/bench_variants.txt', 'w') as file:
+        file.write("variant precision parameters size(MB) dsc ms_per_slice ms_per_volume\n")
+
+        for name, params in VARIANTS:
+            model = train_or_load(name, params, datasets, splits, size)
+            parameters = model.count_params()
+
+            results = [('keras', model, parameters * 4)]
+            for precision in PRECISIONS:
+                try:
+                    tflite_model = convert_tflite(model, precision, representative=frames[:BATCHSIZE])
+                except ValueError as error:
+                    print(name, precision, 'skipped:', error)
+                    continue
+                save_tflite(RESULTS_VARIANTS_PATH, tflite_model, name + '_' + precision)
+                results.append(('tflite_' + precision, TFLiteModel(tflite_model, threads=INTRA_THREADS),
+                                len(tflite_model)))
+
+            for precision, runner, nbytes in results:
+                dice, per_slice, per_volume = evaluate(runner, frames, masks, volume, size)
+                line = "%s %s %d %.2f %.4f %.2f %.1f" %(name, precision, parameters, nbytes / 1024. ** 2,
+                                                       dice, per_slice, per_volume)
+                print(line)
+                file.write(line + "\n")
+
+    print('results saved in:' + RESULTS_BENCH_PATH + '/bench_variants.txt')
+
+
+if __name__ == '__main__':
+    main()
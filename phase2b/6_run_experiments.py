@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this main file to run the grid of U-net experiments, e.g. with
+# 3 trainings at the same time
+# python 6_run_experiments.py 3
+# The runs which are already complete in the results store are skipped.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- The experiments: batch size, dataorder, activation function, random state
+- Plots of the mean and standard deviation over the random states
+"""
+
+import os
+import sys
+import matplotlib
+# the plots are saved without a display (e.g. on the nodes of the cluster)
+matplotlib.use('Agg')
+
+from helpers.loadsave import create_dir
+from helpers.showing import plot_meanstd
+from modules.run_experiments import *
+
+
+# Constants
+RESULTS_PATH = 'results_unet_experiment'
+RESULTS_DATA_PATH = os.path.join(RESULTS_PATH, 'results_unet_data')
+RESULTS_LOG_PATH = os.path.join(RESULTS_PATH, 'results_unet_logs')
+RESULTS_VIS_PATH = os.path.join(RESULTS_PATH, 'results_unet_vis')
+RESULTS_STORE = os.path.join(RESULTS_PATH, 'results_store.pkl')
+
+# the training script of one run
+TRAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '1_main_unet.py')
+
+# the grid of the experiments
+GRID = {'batchsize': [16, 32, 64, 128],
+        'dataorder': ['fixed', 'ordered', 'mixed'],
+        'activation': ['relu', 'elu'],
+        'seed': [42, 43, 44]}
+
+# the metrics which are plotted: (key in the results, title, label y-axis)
+PLOTS = [('loss_train', 'Loss function', 'Loss'),
+         ('acc_train', 'Accuracy', 'Accuracy'),
+         ('dice_train', 'Dice similarity coefficient (DSC)', 'DSC'),
+         ('mean_iou_train', 'Intersection over union (IoU)', 'IoU'),
+         ('precision_train', 'Precision', 'Precision'),
+         ('recall_train', 'Recall', 'Recall'),
+         ('timings', 'Timings', 'Time (sec)')]
+
+
+def plot_store(store):
+    """ Plot the mean and standard deviation over the random states per batch
+        size, for each activation function and dataorder. """
+    for activation in GRID['activation']:
+        for dataorder in GRID['dataorder']:
+            for metric, titlename, ylabel in PLOTS:
+                groups = select_runs(store, metric, 'batchsize', activation=activation, dataorder=dataorder)
+                if len(groups) == 0:
+                    continue
+                filename = 'exp_unet_' + activation + '_org_' + dataorder + '_' + metric
+                plot_meanstd(RESULTS_VIS_PATH, groups, filename, titlename, ylabel)
+
+
+def main():
+    # the number of trainings at the same time
+    parallel = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+
+    print('Create directories')
+    for PATH in [RESULTS_PATH, RESULTS_DATA_PATH, RESULTS_LOG_PATH, RESULTS_VIS_PATH]:
+        create_dir(PATH)
+
+    store = run_experiments(GRID, TRAIN_SCRIPT, RESULTS_STORE, RESULTS_DATA_PATH, RESULTS_LOG_PATH,
+                            parallel=parallel)
+    plot_store(store)
+    print('results saved in:' + RESULTS_STORE)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this file to cache the preprocessed 2D slices (uint8) and masks
+# of all datasets on disk, so an experiment reads them with a memory map.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- Cache of the preprocessed 2D slices: <repository>/cache/slices/<parameters>
+"""
+
+import os
+import sys
+import hashlib
+import pickle
+import numpy as np
+
+sys.path.append('../phase1/modules/..')
+from helpers.cache_scans import CACHE_PATH
+from helpers.loadsave import load_scans
+from modules.generate_slices import get_bucket_size, get_slice_shape, create_splits
+from modules.preprocess_slices import get_stack, pad_stack, resize_stack, resize_masks_stack
+
+
+# Constants
+SLICES_PATH = os.path.join(CACHE_PATH, '..', 'slices')
+# the version of the cache layout: a new version invalidates all caches
+VERSION = 1
+
+
+""" The cache key. """
+def get_cachedir(params):
+    """ The directory of the cache of the preprocessing parameters, e.g.
+        pad_buckets_axes012_<hash> or resize_128x128_axes012_<hash>.
+        The parameters are the size (width, height) or None (the buckets),
+        the mode (pad or resize), and the axes. """
+    size = 'buckets' if params['size'] is None else str(params['size'][0]) + 'x' + str(params['size'][1])
+    axes = 'axes' + ''.join(str(axis) for axis in params['axes'])
+    digest = hashlib.md5(repr((VERSION, sorted(params.items()))).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(SLICES_PATH, '_'.join([params['mode'], size, axes, digest]))
+
+def get_source(catalog, dataset):
+    """ The source of the cache of a dataset: the checksums of the original
+        and ground truth images in the catalog. """
+    entry = catalog['datasets'][dataset]
+    return (entry['crop_org'].get('checksum'), entry['crop_gt'].get('checksum'))
+
+def get_stackname(dataset, axis):
+    """ The key of the stack of 2D slices of a dataset in one direction. """
+    return dataset + '_axis' + str(axis)
+
+
+""" The preprocessing. """
+def preprocess_stack(volume, axis, params, masks=False):
+    """ Preprocess the 2D slices of a 3D image in one direction into a uint8
+        stack (n, height, width). """
+    stack = get_stack(volume, axis)
+    if params['mode'] == 'pad':
+        size = params['size'] if params['size'] is not None else \
+            get_bucket_size(get_slice_shape(volume.shape, axis))
+        out = np.zeros((len(stack), size[1], size[0]), dtype=np.uint8)
+        return pad_stack((stack > 0) if masks else stack, size, out=out)
+    elif params['mode'] == 'resize':
+        if params['size'] is None:
+            raise ValueError("The resize mode needs a size.")
+        out = np.empty((len(stack), params['size'][1], params['size'][0]), dtype=np.uint8)
+        if masks == True:
+            return resize_masks_stack(stack, (params['size'][1], params['size'][0]), out=out)
+        return resize_stack(stack, (params['size'][1], params['size'][0]), out=out)
+    raise ValueError("The mode " + str(params['mode']) + " does not exist.")
+
+def save_array(filename, array):
+    """ Save an array as .npy under a temporary name first (per process, so
+        runs which fill the cache at the same time do not mix their files). """
+    temporary = filename + '.' + str(os.getpid()) + '.tmp.npy'
+    with open(temporary, 'wb') as f:
+        np.save(f, array)
+    os.replace(temporary, filename + '.npy')
+
+
+""" The cache. """
+def load_index(cachedir):
+    """ Load the index of a cache using pickle. """
+    try:
+        with open(os.path.join(cachedir, 'index.pkl'), 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+def save_index(cachedir, index):
+    """ Save the index of a cache using pickle (atomic). """
+    filename = os.path.join(cachedir, 'index.pkl')
+    temporary = filename + '.' + str(os.getpid()) + '.tmp'
+    with open(temporary, 'wb') as f:
+        pickle.dump(index, f)
+    os.replace(temporary, filename)
+
+def load_slices(rootdir, catalog, params):
+    """ Load the preprocessed 2D slices of all datasets with a memory map.
+        A dataset is only loaded and preprocessed again when its checksums in
+        the catalog have changed (or it is not cached yet); removed datasets
+        are dropped from the index.
+        Input: the root directory, the catalog and the preprocessing parameters.
+        Output: dict {dataset_axis: {'org': stack, 'gt': stack or None}} and
+        the index (with the shapes of the 3D images).
+    """
+    cachedir = get_cachedir(params)
+    index = load_index(cachedir)
+    if index is None or index['params'] != params:
+        index = {'params': params, 'source': {}, 'shapes': {}, 'gt': {}, 'splits': {}}
+
+    datasetnames = [name for name in sorted(catalog['datasets'])
+                    if len(catalog['datasets'][name]['crop_org']['files']) > 0]
+    changed = False
+    for dataset in list(index['source']):
+        if dataset not in datasetnames:
+            for name in ('source', 'shapes', 'gt'):
+                del index[name][dataset]
+            changed = True
+
+    os.makedirs(cachedir, exist_ok=True)
+    for dataset in datasetnames:
+        source = get_source(catalog, dataset)
+        if index['source'].get(dataset) == source:
+            continue
+
+        print('cache slices:', dataset)
+        volume = load_scans(os.path.join(rootdir, dataset, 'crop_org'), as_array=True)
+        groundtruth = None
+        if source[1] is not None:
+            groundtruth = load_scans(os.path.join(rootdir, dataset, 'crop_gt'), as_array=True)
+        for axis in params['axes']:
+            filename = os.path.join(cachedir, get_stackname(dataset, axis))
+            save_array(filename + '_org', preprocess_stack(volume, axis, params))
+            if groundtruth is not None:
+                save_array(filename + '_gt', preprocess_stack(groundtruth, axis, params, masks=True))
+
+        index['source'][dataset] = source
+        index['shapes'][dataset] = volume.shape
+        index['gt'][dataset] = groundtruth is not None
+        changed = True
+
+    if changed == True:
+        # the splits depend on the datasets
+        index['splits'] = {}
+        save_index(cachedir, index)
+
+    slices = {}
+    for dataset in datasetnames:
+        for axis in params['axes']:
+            filename = os.path.join(cachedir, get_stackname(dataset, axis))
+            masks = np.load(filename + '_gt.npy', mmap_mode='r') if index['gt'][dataset] else None
+            slices[get_stackname(dataset, axis)] = {'org': np.load(filename + '_org.npy', mmap_mode='r'),
+                                                    'gt': masks}
+    return slices, index
+
+
+""" The splits. """
+def get_volume_views(index):
+    """ Stand-ins of the 3D images with only their shapes (no memory), on
+        which the splits can be made without loading the images. """
+    views = {}
+    for dataset, shape in sorted(index['shapes'].items()):
+        empty = np.broadcast_to(np.uint8(0), shape)
+        views[dataset] = {'org': empty, 'gt': empty if index['gt'][dataset] else None}
+    return views
+
+def to_stack_samples(samples, keys, axes):
+    """ Convert the samples (dataset index, axis, slice) to the samples of
+        the stacks (stack index, 0, slice); the stack indices follow the
+        sorted names of the stacks (dataset_axis). """
+    stacknames = sorted(get_stackname(key, axis) for key in keys for axis in axes)
+    table = np.full((len(keys), 3), -1, dtype=np.int32)
+    for i, key in enumerate(keys):
+        for axis in axes:
+            table[i, axis] = stacknames.index(get_stackname(key, axis))
+
+    stack_samples = np.zeros_like(samples)
+    stack_samples[:, 0] = table[samples[:, 0], samples[:, 1]]
+    # every sample must have a cached stack (an axis which is not cached has -1)
+    if (stack_samples[:, 0] < 0).any():
+        raise ValueError("The samples have axes without a cached stack.")
+    stack_samples[:, 2] = samples[:, 2]
+    return stack_samples
+
+def get_splits(index, dataorder='ordered', test_size=0.30, val_size=0.20, random_state=42):
+    """ The training, validation and test samples of the stacks, which are
+        saved with the cache. Output: dict {'keys', 'train', 'val', 'test'}
+        of the stacks, the samples (dataset index, axis, slice), and the
+        metadata. """
+    axes = tuple(index['params']['axes'])
+    key = (dataorder, test_size, val_size, random_state, axes)
+    if key not in index['splits']:
+        splits, metadata = create_splits(get_volume_views(index), dataorder=dataorder, test_size=test_size,
+                                         val_size=val_size, random_state=random_state, axes=axes)
+        index['splits'][key] = (splits, metadata)
+        save_index(get_cachedir(index['params']), index)
+
+    splits, metadata = index['splits'][key]
+    stack_splits = {name: to_stack_samples(samples, splits['keys'], axes)
+                    for name, samples in splits.items() if name != 'keys'}
+    stack_splits['keys'] = sorted(get_stackname(key, axis) for key in splits['keys'] for axis in axes)
+    return stack_splits, splits, metadata
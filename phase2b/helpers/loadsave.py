@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this file to load and save data.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+"""
+
+import os
+import sys
+import SimpleITK as sitk
+import pickle
+import csv
+import json
+from tqdm import tqdm
+
+sys.path.append('../phase1/modules/..')
+from helpers.cache_scans import load_cache, save_cache
+from helpers.catalog import build_catalog, get_datasetnames, get_metadata
+
+
+""" Create directory. """
+def create_dir(PATH):
+    """ Create a directory. """
+    try:
+        os.mkdir(PATH)
+        print('Directory', PATH, 'created' )
+    except FileExistsError:
+        print('Directory', PATH, 'already exists' )
+
+
+""" Loading functions. """
+def load_scans(pathDicom, as_array=False):
+    """ Load the dicom files into sitk with the image series reader.
+    The decoded series is cached (see phase1/helpers/cache_scans.py), so the
+    dicom files are only decoded again when they have changed.
+    Input: path of the directory with the dicom files, and whether to
+    return a numpy array instead of a sitk image.
+    Output: the 3D image.
+    """
+    img = load_cache(pathDicom, as_array=as_array)
+    if img is not None:
+        return img
+
+    reader = sitk.ImageSeriesReader()
+    filenamesDICOM = reader.GetGDCMSeriesFileNames(pathDicom)
+    reader.SetFileNames(filenamesDICOM)
+    img = reader.Execute()
+    save_cache(pathDicom, img)
+
+    if as_array == True:
+        return sitk.GetArrayFromImage(img)
+    return img
+
+def get_data(rootdir, catalog):
+    """ Generate the dataset which includes the cropped, original images and the
+    ground truth images of the datasets. The input is the root directory and
+    the catalog of the datasets. The output is a dictionary with all these
+    3D images; the ground truth is None when a dataset has no ground truth.
+    """
+    datasets = {}
+    datasetnames = get_datasetnames(catalog, 'crop_org')
+    with_gt = get_datasetnames(catalog, 'crop_gt')
+
+    print('Loading: ' + str(len(datasetnames)) + ' datasets')
+    for dataset in tqdm(datasetnames):
+        # Original images (to predict) and ground truth images (mask image of expert)
+        images_org = load_scans(rootdir + dataset + '/crop_org', as_array=True)
+        images_gt = None
+        if dataset in with_gt:
+            images_gt = load_scans(rootdir + dataset + '/crop_gt', as_array=True)
+
+        # Save the images in datasets dictionary
+        datasets.update({dataset : {'org': images_org, 'gt': images_gt}})
+
+    print("datasets created")
+    return datasets
+
+def load_data_pickle(PATH, filename):
+    """ Load data from file using pickle. """
+    with open(PATH + '/' + filename + ".pkl","rb") as f:
+        new_data = pickle.load(f)
+
+    print(filename, "opened")
+    return new_data
+
+
+""" Save functions. """
+def save_data_pickle(PATH, data, filename):
+    """ Save data in pickle file. """
+    with open(PATH + '/' + filename + ".pkl","wb") as f:
+        pickle.dump(data,f)
+    print(filename, "created")
+
+def save_trace(PATH, trace, filename):
+    """ Save the trace per batch of a run in a csv file, and the trace with
+        its summary in a json file. """
+    with open(PATH + '/' + filename + "_trace.csv", "w", newline='') as f:
+        if len(trace.trace) > 0:
+            writer = csv.DictWriter(f, fieldnames=list(trace.trace[0]))
+            writer.writeheader()
+            writer.writerows(trace.trace)
+    with open(PATH + '/' + filename + "_trace.json", "w") as f:
+        json.dump({'summary': trace.summary(), 'trace': trace.trace}, f, indent=1)
+    print(filename + "_trace", "created")
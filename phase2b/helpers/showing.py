@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this file to show some results.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+
+def plot_trace(PATH, trace, filename):
+    """ Plot the trace per batch of a run: the step time, samples per second,
+        the time waited on the data, and the memory. """
+    times = [row['time'] for row in trace]
+    panels = [('step_time', 'Step time (sec)'), ('samples_per_sec', 'Samples per second'),
+              ('wait_time', 'Data wait time (sec)'), ('memory_mb', 'Memory (MB)')]
+
+    fig, axs = plt.subplots(nrows=len(panels), ncols=1, sharex=True, figsize=(8, 10))
+    for ax, (key, ylabel) in zip(axs, panels):
+        ax.plot(times, [row[key] for row in trace], linewidth=0.8)
+        ax.set_ylabel(ylabel)
+    axs[-1].set_xlabel('Time (sec)')
+    axs[0].set_title('Training trace ' + filename)
+
+    plt.tight_layout()
+    plt.savefig(PATH + '/' + filename + '_trace.png', dpi=200)
+    plt.close(fig)
+
+def calc_meanstd(listing, epochs=None):
+    """ Calculate the mean and standard deviation per epoch. The runs which
+        stopped early are extended with their last value. """
+    epochs = epochs if epochs is not None else max(len(lis) for lis in listing)
+    padded = np.array([list(lis) + [lis[-1]] * (epochs - len(lis)) for lis in listing], dtype=float)
+    return padded.mean(axis=0), padded.std(axis=0)
+
+def plot_meanstd(PATH, groups, filename, titlename, ylabel, label='batch size', epochs=None):
+    """ Plot the mean and standard deviation over the runs of each group,
+        e.g. groups {batch size: [curves of the runs]}. """
+    fig = plt.figure()
+    for value, curves in groups.items():
+        means, stds = calc_meanstd(curves, epochs)
+        plt.plot(means, label=label + ' = ' + str(value) + ' (n=' + str(len(curves)) + ')')
+        plt.fill_between(range(len(means)), means - stds, means + stds, alpha=.1)
+
+    plt.title(titlename, fontname="DejaVu Sans")
+    plt.xlabel('Epoch')
+    plt.ylabel(ylabel)
+    plt.legend(loc='best')
+    plt.tight_layout()
+    plt.savefig(PATH + '/' + filename + '.png')
+    plt.close(fig)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this file to calculate the statistics of saved predictions.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The statistics of the U-net:
+- Dice Similarity Coefficient (DSC)
+- Mean Intersection over Union (IoU) over the thresholds 0.5, 0.55, ..., 0.95
+"""
+
+import numpy as np
+
+
+# the thresholds of the mean IoU
+THRESHOLDS = np.arange(0.5, 1.0, 0.05, dtype=np.float32)
+
+
+def calc_dsc(y_true, y_pred):
+    """ Calculate the Dice Similarity Coefficient (DSC). """
+    smooth = 1.0
+    y_true_f = y_true.flatten()
+    y_pred_f = y_pred.flatten()
+    intersection = 2. * np.sum(y_true_f * y_pred_f) + smooth
+    union = np.sum(y_true_f) + np.sum(y_pred_f) + smooth
+    dice = intersection/union
+
+    return dice
+
+def calc_mean_iou(y_true, y_pred, thresholds=THRESHOLDS):
+    """ Calculate the mean IoU of the background and foreground class at all
+        thresholds at once, and average it over the thresholds. A class which
+        is in neither image is left out of the mean (as tf.metrics.mean_iou).
+        Input: the ground truth (0/1) and the predicted probabilities.
+    """
+    y_true_f = np.asarray(y_true).reshape(-1).astype(np.int32) > 0
+    y_pred_f = np.asarray(y_pred, dtype=np.float32).reshape(-1)
+    total = float(y_true_f.size)
+
+    # (thresholds, pixels): the predictions above each threshold
+    predicted = y_pred_f[np.newaxis, :] > np.asarray(thresholds, dtype=np.float32)[:, np.newaxis]
+    sum_pred = predicted.sum(axis=1).astype(np.float64)
+    sum_true = float(y_true_f.sum())
+    true_positives = predicted[:, y_true_f].sum(axis=1).astype(np.float64)
+
+    # the intersections and unions of the foreground and background
+    intersections = np.stack([total - sum_pred - sum_true + true_positives, true_positives])
+    unions = np.stack([total - true_positives, sum_pred + sum_true - true_positives])
+    valid = unions > 0
+    iou = np.where(valid, intersections / np.where(valid, unions, 1.), 0.)
+    return float(np.mean(iou.sum(axis=0) / np.maximum(valid.sum(axis=0), 1)))
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this file to build the U-net model with its metrics.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- The metrics: DSC, mean IoU, recall, precision
+- The callbacks: time per epoch, trace per batch
+- The U-net, and the configurable (lightweight) U-net
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import keras
+from keras.models import Model
+from keras.layers import Input
+from keras.layers.core import Dropout, Lambda
+from keras.layers.convolutional import Conv2D, Conv2DTranspose, SeparableConv2D
+from keras.layers.pooling import MaxPooling2D
+from keras.layers.merge import concatenate
+from keras import backend as K
+
+from modules.calc_statistics import THRESHOLDS
+
+
+""" The metrics. """
+# https://drive.google.com/drive/folders/1HfUdaMsfmTpmmWHz4OlxtPcc0Sk7moEV
+def mean_iou(y_true, y_pred):
+    """ Mean Intersection over Union (IoU) over the thresholds 0.5, ..., 0.95.
+        All thresholds are compared at once by broadcasting, and the
+        intersections and unions are reduced in one op per class, without
+        metric variables or session calls. The value of a batch is the same
+        as of a fresh tf.metrics.mean_iou (see calc_statistics.calc_mean_iou). """
+    thresholds = K.constant(THRESHOLDS.reshape(-1, 1))
+    y_true_f = K.cast(K.cast(K.reshape(y_true, (1, -1)), 'int32') > 0, 'float32')
+    y_pred_f = K.cast(K.reshape(y_pred, (1, -1)) > thresholds, 'float32')
+    total = K.cast(K.shape(y_true_f)[1], 'float32')
+
+    # (thresholds,): the confusion counts at each threshold
+    sum_pred = K.sum(y_pred_f, axis=1)
+    sum_true = K.sum(y_true_f, axis=1)
+    true_positives = K.sum(y_pred_f * y_true_f, axis=1)
+
+    # the intersections and unions of the background and foreground
+    intersections = K.stack([total - sum_pred - sum_true + true_positives, true_positives])
+    unions = K.stack([total - true_positives, sum_pred + sum_true - true_positives])
+    valid = K.cast(unions > 0, 'float32')
+    iou = valid * intersections / K.maximum(unions, 1.)
+    return K.mean(K.sum(iou, axis=0) / K.maximum(K.sum(valid, axis=0), 1.))
+
+# https://www.kaggle.com/c/ultrasound-nerve-segmentation/discussion/21358
+def dice_coef(y_true, y_pred):
+    """ Dice similarity coefficient. """
+    smooth = 1.0
+    y_true_f = K.batch_flatten(y_true)
+    y_pred_f = K.batch_flatten(y_pred)
+    intersection = 2. * K.sum(y_true_f * y_pred_f, axis=1, keepdims=True) + smooth
+    union = K.sum(y_true_f, axis=1, keepdims=True) + K.sum(y_pred_f, axis=1, keepdims=True) + smooth
+    return K.mean(intersection / union)
+
+# https://datascience.stackexchange.com/questions/45165/how-to-get-accuracy-f1-precision-and-recall-for-a-keras-model
+def recall_m(y_true, y_pred):
+    """ Recall. """
+    true_positives = K.sum(K.round(K.clip(y_true * y_pred, 0, 1)))
+    possible_positives = K.sum(K.round(K.clip(y_true, 0, 1)))
+    recall = true_positives / (possible_positives + K.epsilon())
+    return recall
+
+def precision_m(y_true, y_pred):
+    """ Precision. """
+    true_positives = K.sum(K.round(K.clip(y_true * y_pred, 0, 1)))
+    predicted_positives = K.sum(K.round(K.clip(y_pred, 0, 1)))
+    precision = true_positives / (predicted_positives + K.epsilon())
+    return precision
+
+# the custom objects to load a saved model
+CUSTOM_OBJECTS = {'dice_coef': dice_coef, 'mean_iou': mean_iou,
+                  'recall_m': recall_m, 'precision_m': precision_m}
+
+
+class TimeHistory(keras.callbacks.Callback):
+    """ Time the history of the run. """
+    def on_train_begin(self, logs={}):
+        self.times = []
+
+    def on_epoch_begin(self, epoch, logs={}):
+        self.epoch_time_start = time.time()
+
+    def on_epoch_end(self, epoch, logs={}):
+        self.times.append(time.time() - self.epoch_time_start)
+
+
+def get_memory():
+    """ The memory (MB) of the process: the resident memory on Linux,
+        otherwise the peak resident memory. """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024. ** 2
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024. ** 2 if sys.platform == 'darwin' else 1024.)
+
+class TrainingTrace(keras.callbacks.Callback):
+    """ Trace every batch of the run: the step time, samples per second, the
+        time waited on the data, and the memory. The waiting time is measured
+        in the generator when it is given, otherwise it is the time between
+        the end of a batch and the begin of the next batch. """
+    def __init__(self, generator=None):
+        super(TrainingTrace, self).__init__()
+        self.generator = generator
+
+    def on_train_begin(self, logs={}):
+        self.trace = []
+        self.train_start = time.perf_counter()
+        self.batch_end = None
+
+    def on_epoch_begin(self, epoch, logs={}):
+        self.epoch = epoch
+        self.batch_end = None
+
+    def on_batch_begin(self, batch, logs={}):
+        self.batch_start = time.perf_counter()
+        if self.generator is not None:
+            self.wait = getattr(self.generator, 'last_wait', 0.)
+        elif self.batch_end is not None:
+            self.wait = self.batch_start - self.batch_end
+        else:
+            self.wait = 0.
+
+    def on_batch_end(self, batch, logs={}):
+        self.batch_end = time.perf_counter()
+        step = self.batch_end - self.batch_start
+        samples = int(logs.get('size', 0))
+        self.trace.append({'epoch': self.epoch, 'batch': batch,
+                           'time': self.batch_end - self.train_start,
+                           'step_time': step, 'samples': samples,
+                           'samples_per_sec': samples / step if step > 0 else 0.,
+                           'wait_time': self.wait, 'memory_mb': get_memory()})
+
+    def summary(self):
+        """ The summary of the trace. """
+        if len(self.trace) == 0:
+            return {'batches': 0}
+
+        steps = np.array([row['step_time'] for row in self.trace])
+        waits = np.array([row['wait_time'] for row in self.trace])
+        samples = np.array([row['samples'] for row in self.trace])
+        return {'batches': len(self.trace),
+                'mean_step_time': float(steps.mean()),
+                'samples_per_sec': float(samples.sum() / steps.sum()),
+                'total_wait_time': float(waits.sum()),
+                'wait_fraction': float(waits.sum() / (steps.sum() + waits.sum())),
+                'peak_memory_mb': float(max(row['memory_mb'] for row in self.trace))}
+
+
+""" The U-net. """
+def U_net(img_height, img_width, img_channels=1, activation='relu'):
+    """ Build U-Net model. With the height and width None the model is fully
+        convolutional and runs on any size divisible by 32. """
+    inputs = Input((img_height, img_width, img_channels))
+    s = Lambda(lambda x: x / 255) (inputs)
+
+    c1 = Conv2D(16, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (s)
+    c1 = Dropout(0.1) (c1)
+    c1 = Conv2D(16, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (c1)
+    p1 = MaxPooling2D((2, 2)) (c1)
+
+    c2 = Conv2D(32, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (p1)
+    c2 = Dropout(0.1) (c2)
+    c2 = Conv2D(32, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (c2)
+    p2 = MaxPooling2D((2, 2)) (c2)
+
+    c3 = Conv2D(64, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (p2)
+    c3 = Dropout(0.2) (c3)
+    c3 = Conv2D(64, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (c3)
+    p3 = MaxPooling2D((2, 2)) (c3)
+
+    c4 = Conv2D(128, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (p3)
+    c4 = Dropout(0.2) (c4)
+    c4 = Conv2D(128, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (c4)
+    p4 = MaxPooling2D(pool_size=(2, 2)) (c4)
+
+    c5 = Conv2D(256, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (p4)
+    c5 = Dropout(0.3) (c5)
+    c5 = Conv2D(256, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (c5)
+
+    u6 = Conv2DTranspose(128, (2, 2), strides=(2, 2), padding='same') (c5)
+    u6 = concatenate([u6, c4])
+    c6 = Conv2D(128, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (u6)
+    c6 = Dropout(0.2) (c6)
+    c6 = Conv2D(128, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (c6)
+
+    u7 = Conv2DTranspose(64, (2, 2), strides=(2, 2), padding='same') (c6)
+    u7 = concatenate([u7, c3])
+    c7 = Conv2D(64, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (u7)
+    c7 = Dropout(0.2) (c7)
+    c7 = Conv2D(64, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (c7)
+
+    u8 = Conv2DTranspose(32, (2, 2), strides=(2, 2), padding='same') (c7)
+    u8 = concatenate([u8, c2])
+    c8 = Conv2D(32, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (u8)
+    c8 = Dropout(0.1) (c8)
+    c8 = Conv2D(32, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (c8)
+
+    u9 = Conv2DTranspose(16, (2, 2), strides=(2, 2), padding='same') (c8)
+    u9 = concatenate([u9, c1], axis=3)
+    c9 = Conv2D(16, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (u9)
+    c9 = Dropout(0.1) (c9)
+    c9 = Conv2D(16, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (c9)
+
+    outputs = Conv2D(1, (1, 1), activation='sigmoid') (c9)
+
+    model = Model(inputs=[inputs], outputs=[outputs])
+    model.compile(optimizer='adam',
+                  loss='binary_crossentropy',
+                  metrics=['accuracy', dice_coef, mean_iou, recall_m, precision_m])
+    model.summary()
+    return model
+
+
+""" The configurable U-net. """
+# the dropout rates per level of the U-net (the bottom level is 0.3)
+DROPOUT = [0.1, 0.1, 0.2, 0.2, 0.3]
+
+def conv_block(x, filters, dropout, activation='relu', separable=False):
+    """ Two 3x3 convolutions with dropout in between. The convolutions are
+        depthwise separable, except for the first convolution of the input
+        image (one channel). """
+    for i in range(2):
+        if separable == True and K.int_shape(x)[-1] > 1:
+            x = SeparableConv2D(filters, (3, 3), activation=activation, depthwise_initializer='he_normal',
+                                pointwise_initializer='he_normal', padding='same') (x)
+        else:
+            x = Conv2D(filters, (3, 3), activation=activation, kernel_initializer='he_normal', padding='same') (x)
+        if i == 0:
+            x = Dropout(dropout) (x)
+    return x
+
+def U_net_light(img_height=None, img_width=None, img_channels=1, activation='relu',
+                width=1.0, depth=4, separable=False, summary=True):
+    """ Build a U-net with a width multiplier (number of filters 16 * width at
+        the first level), a depth (number of poolings) and depthwise separable
+        convolutions. With width 1, depth 4 and no separable convolutions the
+        model is the same as U_net. """
+    filters = [max(int(round(16 * width * 2 ** level)), 1) for level in range(depth + 1)]
+    dropout = [DROPOUT[min(level, len(DROPOUT) - 2)] for level in range(depth)] + [DROPOUT[-1]]
+
+    inputs = Input((img_height, img_width, img_channels))
+    x = Lambda(lambda x: x / 255) (inputs)
+
+    # the contracting path
+    skips = []
+    for level in range(depth):
+        x = conv_block(x, filters[level], dropout[level], activation, separable)
+        skips.append(x)
+        x = MaxPooling2D((2, 2)) (x)
+
+    x = conv_block(x, filters[depth], dropout[depth], activation, separable)
+
+    # the expanding path
+    for level in reversed(range(depth)):
+        x = Conv2DTranspose(filters[level], (2, 2), strides=(2, 2), padding='same') (x)
+        x = concatenate([x, skips[level]], axis=3)
+        x = conv_block(x, filters[level], dropout[level], activation, separable)
+
+    outputs = Conv2D(1, (1, 1), activation='sigmoid') (x)
+
+    model = Model(inputs=[inputs], outputs=[outputs])
+    model.compile(optimizer='adam',
+                  loss='binary_crossentropy',
+                  metrics=['accuracy', dice_coef, mean_iou, recall_m, precision_m])
+    if summary == True:
+        model.summary()
+    return model
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this file to export a trained U-net to TensorFlow Lite (float32,
+# float16 or int8) and to run the exported model on the CPU.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- Post-training export to TensorFlow Lite: fp32, fp16, int8
+- The exported model with the predict function of a keras model
+"""
+
+import numpy as np
+import tensorflow as tf
+from keras import backend as K
+
+
+# the precisions of the export
+PRECISIONS = ['fp32', 'fp16', 'int8']
+
+
+def get_converter(model):
+    """ The TensorFlow Lite converter of a keras model (with a fixed input size). """
+    if hasattr(tf.lite.TFLiteConverter, 'from_session'):
+        return tf.lite.TFLiteConverter.from_session(K.get_session(), model.inputs, model.outputs)
+    return tf.lite.TFLiteConverter.from_keras_model(model)
+
+def convert_tflite(model, precision='fp32', representative=None):
+    """ Convert a keras model to a TensorFlow Lite model.
+        - fp16: the weights are stored as float16.
+        - int8: the weights (and, with representative input batches, the
+          activations) are quantized to int8; the input and output stay float.
+        Older versions of TensorFlow only support the int8 weights.
+        Output: the TensorFlow Lite model (bytes).
+    """
+    if precision not in PRECISIONS:
+        raise ValueError("The precision " + str(precision) + " does not exist.")
+
+    converter = get_converter(model)
+    if precision != 'fp32':
+        if hasattr(tf.lite, 'Optimize'):
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            if precision == 'fp16':
+                converter.target_spec.supported_types = [tf.float16]
+            elif representative is not None:
+                converter.representative_dataset = lambda: ([frame[np.newaxis]] for frame in representative)
+        elif precision == 'int8':
+            converter.post_training_quantize = True
+        else:
+            raise ValueError("The fp16 export needs a newer version of TensorFlow.")
+    return converter.convert()
+
+def save_tflite(PATH, tflite_model, filename):
+    """ Save a TensorFlow Lite model. """
+    with open(PATH + '/' + filename + ".tflite", "wb") as f:
+        f.write(tflite_model)
+    print(filename + ".tflite", "created")
+
+
+class TFLiteModel():
+    """
+    This is a class that runs a TensorFlow Lite model on the CPU with the same
+    predict function as a keras model, so it can be used in the inference of
+    the 3D images (predict_volumes.segment_volume).
+    """
+
+    def __init__(self, tflite_model, threads=None):
+
+        # the interpreter and the input and output tensors
+        try:
+            self.interpreter = tf.lite.Interpreter(model_content=tflite_model, num_threads=threads)
+        except TypeError:
+            # older versions of TensorFlow choose the number of threads
+            self.interpreter = tf.lite.Interpreter(model_content=tflite_model)
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batchsize = None
+
+    def predict(self, frames, batch_size=None, verbose=0):
+        """ Predict a batch of frames (n, height, width, 1). """
+        if self.batchsize != len(frames):
+            self.interpreter.resize_tensor_input(self.input['index'], [len(frames)] + list(frames.shape[1:]))
+            self.interpreter.allocate_tensors()
+            self.batchsize = len(frames)
+
+        self.interpreter.set_tensor(self.input['index'], frames.astype(self.input['dtype'], copy=False))
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output['index'])
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this file to generate the 2D slices of the 3D images in batches,
+# and to split the datasets in a training, validation and test set.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- Streaming generator of padded 2D slices in 3 directions
+- Shape buckets: slices padded to the size of their bucket
+- Dataorders: fixed, ordered, mixed
+"""
+
+import random
+import time
+import threading
+import queue
+import numpy as np
+
+
+""" The 2D slices. """
+def get_slice(volume, axis, index):
+    """ Get the 2D slice of a 3D image in one of the 3 directions (view, no copy). """
+    if axis == 0:
+        return volume[index, :, :]
+    elif axis == 1:
+        return volume[:, index, :]
+    return volume[:, :, index]
+
+def get_keys(datasets):
+    """ The keys of the datasets; the dataset index of a sample is the
+        position of its dataset in this list. """
+    return sorted(datasets)
+
+def get_samples(datasets, keylist, axes=(0, 1, 2)):
+    """ All the 2D slices of the datasets in the keylist in the directions of
+        the axes, as integer rows (dataset index, axis, slice).
+        Output: int32 array (number of slices, 3). """
+    keys = get_keys(datasets)
+    parts = [np.empty((0, 3), dtype=np.int32)]
+    for key in keylist:
+        for axis in axes:
+            shape_size = datasets[key]['org'].shape[axis]
+            part = np.empty((shape_size, 3), dtype=np.int32)
+            part[:, 0] = keys.index(key)
+            part[:, 1] = axis
+            part[:, 2] = np.arange(shape_size)
+            parts.append(part)
+    return np.concatenate(parts)
+
+def calc_processable_sizes(size):
+    """ Calculate sizes which can be processed in the U-net divisible by 32. """
+    new_size = np.ceil(size / 32) * 32
+    return int(new_size)
+
+def get_sizes(datasets):
+    """ Get the highest width and height of the 2D slices, from the shapes of
+        the 3D images only. Output: (width, height) divisible by 32. """
+    max_width = 0
+    max_height = 0
+
+    # the slices of axis 0, 1, 2 have the shapes (y,x), (z,x), (z,y)
+    for key, images in datasets.items():
+        z, y, x = images['org'].shape
+        max_width = max(max_width, x, y)
+        max_height = max(max_height, y, z)
+
+    # get the (bigger) closest width and height divisible by 32
+    print('heighest width and height of images:', max_width, max_height)
+    max_width = calc_processable_sizes(max_width)
+    max_height = calc_processable_sizes(max_height)
+
+    print('final (w,h)', max_width, max_height)
+    return max_width, max_height
+
+def get_slice_shape(shape, axis):
+    """ The shape (height, width) of the 2D slices of a 3D image in one direction. """
+    return tuple(size for i, size in enumerate(shape) if i != axis)
+
+def get_bucket_size(slice_shape):
+    """ The size (width, height) divisible by 32 of the bucket of a 2D slice. """
+    height, width = slice_shape
+    return calc_processable_sizes(width), calc_processable_sizes(height)
+
+def get_slice_shapes(datasets, samples):
+    """ The shape (height, width) of the 2D slice of every sample.
+        Output: int array (number of samples, 2). """
+    keys = get_keys(datasets)
+    shapes = np.array([[get_slice_shape(datasets[key]['org'].shape, axis) for axis in range(3)]
+                       for key in keys], dtype=np.int64).reshape(len(keys), 3, 2)
+    return shapes[samples[:, 0], samples[:, 1]]
+
+def get_buckets(datasets, samples):
+    """ Group the samples (dataset index, axis, slice) in buckets of slices
+        with the same size divisible by 32.
+        Output: dict {(width, height): samples}. """
+    sizes = (np.ceil(get_slice_shapes(datasets, samples) / 32.) * 32).astype(int)
+    buckets = {}
+    for height, width in np.unique(sizes, axis=0):
+        rows = (sizes[:, 0] == height) & (sizes[:, 1] == width)
+        buckets[(int(width), int(height))] = samples[rows]
+    return dict(sorted(buckets.items()))
+
+def calc_padded_pixels(datasets, samples, size=None):
+    """ Count the pixels of the 2D slices and of the padded 2D slices, with one
+        global size (width, height) or with the buckets (size is None). """
+    shapes = get_slice_shapes(datasets, samples)
+    pixels = int(np.sum(shapes[:, 0] * shapes[:, 1]))
+    if size is not None:
+        return pixels, len(samples) * size[0] * size[1]
+    sizes = np.ceil(shapes / 32.) * 32
+    return pixels, int(np.sum(sizes[:, 0] * sizes[:, 1]))
+
+def pad_into(buffer, image):
+    """ Copy an image in the middle of a zero buffer (the padding). """
+    h, w = image.shape[:2]
+    pad_top = (buffer.shape[0] - h) // 2
+    pad_left = (buffer.shape[1] - w) // 2
+    buffer[pad_top:pad_top + h, pad_left:pad_left + w] = image
+
+
+""" Dataorders: training, validation and test samples. """
+def check_groundtruth(datasets):
+    """ Check the ground truth images and return the key datasets of dictionary. """
+    keys_train = [key for key, images in datasets.items() if images['gt'] is not None]
+    keys_test = [key for key, images in datasets.items() if images['gt'] is None]
+    return keys_train, keys_test
+
+def define_datasizes(datasets, test_size):
+    """ Define the number of datasets used in the training and test dataset. """
+    total_length = len(datasets)
+    nr_testing = round(total_length * test_size)
+    nr_training = total_length - nr_testing
+
+    return nr_training, nr_testing
+
+def split_samples(samples, test_size, random_state):
+    """ Shuffle the samples (the rows of indices) and split them in two parts. """
+    order = np.random.RandomState(random_state).permutation(len(samples))
+    nr_testing = int(np.ceil(len(samples) * test_size))
+    return samples[order[nr_testing:]], samples[order[:nr_testing]]
+
+def create_splits(datasets, dataorder='ordered', test_size=0.30, val_size=0.20, random_state=42,
+                  axes=(0, 1, 2)):
+    """ Dependent on the dataorder, create the training, validation and
+        test samples as rows (dataset index, axis, slice); the keys of the
+        dataset indices are saved with the splits.
+        - fixed: the datasets with ground truth become training images,
+          the datasets with no ground truth the test images.
+        - ordered: the images of each dataset are kept in the same set.
+        - mixed: the images of all datasets are mixed.
+        The training samples are split again in a training and validation
+        set, with a random state different than the previous one. Only the
+        slices in the directions of the axes are used.
+        Output: dict {'keys', 'train', 'val', 'test'} and the metadata.
+    """
+    print('Dataorder: ', dataorder)
+    keys_train, keys_test = check_groundtruth(datasets)
+
+    if dataorder == 'fixed':
+        train = get_samples(datasets, keys_train, axes)
+        test = get_samples(datasets, keys_test, axes)
+        metadata = {'Training datasets': keys_train, 'Testing datasets': keys_test}
+    elif dataorder == 'ordered':
+        # randomly put a whole dataset in the training or test set
+        nr_training, nr_testing = define_datasizes(keys_train, test_size)
+        keys_training = sorted(random.Random(random_state).sample(keys_train, nr_training))
+        keys_testing = sorted(set(keys_train) - set(keys_training))
+        train = get_samples(datasets, keys_training, axes)
+        test = get_samples(datasets, keys_testing, axes)
+        metadata = {'Training datasets': keys_training, 'Testing datasets': keys_testing}
+    elif dataorder == 'mixed':
+        train, test = split_samples(get_samples(datasets, keys_train, axes), test_size, random_state)
+        metadata = 'no metadata'
+    else:
+        raise ValueError("The dataorder " + str(dataorder) + " does not exist.")
+
+    train, val = split_samples(train, val_size, int(random_state + 1))
+    splits = {'keys': get_keys(datasets), 'train': train, 'val': val, 'test': test}
+
+    print('Training images:', len(train), 'validation images:', len(val), 'test images:', len(test))
+    return splits, metadata
+
+
+""" The streaming generator. """
+class SliceGenerator():
+    """
+    This is a class that generates batches of padded 2D slices (and masks)
+    on the fly from the 3D images. Only one batch buffer per prefetched
+    batch is in memory, independent of the number of datasets. The batches
+    are made in a background thread.
+    With size None the slices are grouped in buckets of the same size
+    divisible by 32, and each batch is drawn from one bucket: the slices are
+    only padded to the size of their bucket instead of the global maximum.
+    """
+
+    def __init__(self, datasets, samples, size=None, batchsize=32, shuffle=True,
+                 masks=True, prefetch=4, random_state=42):
+
+        # the 3D images and the samples (dataset index, axis, slice) per size
+        self.datasets = datasets
+        self.keys = get_keys(datasets)
+        self.samples = np.asarray(samples, dtype=np.int32).reshape(-1, 3)
+        self.size = size
+        if size is None:
+            self.groups = get_buckets(datasets, self.samples)
+        else:
+            self.groups = {tuple(size): self.samples}
+        self.batchsize = batchsize
+        self.shuffle = shuffle
+        self.masks = masks
+        self.random_state = random_state
+
+        # the background thread with the prefetched batches
+        self.prefetch = prefetch
+        self.queue = None
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.last_wait = 0.
+
+    def __len__(self):
+        """ The number of batches in one epoch. """
+        return int(sum(np.ceil(len(group) / float(self.batchsize)) for group in self.groups.values()))
+
+    def epoch_batches(self, epoch):
+        """ The batches (size, samples) of an epoch: the samples within a
+            bucket and the order of the batches are reshuffled per epoch. """
+        rng = np.random.RandomState(self.random_state + epoch)
+        batches = []
+        for size, group in self.groups.items():
+            order = np.arange(len(group))
+            if self.shuffle == True:
+                rng.shuffle(order)
+            for start in range(0, len(order), self.batchsize):
+                batches.append((size, group[order[start:start + self.batchsize]]))
+
+        if self.shuffle == True:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        return batches
+
+    def make_batch(self, size, batch_samples):
+        """ Make one batch: the slices are padded inside the batch buffer. """
+        width, height = size
+        frames = np.zeros((len(batch_samples), height, width, 1), dtype=np.float32)
+        masks = np.zeros((len(batch_samples), height, width, 1), dtype=np.float32) if self.masks else None
+
+        for i, (dataset, axis, index) in enumerate(batch_samples):
+            images = self.datasets[self.keys[dataset]]
+            pad_into(frames[i, :, :, 0], get_slice(images['org'], axis, index))
+            if self.masks == True:
+                pad_into(masks[i, :, :, 0], get_slice(images['gt'], axis, index))
+
+        if self.masks == True:
+            return frames, masks
+        return frames
+
+    def generate_batches(self):
+        """ Generate all batches, epoch after epoch. """
+        epoch = 0
+        while True:
+            for size, batch_samples in self.epoch_batches(epoch):
+                yield self.make_batch(size, batch_samples)
+            epoch += 1
+
+    def put(self, item):
+        """ Put an item in the queue, unless the generator is stopped.
+            Output: False when the generator is stopped. """
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker(self):
+        """ Fill the queue with batches until the generator is stopped. An
+            error is put in the queue, so it is raised by __next__. """
+        try:
+            for batch in self.generate_batches():
+                if self.put(batch) == False:
+                    return
+        except Exception as error:
+            self.put(error)
+
+    def start(self):
+        """ Start the background thread. """
+        if self.thread is None:
+            self.queue = queue.Queue(maxsize=self.prefetch)
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.worker, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """ Stop the background thread. """
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """ The next batch; the time waited on the queue is kept (last_wait). """
+        self.start()
+        begin = time.perf_counter()
+        while True:
+            try:
+                batch = self.queue.get(timeout=1.)
+                break
+            except queue.Empty:
+                if not self.thread.is_alive() and self.queue.empty():
+                    raise RuntimeError("The thread of the batches stopped without a batch.")
+        self.last_wait = time.perf_counter() - begin
+
+        # the error of the thread of the batches
+        if isinstance(batch, Exception):
+            self.thread.join()
+            self.thread = None
+            raise batch
+        return batch
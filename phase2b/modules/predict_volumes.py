@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this file to segment whole 3D images with a trained U-net:
+# the 2D slices of the 3 directions are predicted in batches, and the three
+# probability volumes are fused into one 3D mask.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- Batched inference of the 2D slices in 3 directions (CPU)
+- The slices are preprocessed as in the training: padded, or resized (and
+  the predictions resized back)
+- Fusion of the probability volumes: mean or majority
+"""
+
+import time
+import numpy as np
+
+from modules.generate_slices import get_slice, get_slice_shape, get_bucket_size, pad_into
+from modules.preprocess_slices import get_stack, resize_stack
+
+
+# the stages of which the latency is measured
+STAGES = ['slice', 'predict', 'reassemble', 'fuse']
+
+
+""" The CPU session. """
+def configure_cpu(intra_threads=0, inter_threads=0):
+    """ Run the model on the CPU with the given number of threads within and
+        between the operations (0: chosen by tensorflow). """
+    import tensorflow as tf
+    from keras import backend as K
+
+    config = tf.ConfigProto(intra_op_parallelism_threads=intra_threads,
+                            inter_op_parallelism_threads=inter_threads,
+                            device_count={'GPU': 0})
+    K.set_session(tf.Session(config=config))
+
+
+""" The inference. """
+def crop_from(buffer, shape):
+    """ Crop the image of the given shape from the middle of a padded buffer
+        (the inverse of pad_into). """
+    h, w = shape
+    pad_top = (buffer.shape[0] - h) // 2
+    pad_left = (buffer.shape[1] - w) // 2
+    return buffer[pad_top:pad_top + h, pad_left:pad_left + w]
+
+def predict_axis(model, volume, axis, size, batchsize, probabilities, timings, mode='pad'):
+    """ Predict all 2D slices of a 3D image in one direction. The batches have
+        a fixed size (the last batch is filled up with zeros), and the
+        predictions are written back into the probability volume. The mode
+        is the preprocessing of the training:
+        - pad: the slices are padded to the size; with size None to the
+          size of their bucket.
+        - resize: the slices are resized to the size, and the predictions
+          are resized back to the shape of the slices.
+    """
+    if mode not in ['pad', 'resize']:
+        raise ValueError("The mode " + str(mode) + " does not exist.")
+    if size is None:
+        if mode == 'resize':
+            raise ValueError("The resize mode needs a size.")
+        size = get_bucket_size(get_slice_shape(volume.shape, axis))
+    width, height = size
+    frames = np.zeros((batchsize, height, width, 1), dtype=np.float32)
+    stack, probability_stack = get_stack(volume, axis), get_stack(probabilities, axis)
+
+    for start in range(0, volume.shape[axis], batchsize):
+        indices = range(start, min(start + batchsize, volume.shape[axis]))
+
+        # the padded or resized slices in the batch buffer
+        begin = time.perf_counter()
+        frames[:] = 0
+        if mode == 'resize':
+            resize_stack(stack[indices.start:indices.stop], (height, width), out=frames[:len(indices), :, :, 0])
+        else:
+            for i, index in enumerate(indices):
+                pad_into(frames[i, :, :, 0], get_slice(volume, axis, index))
+        timings['slice'] += time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        predictions = model.predict(frames, batch_size=batchsize)
+        timings['predict'] += time.perf_counter() - begin
+
+        # remove the padding (or resize back) and put the slices back in 3D
+        begin = time.perf_counter()
+        if mode == 'resize':
+            resize_stack(predictions[:len(indices), :, :, 0], stack.shape[1:],
+                         out=probability_stack[indices.start:indices.stop])
+        else:
+            for i, index in enumerate(indices):
+                target = get_slice(probabilities, axis, index)
+                target[...] = crop_from(predictions[i, :, :, 0], target.shape)
+        timings['reassemble'] += time.perf_counter() - begin
+
+def fuse_probabilities(probabilities, fusion='mean', threshold=0.5):
+    """ Fuse the probability volumes of the 3 directions into one binary mask.
+        - mean: the mean probability is above the threshold.
+        - majority: the majority of the directions is above the threshold.
+    """
+    if fusion == 'mean':
+        mean = probabilities[0].copy()
+        for probability in probabilities[1:]:
+            mean += probability
+        mean /= len(probabilities)
+        return (mean > threshold).astype(np.uint8)
+    elif fusion == 'majority':
+        votes = np.zeros(probabilities[0].shape, dtype=np.uint8)
+        for probability in probabilities:
+            votes += probability > threshold
+        return (votes * 2 > len(probabilities)).astype(np.uint8)
+    raise ValueError("The fusion " + str(fusion) + " does not exist.")
+
+def segment_volume(model, volume, size=None, batchsize=64, axes=(0, 1, 2), fusion='mean', threshold=0.5,
+                   mode='pad'):
+    """ Segment a whole 3D image: predict the slices in each direction and
+        fuse the probability volumes. The size (width, height) is the fixed
+        size of the model, or None for a fully convolutional model which runs
+        at the bucket size of each direction; the mode is the preprocessing
+        of the training (pad or resize). Output: the 3D mask (uint8, same
+        shape as the 3D image) and the latency (sec) per stage.
+    """
+    timings = dict.fromkeys(STAGES, 0.)
+    probabilities = []
+    for axis in axes:
+        probability = np.empty(volume.shape, dtype=np.float32)
+        predict_axis(model, volume, axis, size, batchsize, probability, timings, mode=mode)
+        probabilities.append(probability)
+
+    begin = time.perf_counter()
+    mask = fuse_probabilities(probabilities, fusion=fusion, threshold=threshold)
+    timings['fuse'] += time.perf_counter() - begin
+
+    return mask, timings
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this file to resize and pad whole stacks of 2D slices at once,
+# instead of one slice at a time.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- Resize a stack of 2D slices with two interpolation matrices (bilinear)
+- Resize a stack of masks with threshold semantics
+- Pad a stack of 2D slices into one preallocated array
+- Note: the resize is not the default call of skimage in the notebook: it
+  repeats the edge pixels (instead of reflect) and has no anti-aliasing
+  when downsampling, and the values keep their range (instead of [0, 1]).
+  It equals skimage's resize with order=1, mode='edge', anti_aliasing=False
+  and preserve_range=True (see 4_bench_preprocess.py for the differences)
+"""
+
+import numpy as np
+
+
+""" The interpolation matrices. """
+def interpolation_matrix(in_size, out_size):
+    """ The (out_size, in_size) matrix of the bilinear interpolation along one
+        axis, with the pixel centres aligned as in skimage.transform.resize
+        and the edge pixels repeated outside the image. """
+    matrix = np.zeros((out_size, in_size), dtype=np.float32)
+    coords = (np.arange(out_size) + 0.5) * (in_size / float(out_size)) - 0.5
+    coords = np.clip(coords, 0, in_size - 1)
+
+    lower = np.floor(coords).astype(int)
+    upper = np.minimum(lower + 1, in_size - 1)
+    weight = (coords - lower).astype(np.float32)
+
+    rows = np.arange(out_size)
+    np.add.at(matrix, (rows, lower), 1 - weight)
+    np.add.at(matrix, (rows, upper), weight)
+    return matrix
+
+
+""" The resize functions. """
+def resize_stack(stack, output_shape, out=None):
+    """ Resize a stack of 2D slices (n, h, w) to (n, height, width) in one
+        vectorized call: out = Ry @ stack @ Rx.T. The values keep their range
+        (no scaling to [0, 1]). Output: float32, or written into out. """
+    height, width = output_shape
+    matrix_y = interpolation_matrix(stack.shape[1], height)
+    matrix_x = interpolation_matrix(stack.shape[2], width)
+
+    result = np.matmul(matrix_y, np.matmul(stack.astype(np.float32, copy=False), matrix_x.T))
+    if out is None:
+        return result
+    if np.issubdtype(out.dtype, np.integer):
+        np.rint(result, out=result)
+        limits = np.iinfo(out.dtype)
+        np.clip(result, limits.min, limits.max, out=result)
+    out[...] = result
+    return out
+
+def resize_masks_stack(masks, output_shape, out=None, threshold=0.5):
+    """ Resize a stack of binary masks (n, h, w): a pixel of the resized mask
+        is foreground when its interpolated value is above the threshold.
+        Output: uint8 (0 or 1), or written into out. """
+    binary = (masks > 0).astype(np.float32)
+    result = resize_stack(binary, output_shape) > threshold
+    if out is None:
+        return result.astype(np.uint8)
+    out[...] = result
+    return out
+
+
+""" The padding. """
+def pad_stack(stack, size, out=None):
+    """ Pad a stack of 2D slices (n, h, w) with zeros in the middle of an
+        array (n, height, width), the size is (width, height). The output
+        array is allocated once (or given). """
+    width, height = size
+    n, h, w = stack.shape
+    if out is None:
+        out = np.zeros((n, height, width), dtype=stack.dtype)
+    else:
+        out[...] = 0
+
+    pad_top = (height - h) // 2
+    pad_left = (width - w) // 2
+    out[:, pad_top:pad_top + h, pad_left:pad_left + w] = stack
+    return out
+
+
+""" The 3D images. """
+def get_stack(volume, axis):
+    """ The 2D slices of a 3D image in one direction as a stack (a view). """
+    return np.moveaxis(volume, axis, 0)
+
+def preprocess_volume(volume, output_shape, axes=(0, 1, 2), masks=False, dtype=np.float32):
+    """ Resize the 2D slices of a 3D image in the given directions into one
+        preallocated array (n, height, width, 1), n the number of slices. """
+    total = sum(volume.shape[axis] for axis in axes)
+    out = np.empty((total, output_shape[0], output_shape[1], 1), dtype=np.uint8 if masks else dtype)
+
+    start = 0
+    for axis in axes:
+        stack = get_stack(volume, axis)
+        target = out[start:start + len(stack), :, :, 0]
+        if masks == True:
+            resize_masks_stack(stack, output_shape, out=target)
+        else:
+            resize_stack(stack, output_shape, out=target)
+        start += len(stack)
+    return out
+
+def preprocess_datasets(datasets, output_shape=(128, 128), axes=(0, 1, 2), dtype=np.float32):
+    """ Resize all 2D slices of the 3D images and the ground truth images.
+        Output: dict {dataset: {'org': frames, 'gt': masks or None}}. """
+    results = {}
+    for key, images in datasets.items():
+        frames = preprocess_volume(images['org'], output_shape, axes, dtype=dtype)
+        masks = None
+        if images['gt'] is not None:
+            masks = preprocess_volume(images['gt'], output_shape, axes, masks=True)
+        results[key] = {'org': frames, 'gt': masks}
+    return results
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the deep learning segmentation approach (U-net).
+# You can run this file to run a grid of U-net experiments concurrently, each
+# training in its own process with a part of the CPU threads.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 2b: The deep learning segmentation approach (U-net).
+- Grid of experiments: batch size, dataorder, activation function, random state
+- Results store: one pickle with the configuration, metrics and timings per run
+"""
+
+import os
+import sys
+import time
+import pickle
+import itertools
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+
+""" The grid. """
+def expand_grid(grid):
+    """ Expand a grid {parameter: [values]} into the configurations of all
+        combinations, in the order of the grid. """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+
+def get_runname(config):
+    """ The name of a run, e.g. 32_ordered_seed42 (the activation function is
+        already in the filename of the run). """
+    return str(config['batchsize']) + '_' + config['dataorder'] + '_seed' + str(config['seed'])
+
+def get_filename(config):
+    """ The filename of the results of a run, e.g.
+        experimentmodel_unet_relu_org32_ordered_seed42. """
+    return 'experimentmodel_unet_' + config['activation'] + '_org' + get_runname(config)
+
+
+""" The results store. """
+def load_store(PATH):
+    """ Load the results store using pickle. """
+    try:
+        with open(PATH, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+
+def save_store(PATH, store):
+    """ Save the results store using pickle (atomic). """
+    with open(PATH + '.tmp', 'wb') as f:
+        pickle.dump(store, f)
+    os.replace(PATH + '.tmp', PATH)
+
+def is_complete(store, config):
+    """ Whether a run of the configuration is already complete. """
+    entry = store.get(get_filename(config))
+    return entry is not None and entry['status'] == 'complete'
+
+
+""" The runner. """
+def run_job(config, threads, script, logdir):
+    """ Train one configuration in its own process with a number of threads.
+        Output: the return code and the runtime (sec). """
+    arguments = [sys.executable, script, str(config['batchsize']), config['dataorder'], config['activation'],
+                 str(config['seed']), str(threads), get_runname(config)]
+
+    # limit the threads of the numerical libraries of the process as well
+    env = dict(os.environ, OMP_NUM_THREADS=str(threads), MKL_NUM_THREADS=str(threads))
+
+    start = time.perf_counter()
+    with open(os.path.join(logdir, get_filename(config) + '.log'), 'w') as log:
+        returncode = subprocess.call(arguments, stdout=log, stderr=subprocess.STDOUT, env=env,
+                                     cwd=os.path.dirname(os.path.abspath(script)))
+    return returncode, time.perf_counter() - start
+
+def run_experiments(grid, script, store_path, datapath, logdir, parallel=2, threads=None):
+    """ Run all configurations of the grid which are not complete yet,
+        parallel at the same time. The threads of the CPU are divided over the
+        parallel runs. After each run its metrics and timings are read from
+        its pickle and written in the results store.
+        Output: the results store.
+    """
+    store = load_store(store_path)
+    configs = [config for config in expand_grid(grid) if not is_complete(store, config)]
+    print('experiments:', len(expand_grid(grid)), 'to run:', len(configs))
+    if threads is None:
+        threads = max(1, (os.cpu_count() or 1) // parallel)
+
+    lock = threading.Lock()
+
+    def run(config):
+        filename = get_filename(config)
+        print('start:', filename, '(' + str(threads) + ' threads)')
+        returncode, runtime = run_job(config, threads, script, logdir)
+
+        entry = {'config': config, 'threads': threads, 'runtime': runtime, 'status': 'failed'}
+        if returncode == 0:
+            with open(os.path.join(datapath, filename + '.pkl'), 'rb') as f:
+                results = pickle.load(f)
+            # the splits stay in the pickle of the run
+            entry['results'] = {key: value for key, value in results.items() if key != 'splits'}
+            entry['status'] = 'complete'
+        print('finished:', filename, entry['status'], '%.1f sec' %runtime)
+
+        with lock:
+            store[filename] = entry
+            save_store(store_path, store)
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        list(executor.map(run, configs))
+    return store
+
+
+""" Reading the store. """
+def select_runs(store, metric, group, **fixed):
+    """ Select the curves of a metric of the complete runs, grouped by one
+        parameter of the configuration (e.g. the batch size), for the runs
+        with the fixed parameters (e.g. dataorder='ordered').
+        Output: dict {value of the group: [curves]}. """
+    groups = {}
+    for entry in store.values():
+        config = entry['config']
+        if entry['status'] != 'complete' or any(config[key] != value for key, value in fixed.items()):
+            continue
+        groups.setdefault(config[group], []).append(list(entry['results'][metric]))
+    return dict(sorted(groups.items()))
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisation in VTK.
+# You can run this main file to render all visualisations offscreen without
+# questions, e.g. with 4 worker processes
+# python 3_batch_VTK.py 4
+# or only the jobs of a json file (a list of jobs, e.g.
+# [{"visualise": "mask", "dataset": "dataset2", "model": "heuristic"}], the
+# masks are rendered as surface with "render": "surface")
+# python 3_batch_VTK.py 4 jobs.json
+# and with a volume mapper (auto, gpu, fixedpoint, smart; default auto)
+# python 3_batch_VTK.py 4 jobs.json fixedpoint
+# The visualisations of which the PNG already exists are skipped.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+- Batch rendering of the visualisations offscreen to results_VTK_img
+"""
+
+import os
+import sys
+import json
+
+from classes.mapper import MAPPERS
+from helpers.loadsave import *
+from modules.render_jobs import *
+
+
+# Constants
+RESULTS_BATCH_FILE = os.path.join(RESULTS_PATH, 'batch_VTK.txt')
+
+# the visualisations of every dataset
+VOLUME_IMAGES = ['real_org', 'crop_org', 'crop_smoothed']
+MASK_IMAGES = ['org', 'smoothed']
+HEURISTICS = ['ws_semiauto', 'ws_fullyauto']
+ACTIVATIONS = ['relu', 'elu']
+SIMULATIONS = ['1', '2', '3', '4', '5', '6']
+
+
+def get_jobs(datasets):
+    """ All the visualisations of the datasets. """
+    jobs = []
+    for dataset in datasets:
+        for image in VOLUME_IMAGES:
+            jobs.append(get_job(visualise='volume', dataset=dataset, image=image))
+        for image in MASK_IMAGES:
+            jobs.append(get_job(visualise='mask', dataset=dataset, image=image, model='ground_truth'))
+            for heuristic in HEURISTICS:
+                jobs.append(get_job(visualise='mask', dataset=dataset, image=image, model='heuristic',
+                                    heuristic=heuristic))
+        # the surfaces of the masks of the original images
+        jobs.append(get_job(visualise='mask', dataset=dataset, model='ground_truth', render='surface'))
+        for heuristic in HEURISTICS:
+            jobs.append(get_job(visualise='mask', dataset=dataset, model='heuristic', heuristic=heuristic,
+                                render='surface'))
+        # the U-net images are of the original images
+        for activation in ACTIVATIONS:
+            for simulation in SIMULATIONS:
+                jobs.append(get_job(visualise='mask', dataset=dataset, image='org', model='unet',
+                                    activation=activation, simulation=simulation))
+        jobs.append(get_job(visualise='tool', dataset=dataset))
+    return jobs
+
+
+def main():
+    # the number of worker processes, and the optional json file of the jobs
+    # and mapper
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    arguments = sys.argv[2:]
+    mapper = 'auto'
+    if len(arguments) > 0 and arguments[-1] in MAPPERS:
+        mapper = arguments.pop()
+    if len(arguments) > 0:
+        with open(arguments[0]) as f:
+            jobs = [get_job(**job) for job in json.load(f)]
+    else:
+        # the datasets: the directories with a cropped original image
+        jobs = get_jobs([name for name in sorted(os.listdir(DATA_PATH))
+                         if os.path.isdir(os.path.join(DATA_PATH, name, 'crop_org'))])
+
+    print('Create directories')
+    create_folder(RESULTS_PATH)
+    create_folder(RESULTS_IMG_PATH)
+    create_folder(RESULTS_META_PATH)
+
+    results = run_batch(jobs, RESULTS_IMG_PATH, processes=processes, mapper=mapper)
+
+    with open(RESULTS_BATCH_FILE, 'w') as file:
+        file.write("job status time(sec) stages mapper\n")
+        for name, status, runtime, timings in results:
+            file.write("%s %s %.2f %s\n" %(name, status, runtime, timings))
+
+    failed = [name for name, status, runtime, timings in results if status != 'complete']
+    print('rendered:', len(results) - len(failed), 'failed:', len(failed))
+    print('results saved in:' + RESULTS_IMG_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisation in VTK.
+# You can run this main file to compare the conversion of numpy arrays to VTK
+# with two copies (flipud, fliplr, deep copy) to the conversion with one copy
+# or in place (no copy), on the real original images.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+- Benchmark of the numpy to VTK conversion: time and extra memory
+- Check of the placement of the voxels (round trip)
+"""
+
+import os
+import time
+import multiprocessing
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+from classes.multiframe import MultiFrame
+from helpers.loadsave import *
+from helpers.memory import *
+from modules.convert_nptovtk import *
+
+
+# Constants
+DATA_PATH = '../../datasets/'
+RESULTS_PATH = 'results_VTK'
+RESULTS_BENCH_PATH = os.path.join(RESULTS_PATH, 'results_VTK_bench')
+
+# a synthetic volume of the size of a complete ultrasound recording
+SYNTHETIC_SHAPE = (256, 384, 384)
+METHODS = ['deep', 'copy', 'inplace']
+REPEATS = 5
+
+
+def convert_deep(source_numpy_array, metadata):
+    """ The conversion with flipud, fliplr and a deep copy (as before). """
+    source_numpy_array = np.fliplr(np.flipud(source_numpy_array))
+    depth_array = numpy_support.numpy_to_vtk(source_numpy_array.ravel(), deep=True)
+    image = vtk.vtkImageData()
+    image.SetDimensions(metadata['ConstPixelDims'])
+    image.GetPointData().SetScalars(depth_array)
+    return image
+
+def get_volume(name):
+    """ The real original image of a dataset, or the synthetic volume. """
+    if name == 'synthetic':
+        return np.random.RandomState(42).randint(0, 255, size=SYNTHETIC_SHAPE, dtype=np.uint8)
+    volume = MultiFrame(os.path.join(DATA_PATH, name, 'real_org', 'original.dcm'))
+    return volume[:].astype(volume.dtype.newbyteorder('='))
+
+def get_metadata(volume):
+    """ The metadata of a volume (z, y, x). """
+    z, y, x = volume.shape
+    return {"ConstPixelDims": (x, y, z), "ConstExtent": (0, x-1, 0, y-1, 0, z-1),
+            "ConstPixelSpacing": (1., 1., 1.), "ConstOrigin": (0., 0., 0.)}
+
+def run_method(volume, metadata, method):
+    """ Convert a volume with a method. """
+    if method == 'deep':
+        return convert_deep(volume, metadata)
+    return numpy_array_as_vtk_image_data(volume, metadata, inplace=(method == 'inplace'))
+
+def convert(name, method, results):
+    """ Convert a volume with a method in its own process: the runtime (ms),
+        the extra peak memory (MB), and whether the voxels are in the same
+        place as with the deep copy. """
+    volume = get_volume(name)
+    metadata = get_metadata(volume)
+    original = volume.copy()
+
+    # the extra memory of one conversion
+    reset_peak_memory()
+    baseline = get_memory()
+    image = run_method(volume, metadata, method)
+    memory = get_peak_memory() - baseline
+
+    # the placement of the voxels, and the round trip
+    scalars = numpy_support.vtk_to_numpy(image.GetPointData().GetScalars())
+    reference = numpy_support.vtk_to_numpy(convert_deep(original, metadata).GetPointData().GetScalars())
+    equal = bool(np.array_equal(scalars, reference))
+    if method != 'deep':
+        equal = equal and np.array_equal(vtk_image_data_as_numpy_array(image), original)
+    del image, scalars, reference
+
+    runtimes = []
+    for repeat in range(REPEATS):
+        if method == 'inplace':
+            # the volume in its original order again
+            volume[...] = original
+        start = time.perf_counter()
+        image = run_method(volume, metadata, method)
+        runtimes.append((time.perf_counter() - start) * 1000.)
+        del image
+
+    results.put((np.median(runtimes), memory, equal))
+
+
+def main():
+    print('Create directories')
+    create_folder(RESULTS_PATH)
+    create_folder(RESULTS_BENCH_PATH)
+
+    names = [name for name in sorted(os.listdir(DATA_PATH))
+             if os.path.exists(os.path.join(DATA_PATH, name, 'real_org', 'original.dcm'))] + ['synthetic']
+
+    with open(RESULTS_BENCH_PATH + '/bench_convert.txt', 'w') as file:
+        file.write("volume shape size(MB) method time(ms) extra_memory(MB) equal\n")
+        for name in names:
+            volume = get_volume(name)
+            shape = 'x'.join(str(size) for size in volume.shape)
+            size = volume.nbytes / 1024. ** 2
+            del volume
+
+            for method in METHODS:
+                # each method in a new process, for the peak memory
+                results = multiprocessing.Queue()
+                process = multiprocessing.Process(target=convert, args=(name, method, results))
+                process.start()
+                runtime, memory, equal = results.get()
+                process.join()
+
+                line = "%s %s %.1f %s %.2f %.1f %s" %(name, shape, size, method, runtime, memory, equal)
+                print(line)
+                file.write(line + "\n")
+
+    print('results saved in:' + RESULTS_BENCH_PATH + '/bench_convert.txt')
+
+
+if __name__ == '__main__':
+    main()
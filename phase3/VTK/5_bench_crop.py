@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisation in VTK.
+# You can run this main file to compare the rendering of the masked images
+# with and without the crop to the bounding box of the mask (offscreen).
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+- Benchmark of the crop to the bounding box of the mask: the voxels and
+  memory of the rendered image, the first frame and the frame time
+"""
+
+import os
+import time
+import numpy as np
+
+from classes.volume import Volume
+from classes.timer import TIMER
+from helpers.loadsave import *
+from modules.render_jobs import *
+
+
+# Constants
+RESULTS_BENCH_PATH = os.path.join(RESULTS_PATH, 'results_VTK_bench')
+
+# the number of frames of a rotation around the volume
+STEPS = 36
+
+
+def render_frames(image, bounds):
+    """ Render an image offscreen: the first frame and the frames of a
+        rotation. Output: the first frame (ms) and the median frame (ms). """
+    TIMER.reset()
+    volume = Volume()
+    volume.pipeline_volume(image, offscreen=True, bounds=bounds)
+    first = [seconds for stage, seconds in TIMER.timings if stage == 'render'][0] * 1000.
+
+    frames = []
+    for step in range(STEPS):
+        volume.ren.GetActiveCamera().Azimuth(360. / STEPS)
+        start = time.perf_counter()
+        volume.renWin.Render()
+        frames.append((time.perf_counter() - start) * 1000.)
+    return first, np.median(frames)
+
+
+def main():
+    print('Create directories')
+    create_folder(RESULTS_PATH)
+    create_folder(RESULTS_BENCH_PATH)
+
+    # the datasets with a ground truth mask
+    datasets = [name for name in sorted(os.listdir(DATA_PATH)) if os.path.isdir(os.path.join(DATA_PATH, name, 'crop_gt'))]
+
+    with open(RESULTS_BENCH_PATH + '/bench_crop.txt', 'w') as file:
+        file.write("dataset crop voxels memory(MB) first_frame(ms) frame(ms)\n")
+        for dataset in datasets:
+            cache = {}
+            for crop in [False, True]:
+                image, bounds = load_job(get_job(visualise='mask', dataset=dataset), cache, crop=crop)
+                first, frame = render_frames(image, bounds)
+                voxels = image.GetOutput().GetNumberOfPoints()
+                memory = voxels * image.GetOutput().GetScalarSize() / 1024. ** 2
+
+                line = "%s %s %d %.2f %.1f %.1f" %(dataset, crop, voxels, memory, first, frame)
+                print(line)
+                file.write(line + "\n")
+
+    print('results saved in:' + RESULTS_BENCH_PATH + '/bench_crop.txt')
+
+
+if __name__ == '__main__':
+    main()
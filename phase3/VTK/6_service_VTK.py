@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisation in VTK.
+# You can run this main file to start the render service (with a memory cap
+# of the warm images in MB, default 2048)
+# python 6_service_VTK.py serve 2048
+# and, in another terminal, to send a render request (a json object) to it
+# python 6_service_VTK.py request '{"visualise": "mask", "dataset": "dataset1",
+#     "model": "ground_truth", "camera": {"azimuth": 30}, "output": "results_VTK/a.png"}'
+# python 6_service_VTK.py status
+# python 6_service_VTK.py stop
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+- The render service keeps the recently used images in memory, so a repeated
+  request of a dataset renders without loading it again
+"""
+
+import sys
+import json
+
+from classes.cache import MEMORY_CAP
+from modules.render_service import *
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'serve'
+
+    if command == 'serve':
+        memory_cap = float(sys.argv[2]) if len(sys.argv) > 2 else MEMORY_CAP
+        serve(memory_cap=memory_cap)
+    elif command == 'request':
+        print(send_request(json.loads(sys.argv[2])))
+    elif command in ['status', 'stop']:
+        print(send_request({'command': command}))
+    else:
+        print("Command is not recognized, please use serve, request, status or stop.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisation in VTK.
+# You can run this main file to benchmark the rendering offscreen: a rotation
+# of the camera around the volume with every volume mapper and window size,
+# e.g. with 36 steps and the window sizes 300 and 600
+# python 7_bench_render.py 36 300,600
+# or only the jobs of a json file (as in 3_batch_VTK.py)
+# python 7_bench_render.py 36 300,600 jobs.json
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+- Benchmark of the rendering: per job, mapper, window size and mode (still,
+  or interactive with the update rate of rotating)
+- The first frame (ms, with the loading of the images), the frame times of
+  the rotation (ms), the peak memory (MB) and the sample distances
+- bench_render.csv with a row per configuration, bench_render_frames.csv with
+  a row per frame
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import queue
+import multiprocessing
+import numpy as np
+
+from classes.volume import Volume
+from classes.timer import TIMER
+from helpers.loadsave import *
+from helpers.memory import *
+from modules.render_jobs import *
+
+
+# Constants
+RESULTS_BENCH_PATH = os.path.join(RESULTS_PATH, 'results_VTK_bench')
+
+# the volume mappers (a surface is rendered without a volume mapper)
+BACKENDS = ['fixedpoint', 'gpu', 'smart']
+# the window sizes (pixels, square), the modes and the steps of a rotation
+RESOLUTIONS = [300, 600, 1200]
+MODES = ['still', 'interactive']
+STEPS = 36
+# the time (sec) a configuration may take, before it counts as crashed
+TIMEOUT = 1800
+
+SUMMARY_COLUMNS = ['job', 'mapper', 'size', 'mode', 'status', 'first_frame(ms)', 'median(ms)', 'p95(ms)',
+                   'fps', 'peak_memory(MB)', 'image_sample_distance', 'sample_distance']
+
+
+def get_jobs(datasets):
+    """ The benchmark jobs of the datasets: the cropped original image, the
+        masked image and the surface of the ground truth. """
+    jobs = []
+    for dataset in datasets:
+        jobs.append(get_job(visualise='volume', dataset=dataset, image='crop_org'))
+        jobs.append(get_job(visualise='mask', dataset=dataset, model='ground_truth'))
+        jobs.append(get_job(visualise='mask', dataset=dataset, model='ground_truth', render='surface'))
+    return jobs
+
+def get_configurations(jobs, resolutions):
+    """ The configurations (job, mapper, size, mode) of the benchmark. """
+    configurations = []
+    for job in jobs:
+        backends = ['surface'] if job['render'] == 'surface' else BACKENDS
+        for backend in backends:
+            for size in resolutions:
+                for mode in MODES:
+                    configurations.append((job, backend, size, mode))
+    return configurations
+
+def render_orbit(job, backend, size, mode, steps):
+    """ Load a job and render a rotation around it offscreen.
+        Output: the first frame (ms), the frame times (ms) and the volume. """
+    start = time.perf_counter()
+    image, bounds = load_job(job, {})
+    volume = Volume()
+    volume.pipeline_volume(image, offscreen=True, bounds=bounds, mapper='auto' if backend == 'surface' else backend,
+                           surface=(job['render'] == 'surface'), size=(size, size))
+    first = (time.perf_counter() - start) * 1000.
+
+    # interactive: the update rate and image sample distance of rotating
+    if mode == 'interactive':
+        volume.renWin.SetDesiredUpdateRate(volume.mapper.update_rate)
+        volume.mapper.start_interaction(None, None)
+
+    frames = []
+    for step in range(steps):
+        volume.ren.GetActiveCamera().Azimuth(360. / steps)
+        volume.ren.ResetCameraClippingRange()
+        start = time.perf_counter()
+        volume.renWin.Render()
+        frames.append((time.perf_counter() - start) * 1000.)
+    return first, frames, volume
+
+def run_configuration(configuration, steps, results):
+    """ Render a configuration in its own process, for the peak memory. """
+    job, backend, size, mode = configuration
+    reset_peak_memory()
+    baseline = get_memory()
+    try:
+        first, frames, volume = render_orbit(job, backend, size, mode, steps)
+        distances = (volume.mapper.sample_distance(), volume.mapper.ray_sample_distance())
+        if backend == 'surface':
+            distances = (-1., -1.)
+        results.put(('complete', first, frames, get_peak_memory() - baseline, distances))
+    except Exception as error:
+        print(get_jobname(job), backend, 'failed:', error)
+        results.put(('failed', 0., [], 0., (-1., -1.)))
+
+def wait_result(process, results):
+    """ The result of the process of a configuration; a process which
+        stops without a result (e.g. a mapper which crashes without OpenGL)
+        or takes longer than the timeout is crashed. """
+    crashed = ('crashed', 0., [], 0., (-1., -1.))
+    deadline = time.perf_counter() + TIMEOUT
+    result = None
+    while result is None and time.perf_counter() < deadline:
+        try:
+            result = results.get(timeout=1.)
+        except queue.Empty:
+            if not process.is_alive():
+                # the result may arrive just after the end of the process
+                try:
+                    result = results.get(timeout=1.)
+                except queue.Empty:
+                    break
+
+    process.join(timeout=10)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+    if result is None or process.exitcode != 0:
+        return crashed
+    return result
+
+
+def main():
+    # the steps of a rotation, the window sizes and the optional json file of the jobs
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else STEPS
+    resolutions = [int(size) for size in sys.argv[2].split(',')] if len(sys.argv) > 2 else RESOLUTIONS
+    if len(sys.argv) > 3:
+        with open(sys.argv[3]) as f:
+            jobs = [get_job(**job) for job in json.load(f)]
+    else:
+        jobs = get_jobs([name for name in sorted(os.listdir(DATA_PATH))
+                         if os.path.isdir(os.path.join(DATA_PATH, name, 'crop_gt'))])
+
+    print('Create directories')
+    create_folder(RESULTS_PATH)
+    create_folder(RESULTS_BENCH_PATH)
+    create_folder(RESULTS_META_PATH)
+
+    summary_file = os.path.join(RESULTS_BENCH_PATH, 'bench_render.csv')
+    frames_file = os.path.join(RESULTS_BENCH_PATH, 'bench_render_frames.csv')
+    with open(summary_file, 'w', newline='') as f_summary, open(frames_file, 'w', newline='') as f_frames:
+        summary = csv.writer(f_summary)
+        summary.writerow(SUMMARY_COLUMNS)
+        frames_writer = csv.writer(f_frames)
+        frames_writer.writerow(['job', 'mapper', 'size', 'mode', 'frame', 'time(ms)'])
+
+        for configuration in get_configurations(jobs, resolutions):
+            job, backend, size, mode = configuration
+            results = multiprocessing.Queue()
+            process = multiprocessing.Process(target=run_configuration, args=(configuration, steps, results))
+            process.start()
+            status, first, frames, memory, distances = wait_result(process, results)
+
+            name = get_jobname(job)
+            if len(frames) > 0:
+                median, p95, fps = np.median(frames), np.percentile(frames, 95), 1000. / np.mean(frames)
+            else:
+                median, p95, fps = 0., 0., 0.
+            row = [name, backend, size, mode, status, '%.1f' %first, '%.1f' %median, '%.1f' %p95, '%.2f' %fps,
+                   '%.1f' %memory, '%.2f' %distances[0], '%.3f' %distances[1]]
+            print(' '.join(str(value) for value in row))
+            summary.writerow(row)
+            for frame, milliseconds in enumerate(frames):
+                frames_writer.writerow([name, backend, size, mode, frame, '%.2f' %milliseconds])
+
+    print('results saved in:' + summary_file + ' and ' + frames_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisation in VTK.
+# You can run this file to keep the recently used images (readers, masks,
+# numpy arrays) in memory, up to a memory cap.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+"""
+
+from collections import OrderedDict
+import numpy as np
+import vtk
+
+
+# the memory cap (MB) of the cache
+MEMORY_CAP = 2048
+
+
+def get_data_objects(value):
+    """ The numpy arrays and VTK data objects of a value in the cache (a
+        Reader, a VTK algorithm or data object, a numpy array, or a tuple or
+        list of them). """
+    if isinstance(value, np.ndarray):
+        return [value]
+    if isinstance(value, (tuple, list)):
+        return [data for item in value for data in get_data_objects(item)]
+    if hasattr(value, 'reader') and isinstance(value.reader, vtk.vtkAlgorithm):
+        value = value.reader
+    if isinstance(value, vtk.vtkAlgorithm) and value.GetNumberOfOutputPorts() > 0:
+        value = value.GetOutputDataObject(0)
+    if isinstance(value, vtk.vtkDataObject):
+        return [value]
+    return []
+
+def get_size(data):
+    """ The memory (MB) of a numpy array or VTK data object. """
+    if isinstance(data, np.ndarray):
+        return data.nbytes / 1024. ** 2
+    return data.GetActualMemorySize() / 1024.
+
+
+class LRUCache():
+    """
+    This is a class that keeps the recently used values (e.g. the loaded
+    images of the jobs) like a dictionary. When the memory of the values is
+    more than the memory cap, the least recently used values are released.
+    The pipelines are lazy, so the memory is measured when it is released.
+    A value which is loaded with other values (e.g. the pipeline of a job
+    with its readers) is released together with them, since it keeps their
+    data in memory.
+    """
+
+    def __init__(self, memory_cap=MEMORY_CAP):
+
+        # the values in the order of use (the last is the most recent)
+        self.values = OrderedDict()
+        self.memory_cap = memory_cap
+        # the keys of the values which are used to load a value
+        self.dependencies = {}
+        # the keys which are used by the values that are loading
+        self.loading = []
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def __getitem__(self, key):
+        for dependencies in self.loading:
+            dependencies.add(key)
+        self.values.move_to_end(key)
+        return self.values[key]
+
+    def __setitem__(self, key, value):
+        self.values[key] = value
+        self.values.move_to_end(key)
+
+    def __len__(self):
+        return len(self.values)
+
+    def clear(self):
+        """ Release all values. """
+        self.values.clear()
+        self.dependencies.clear()
+
+    def load(self, key, function, *args):
+        """ The value of a key; it is computed with the function when it is
+            not in the cache, and the values which are used by the function
+            are its dependencies. """
+        if key not in self.values:
+            self.loading.append(set())
+            try:
+                value = function(*args)
+            finally:
+                dependencies = self.loading.pop()
+            self[key] = value
+            self.dependencies[key] = dependencies - {key}
+        return self[key]
+
+    def get_group(self, key):
+        """ The keys which are released together with a key: the values
+            which are loaded with it, and their dependencies. """
+        owners = {key} | {owner for owner, dependencies in self.dependencies.items() if key in dependencies}
+        group = set(owners)
+        for owner in owners:
+            group |= self.dependencies.get(owner, set())
+        return [key for key in self.values if key in group]
+
+    def memory(self):
+        """ The memory (MB) of the values; the data which is shared by values
+            (e.g. a reader and the pipeline of a mask) is counted once. """
+        seen = {}
+        for value in self.values.values():
+            for data in get_data_objects(value):
+                seen[id(data)] = data
+        return sum(get_size(data) for data in seen.values())
+
+    def evict(self):
+        """ Release the least recently used values, with their group, until
+            the memory is below the memory cap (the most recent value and its
+            group are kept).
+            Output: the keys of the released values. """
+        released = []
+        while len(self.values) > 1 and self.memory() > self.memory_cap:
+            group = self.get_group(next(iter(self.values)))
+            if next(reversed(self.values)) in group:
+                break
+            for key in group:
+                del self.values[key]
+                self.dependencies.pop(key, None)
+                released.append(key)
+        return released
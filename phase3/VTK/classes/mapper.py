@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisation in VTK.
+# You can run this file to choose the volume mapper (the backend) of a render
+# window: GPU ray casting, fixed point ray casting on the CPU, or the smart
+# mapper.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+- auto: the GPU mapper, unless the OpenGL renderer is a software renderer
+  (e.g. llvmpipe on the nodes without GPU), then the fixed point mapper
+- While rotating the volume is rendered with a lower resolution, to keep the
+  interactive update rate
+"""
+
+import time
+import numpy as np
+import vtk
+
+
+# Constants
+MAPPERS = ['auto', 'gpu', 'fixedpoint', 'smart']
+# the OpenGL renderers without GPU
+SOFTWARE_RENDERERS = ['llvmpipe', 'softpipe', 'swrast', 'software rasterizer']
+
+# the update rate (frames per second) while rotating, and when still
+INTERACTIVE_UPDATE_RATE = 10.
+STILL_UPDATE_RATE = 0.001
+# the image sample distance (pixels per ray) while rotating, and when still
+INTERACTIVE_IMAGE_SAMPLE_DISTANCE = 2.
+STILL_IMAGE_SAMPLE_DISTANCE = 1.
+
+
+class Mapper():
+    """
+    This is a class that makes the volume mappers of a render window with
+    one backend (gpu, fixedpoint or smart), and records the frame times of
+    the render window.
+    """
+
+    def __init__(self, backend='auto', update_rate=INTERACTIVE_UPDATE_RATE):
+
+        if backend not in MAPPERS:
+            raise ValueError("The mapper " + str(backend) + " does not exist.")
+        # the chosen backend, and the backend which is used (after auto)
+        self.backend = backend
+        self.update_rate = update_rate
+        # the volume mappers of the render window
+        self.mappers = []
+        # the frame times (sec) of the render window
+        self.frame_times = []
+        self.renWin = None
+
+    def select_backend(self, renWin):
+        """ The backend of a render window; auto is the GPU mapper when the
+            OpenGL renderer is a GPU, otherwise the fixed point mapper. """
+        if self.backend != 'auto':
+            return self.backend
+
+        renWin.Initialize()
+        capabilities = renWin.ReportCapabilities().lower()
+        if any(renderer in capabilities for renderer in SOFTWARE_RENDERERS):
+            return 'fixedpoint'
+        if vtk.vtkGPUVolumeRayCastMapper().IsRenderSupported(renWin, vtk.vtkVolumeProperty()) == 0:
+            return 'fixedpoint'
+        return 'gpu'
+
+    def setup(self, renWin, iren):
+        """ Choose the backend of the render window, set the update rates of
+            the interactor and record the frame times. """
+        self.renWin = renWin
+        self.backend = self.select_backend(renWin)
+
+        # the interactor asks the desired update rate while rotating, and the
+        # still update rate afterwards
+        iren.SetDesiredUpdateRate(self.update_rate)
+        iren.SetStillUpdateRate(STILL_UPDATE_RATE)
+        iren.AddObserver('StartInteractionEvent', self.start_interaction)
+        iren.AddObserver('EndInteractionEvent', self.end_interaction)
+
+        start = [0.]
+
+        def on_start(obj, event):
+            start[0] = time.perf_counter()
+
+        def on_end(obj, event):
+            self.frame_times.append(time.perf_counter() - start[0])
+
+        renWin.AddObserver('StartEvent', on_start)
+        renWin.AddObserver('EndEvent', on_end)
+
+    def new_mapper(self, input_port):
+        """ A volume mapper of the backend with the input. """
+        if self.backend == 'gpu':
+            mapper = vtk.vtkGPUVolumeRayCastMapper()
+            # the sample distance along the rays follows the update rate
+            mapper.SetAutoAdjustSampleDistances(1)
+        elif self.backend == 'fixedpoint':
+            mapper = vtk.vtkFixedPointVolumeRayCastMapper()
+            # the image sample distance follows the update rate, up to the
+            # interactive image sample distance
+            mapper.SetAutoAdjustSampleDistances(1)
+            mapper.SetMinimumImageSampleDistance(STILL_IMAGE_SAMPLE_DISTANCE)
+            mapper.SetMaximumImageSampleDistance(INTERACTIVE_IMAGE_SAMPLE_DISTANCE)
+        else:
+            mapper = vtk.vtkSmartVolumeMapper()
+            mapper.SetRequestedRenderModeToDefault()
+            mapper.SetInteractiveUpdateRate(self.update_rate)
+            mapper.SetInteractiveAdjustSampleDistances(1)
+        mapper.SetInputConnection(input_port)
+        mapper.SetBlendModeToComposite()
+        self.mappers.append(mapper)
+        return mapper
+
+    def start_interaction(self, obj, event):
+        """ Render with a lower resolution while rotating (GPU mapper). """
+        for mapper in self.mappers:
+            if isinstance(mapper, vtk.vtkGPUVolumeRayCastMapper):
+                mapper.SetImageSampleDistance(INTERACTIVE_IMAGE_SAMPLE_DISTANCE)
+
+    def end_interaction(self, obj, event):
+        """ Render with the full resolution again (GPU mapper). """
+        for mapper in self.mappers:
+            if isinstance(mapper, vtk.vtkGPUVolumeRayCastMapper):
+                mapper.SetImageSampleDistance(STILL_IMAGE_SAMPLE_DISTANCE)
+        if self.renWin is not None:
+            self.renWin.Render()
+
+    def sample_distance(self):
+        """ The image sample distance of the last frame (-1: chosen by the
+            mapper, e.g. the smart mapper). """
+        if len(self.mappers) == 0 or not hasattr(self.mappers[0], 'GetImageSampleDistance'):
+            return -1.
+        return self.mappers[0].GetImageSampleDistance()
+
+    def ray_sample_distance(self):
+        """ The sample distance along the rays of the last frame (-1: chosen
+            by the mapper). """
+        if len(self.mappers) == 0 or not hasattr(self.mappers[0], 'GetSampleDistance'):
+            return -1.
+        return self.mappers[0].GetSampleDistance()
+
+    def __str__(self):
+        if len(self.frame_times) == 0:
+            return '%s frames=0' %self.backend
+        return '%s frames=%d first=%.1fms median=%.1fms sample_distance=%.1f' %(
+            self.backend, len(self.frame_times), self.frame_times[0] * 1000.,
+            np.median(self.frame_times) * 1000., self.sample_distance())
@@ -20,24 +20,88 @@
 Phase 3: The volume visualisations.
 """
 
+import numpy as np
 import vtk
+from vtk.util import numpy_support
+
+from classes.timer import TIMER
+
+
+# the margin (voxels) around the bounding box of the mask
+MARGIN = 5
 
 
 class Mask():
     """
     This is a class that implements the segmented mask over the
-    input image to only segment the fetus.
+    input image to only segment the fetus. The input image and the mask
+    are cropped to the bounding box of the mask (with a margin) first, so
+    the ray caster only traverses the box of the fetus. The cropped images
+    keep their physical coordinates.
     """
 
-    def __init__(self, input_image, mask_image):
+    def __init__(self, input_image, mask_image, crop=True, margin=MARGIN):
 
         # The input image, mask and segmented image
         self.input_image = input_image
         self.input_mask = mask_image
         self.output_mask = 0  #segmented_image
 
+        # the extent of the crop (None: not cropped) and the bounds of the
+        # whole image (for the camera)
+        self.crop = crop
+        self.margin = margin
+        self.extent = None
+        self.bounds = None
+
+        if self.crop == True:
+            self.crop_mask()
         self.apply_mask()
 
+    def calc_bounding_box(self):
+        """ Calculate the extent of the nonzero voxels of the mask with the
+            margin, within the extent of the image. Output: the extent
+            (xmin, xmax, ymin, ymax, zmin, zmax), or None if the mask is empty. """
+        self.input_mask.Update()
+        image = self.input_mask.GetOutput()
+        self.bounds = image.GetBounds()
+
+        extent = image.GetExtent()
+        x, y, z = image.GetDimensions()
+        voxels = numpy_support.vtk_to_numpy(image.GetPointData().GetScalars()).reshape(z, y, x)
+
+        # the nonzero slices in z, then the nonzero rows and columns in y and x
+        zs = np.flatnonzero(voxels.any(axis=(1, 2)))
+        if len(zs) == 0:
+            return None
+        part = voxels[zs[0]:zs[-1] + 1]
+        ys = np.flatnonzero(part.any(axis=(0, 2)))
+        xs = np.flatnonzero(part.any(axis=(0, 1)))
+
+        box = []
+        for axis, indices in enumerate([xs, ys, zs]):
+            box.append(max(extent[2 * axis], extent[2 * axis] + indices[0] - self.margin))
+            box.append(min(extent[2 * axis + 1], extent[2 * axis] + indices[-1] + self.margin))
+        return tuple(box)
+
+    def crop_mask(self):
+        """ Crop the input image and the mask to the bounding box of the mask. """
+        self.extent = self.calc_bounding_box()
+        if self.extent is None:
+            return
+
+        # the dicom reader can only read the whole image (not a part of the
+        # extent), so the input image is read completely before the crop
+        self.input_image.UpdateWholeExtent()
+
+        crops = []
+        for image in [self.input_image, self.input_mask]:
+            voi = vtk.vtkExtractVOI()
+            voi.SetInputConnection(image.GetOutputPort())
+            voi.SetVOI(*self.extent)
+            crops.append(TIMER.observe(voi, 'crop'))
+        self.input_image, self.input_mask = crops
+
     def apply_mask(self):
         """ Apply the input mask on the input image in order to get an
             output mask which only shows the fetus. """
@@ -45,10 +109,12 @@ class Mask():
         imageMask = vtk.vtkImageMask()
 
         # set the input to be masked
-        imageMask.SetInputConnection(self.input_image.GetOutputPort())
+        imageMask.SetInputConnection(0, self.input_image.GetOutputPort())
 
-        # set the mask to be used
-        imageMask.SetMaskInputData(self.input_mask.GetOutput())
+        # set the mask to be used (connected; without the crop it is only
+        # read when the mapper needs the output)
+        imageMask.SetInputConnection(1, self.input_mask.GetOutputPort())
+        TIMER.observe(imageMask, 'mask')
 
         # the segmented result
         self.output_mask = imageMask
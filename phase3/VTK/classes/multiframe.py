@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisations.
+# You can run this file to access the frames of a multi-frame DICOM file
+# (real_org/original.dcm) lazily.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+"""
+
+import copy
+import numpy as np
+import pydicom
+from pydicom.encaps import encapsulate, generate_pixel_data_frame
+
+
+class MultiFrame():
+    """
+    This is a class that reads a multi-frame DICOM file lazily. It behaves
+    like a read-only numpy array of shape (frames, rows, columns[, samples]):
+    only the frames which are indexed are read. Uncompressed pixel data is
+    memory-mapped, compressed pixel data is decoded per requested frame.
+    """
+
+    def __init__(self, filename):
+
+        # the filename and the header (without the pixel data)
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self.header = pydicom.dcmread(f, stop_before_pixels=True)
+            self.offset = self.find_pixeldata(f, f.tell())
+
+        # the dimensions and datatype of the frames
+        self.frames = int(self.header.get('NumberOfFrames', 1))
+        self.rows = int(self.header.Rows)
+        self.columns = int(self.header.Columns)
+        self.samples = int(self.header.get('SamplesPerPixel', 1))
+        self.shape = (self.frames, self.rows, self.columns) + ((self.samples,) if self.samples > 1 else ())
+        self.dtype = self.get_dtype()
+        self.ndim = len(self.shape)
+
+        # the memory map (uncompressed) or the encapsulated frames (compressed)
+        self.compressed = self.header.file_meta.TransferSyntaxUID.is_compressed
+        self.memmap = None
+        self.encapsulated = None
+
+    def find_pixeldata(self, f, position):
+        """ Find the byte offset of the value of the pixel data element.
+            The header reader stops at (or just after) the pixel data tag. """
+        little = self.header.file_meta.TransferSyntaxUID.is_little_endian
+        implicit = self.header.file_meta.TransferSyntaxUID.is_implicit_VR
+        tag = b'\xe0\x7f\x10\x00' if little else b'\x7f\xe0\x00\x10'
+
+        start = max(position - 8, 0)
+        f.seek(start)
+        index = f.read(32).find(tag)
+        if index < 0:
+            raise ValueError("The pixel data of " + self.filename + " is not found.")
+
+        # tag (4) + length (4), or tag (4) + VR (2) + reserved (2) + length (4)
+        return start + index + (8 if implicit else 12)
+
+    def get_dtype(self):
+        """ The numpy datatype of the stored pixels. """
+        bits = int(self.header.BitsAllocated)
+        signed = int(self.header.get('PixelRepresentation', 0)) == 1
+        dtype = np.dtype(('i' if signed else 'u') + str(bits // 8))
+        if self.header.file_meta.TransferSyntaxUID.is_little_endian:
+            return dtype.newbyteorder('<')
+        return dtype.newbyteorder('>')
+
+    def get_spacing(self):
+        """ The spacing (x, y, z) of the frames, as far as it is in the header. """
+        spacing = [float(s) for s in self.header.get('PixelSpacing', [1., 1.])][::-1]
+        thickness = self.header.get('SpacingBetweenSlices', self.header.get('SliceThickness', 1.))
+        return (spacing[0], spacing[1], float(thickness))
+
+    def open_memmap(self):
+        """ Memory-map the uncompressed pixel data. """
+        if self.memmap is None:
+            planar = self.samples > 1 and int(self.header.get('PlanarConfiguration', 0)) == 1
+            if planar:
+                shape = (self.frames, self.samples, self.rows, self.columns)
+            else:
+                shape = self.shape
+            self.memmap = np.memmap(self.filename, dtype=self.dtype, mode='r', offset=self.offset, shape=shape)
+            if planar:
+                self.memmap = self.memmap.transpose(0, 2, 3, 1)
+        return self.memmap
+
+    def read_encapsulated(self):
+        """ Read the compressed fragments of all frames (without decoding). """
+        if self.encapsulated is None:
+            dataset = pydicom.dcmread(self.filename)
+            self.encapsulated = list(generate_pixel_data_frame(dataset.PixelData))
+        return self.encapsulated
+
+    def decode_frame(self, index):
+        """ Decode one compressed frame. """
+        frame = copy.deepcopy(self.header)
+        frame.file_meta = self.header.file_meta
+        frame.NumberOfFrames = 1
+        frame.PixelData = encapsulate([self.read_encapsulated()[index]])
+        frame['PixelData'].is_undefined_length = True
+        return frame.pixel_array
+
+    def __len__(self):
+        return self.frames
+
+    def __getitem__(self, key):
+        """ Index the frames like a numpy array, e.g. volume[10:20, ::2]. """
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        if self.compressed == False:
+            return np.asarray(self.open_memmap()[key])
+
+        # decode only the frames which are selected by the first index
+        frames = np.arange(self.frames)[key[0]]
+        if np.ndim(frames) == 0:
+            return self.decode_frame(int(frames))[key[1:]]
+        result = np.stack([self.decode_frame(int(i)) for i in frames]) if len(frames) > 0 else \
+            np.empty((0,) + self.shape[1:], dtype=self.dtype)
+        return result[(slice(None),) + key[1:]]
+
+    def __array__(self, dtype=None, copy=None):
+        volume = self[:]
+        return volume if dtype is None else volume.astype(dtype)
+
+    def crop(self, frames, rows, columns):
+        """ Crop the volume with three (start, stop) ranges; only the frames
+            inside the range are read. """
+        return self[frames[0]:frames[1], rows[0]:rows[1], columns[0]:columns[1]]
+
+    def thumbnail(self, step=4):
+        """ A subsampled volume with every step-th voxel in each direction. """
+        return self[::step, ::step, ::step]
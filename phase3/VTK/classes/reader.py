@@ -20,8 +20,13 @@
 Phase 3: The volume visualisations.
 """
 
+import os
 import vtk
 
+from classes.multiframe import MultiFrame
+from classes.timer import TIMER
+from modules.convert_nptovtk import numpy_array_as_vtk_image_data
+
 
 class Reader():
     """
@@ -32,6 +37,8 @@ class Reader():
 
         # the reader
         self.reader = 0
+        # the metadata of an image which is read without a VTK reader
+        self.metadata = None
 
     def input_image(self, input):
         """ Check what kind of input the program gets and guide to the
@@ -45,8 +52,8 @@ class Reader():
             # the input is a vti file
             self.read_vti(input)
         elif input[-4:] == '.dcm':
-            # the input is a dcm file
-            self.read_dcm(input)
+            # the input is a (multi-frame) dcm file
+            self.read_frames(input)
         else:
             print("Filename is not recognized, please insert a directory /, .vti, or .dcm.")
 
@@ -54,28 +61,61 @@ class Reader():
         """ Read the directory. """
         self.reader = vtk.vtkDICOMImageReader()
         self.reader.SetDirectoryName(input)
-        self.reader.Update()
+        TIMER.observe(self.reader, 'read')
 
     def read_vti(self, input):
         """ Read the .vti file. """
         self.reader = vtk.vtkXMLImageDataReader()
         self.reader.SetFileName(input)
-        self.reader.Update()
+        TIMER.observe(self.reader, 'read')
 
     def read_dcm(self, input):
         """ Read the dicom file. """
         self.reader = vtk.vtkDICOMImageReader()
         self.reader.SetFileName(input)
+        TIMER.observe(self.reader, 'read')
+
+    def read_frames(self, input, frames=None, step=1):
+        """ Read only the requested frames of a multi-frame dicom file (e.g.
+            real_org/original.dcm). The input is the .dcm file or the
+            directory which contains it, frames a (start, stop) range and
+            step the subsampling in every direction (for thumbnails). """
+        if input[-1] == "/":
+            input = input + [f for f in sorted(os.listdir(input)) if f.endswith('.dcm')][0]
+
+        volume = MultiFrame(input)
+        start, stop = frames if frames is not None else (0, len(volume))
+        array = volume[start:stop:step, ::step, ::step]
+
+        # the metadata of the read part of the volume
+        spacing = tuple(s * step for s in volume.get_spacing())
+        dims = (array.shape[2], array.shape[1], array.shape[0])
+        self.metadata = {"ConstPixelDims": dims,
+                         "ConstExtent": (0, dims[0]-1, 0, dims[1]-1, 0, dims[2]-1),
+                         "ConstPixelSpacing": spacing,
+                         "ConstDataSpacing": spacing,
+                         "ConstOrigin": (0., 0., start * volume.get_spacing()[2])}
+
+        # a pass-through filter, so the image has an output port like a reader
+        image = numpy_array_as_vtk_image_data(array, self.metadata, inplace=True)
+        self.reader = vtk.vtkImageChangeInformation()
+        self.reader.SetInputData(image)
         self.reader.Update()
 
     def generate_metadata(self):
         """ Check the metadata about the image, specifically
         the image dimensions, the pixelspacing, spacing between
-        slices, the orientation and position of the patient. """
+        slices, the orientation and position of the patient.
+        Only the header is read (no voxels). """
+
+        # the frames are read without a VTK reader: their own metadata
+        if self.metadata is not None:
+            return self.metadata
 
         # get the metadata
-        ConstPixelDims = self.reader.GetOutput().GetDimensions()
+        self.reader.UpdateInformation()
         ConstExtent = self.reader.GetDataExtent()
+        ConstPixelDims = tuple(ConstExtent[i + 1] - ConstExtent[i] + 1 for i in range(0, 6, 2))
         ConstPixelSpacing = self.reader.GetPixelSpacing()
         ConstDataSpacing = self.reader.GetDataSpacing()
         ConstOrigin = self.reader.GetDataOrigin()
@@ -97,22 +137,22 @@ class Reader():
         """ This filter casts the input type to match the output type in the
             image processing pipeline. The filter does nothing if the input
             already has the correct type. To specify the "CastTo" type,
-            use "SetOutputScalarType" method. """
+            use "SetOutputScalarType" method.
+            The cast is only connected: it is executed when the mapper
+            needs it. An image which is already cast is not cast again. """
+
+        if isinstance(image, vtk.vtkImageCast) and image.GetOutputScalarType() == vtk.VTK_UNSIGNED_CHAR:
+            return image
 
         cast = vtk.vtkImageCast()
-        try:
-            # works for vtk.vtkImageImport
+        if isinstance(image, vtk.vtkAlgorithm):
+            # e.g. a reader or vtk.vtkImageImport
             cast.SetInputConnection(image.GetOutputPort())
-        except Exception:
-            pass
-
-        try:
-            # works for vtk.vtkImageData
+        else:
+            # vtk.vtkImageData
             cast.SetInputData(image)
-        except Exception:
-            pass
 
         cast.SetOutputScalarTypeToUnsignedChar()
-        cast.Update()
+        TIMER.observe(cast, 'cast')
 
         return cast
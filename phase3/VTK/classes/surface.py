@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisation in VTK.
+# You can run this file to extract the surface of a mask (ground truth,
+# heuristic model or U-net), which is cached on disk.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+- The surface of the nonzero voxels of a mask: contour, smoothing,
+  decimation to a number of triangles, and normals
+- The surface is saved as <name>_<hash>.vtp, with the hash of the voxels of
+  the mask and the parameters, so a changed mask gets a new surface
+- The surface can be exported (.stl, .ply, .obj, .vtp)
+"""
+
+import os
+import hashlib
+import vtk
+from vtk.util import numpy_support
+
+from classes.timer import TIMER
+
+
+# the version of the extraction: another version is extracted again
+VERSION = 1
+# the number of triangles of the surface
+TARGET_TRIANGLES = 50000
+# the smoothing of the surface (iterations and passband of the windowed sinc)
+SMOOTHING_ITERATIONS = 20
+SMOOTHING_PASSBAND = 0.05
+
+
+class Surface():
+    """
+    This is a class that extracts the surface of a mask, or loads it when it
+    has been extracted before.
+    """
+
+    def __init__(self, mask_image, PATH, name, target=TARGET_TRIANGLES):
+
+        # the mask (a VTK algorithm), the folder of the surfaces and the
+        # name of the mask
+        self.mask_image = mask_image
+        self.path = PATH
+        self.name = name
+        self.target = target
+
+        # the surface (a VTK algorithm), its file and the bounds of the mask
+        self.output_surface = 0
+        self.filename = None
+        self.bounds = None
+
+        self.filename = os.path.join(self.path, self.name + '_' + self.calc_hash() + '.vtp')
+        if os.path.exists(self.filename):
+            self.load_surface()
+        else:
+            self.extract_surface()
+            self.save_surface()
+
+    def calc_hash(self):
+        """ The hash of the voxels and the geometry of the mask, and of the
+            parameters of the extraction. """
+        self.mask_image.Update()
+        image = self.mask_image.GetOutput()
+        self.bounds = image.GetBounds()
+
+        digest = hashlib.sha1()
+        digest.update(numpy_support.vtk_to_numpy(image.GetPointData().GetScalars()).tobytes())
+        digest.update(str((image.GetExtent(), image.GetSpacing(), image.GetOrigin(), VERSION, self.target,
+                           SMOOTHING_ITERATIONS, SMOOTHING_PASSBAND)).encode())
+        return digest.hexdigest()[:16]
+
+    def extract_surface(self):
+        """ Extract the surface of the nonzero voxels of the mask. """
+
+        # the mask as label 1 (the masks are 0/1 or 0/255)
+        threshold = vtk.vtkImageThreshold()
+        threshold.SetInputConnection(self.mask_image.GetOutputPort())
+        threshold.ThresholdByUpper(1)
+        threshold.SetInValue(1)
+        threshold.SetOutValue(0)
+        threshold.SetOutputScalarTypeToUnsignedChar()
+
+        # the contour of the label (flying edges is not in vtk 8.1)
+        if hasattr(vtk, 'vtkDiscreteFlyingEdges3D'):
+            contour = vtk.vtkDiscreteFlyingEdges3D()
+        else:
+            contour = vtk.vtkDiscreteMarchingCubes()
+        contour.SetInputConnection(threshold.GetOutputPort())
+        contour.SetValue(0, 1)
+        contour.ComputeNormalsOff()
+        contour.ComputeGradientsOff()
+        contour.ComputeScalarsOff()
+        TIMER.observe(contour, 'contour')
+
+        # smooth the steps of the voxels
+        smoother = vtk.vtkWindowedSincPolyDataFilter()
+        smoother.SetInputConnection(contour.GetOutputPort())
+        smoother.SetNumberOfIterations(SMOOTHING_ITERATIONS)
+        smoother.SetPassBand(SMOOTHING_PASSBAND)
+        smoother.BoundarySmoothingOff()
+        smoother.NonManifoldSmoothingOn()
+        smoother.NormalizeCoordinatesOn()
+        TIMER.observe(smoother, 'smooth')
+        smoother.Update()
+
+        # decimate to the number of triangles
+        triangles = smoother.GetOutput().GetNumberOfPolys()
+        decimate = vtk.vtkQuadricDecimation()
+        decimate.SetInputConnection(smoother.GetOutputPort())
+        decimate.SetTargetReduction(max(0., 1. - float(self.target) / max(triangles, 1)))
+        TIMER.observe(decimate, 'decimate')
+
+        # the normals for the shading
+        normals = vtk.vtkPolyDataNormals()
+        normals.SetInputConnection(decimate.GetOutputPort())
+        normals.SetFeatureAngle(60.)
+        normals.ConsistencyOn()
+        normals.SplittingOff()
+        normals.Update()
+
+        self.output_surface = normals
+
+    def save_surface(self):
+        """ Save the surface in the cache. """
+        writer = vtk.vtkXMLPolyDataWriter()
+        writer.SetFileName(self.filename)
+        writer.SetInputConnection(self.output_surface.GetOutputPort())
+        writer.SetDataModeToAppended()
+        writer.Write()
+
+    def load_surface(self):
+        """ Load the surface from the cache. """
+        reader = vtk.vtkXMLPolyDataReader()
+        reader.SetFileName(self.filename)
+        TIMER.observe(reader, 'read')
+        self.output_surface = reader
+
+    def export(self, filename):
+        """ Export the surface as .stl, .ply, .obj (not in vtk 8.1) or .vtp. """
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == '.stl':
+            writer = vtk.vtkSTLWriter()
+            writer.SetFileTypeToBinary()
+        elif extension == '.ply':
+            writer = vtk.vtkPLYWriter()
+            writer.SetFileTypeToBinary()
+        elif extension == '.obj' and hasattr(vtk, 'vtkOBJWriter'):
+            writer = vtk.vtkOBJWriter()
+        elif extension == '.vtp':
+            writer = vtk.vtkXMLPolyDataWriter()
+        else:
+            raise ValueError("The surface cannot be exported as " + extension + ".")
+        writer.SetFileName(filename)
+        writer.SetInputConnection(self.output_surface.GetOutputPort())
+        writer.Write()
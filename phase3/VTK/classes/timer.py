@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisation in VTK.
+# You can run this file to time the stages of the VTK pipeline.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+"""
+
+import time
+
+
+class StageTimer():
+    """
+    This is a class that records the time of the stages of the VTK pipeline
+    (reading, casting, masking, rendering) with the start and end events of
+    VTK. The pipeline is lazy: a stage is timed when it executes, which is
+    when the mapper needs its output.
+    """
+
+    def __init__(self):
+
+        # the list of (stage, time (sec)) in the order of execution
+        self.timings = []
+
+    def observe(self, vtk_object, stage):
+        """ Record the time between the start and end event of a VTK object
+            (an algorithm or a render window). Output: the VTK object. """
+        start = [0.]
+
+        def on_start(obj, event):
+            start[0] = time.perf_counter()
+
+        def on_end(obj, event):
+            self.timings.append((stage, time.perf_counter() - start[0]))
+
+        vtk_object.AddObserver('StartEvent', on_start)
+        vtk_object.AddObserver('EndEvent', on_end)
+        return vtk_object
+
+    def reset(self):
+        """ Forget the recorded timings. """
+        self.timings = []
+
+    def summary(self):
+        """ The total time (sec) and the number of executions per stage. """
+        totals = {}
+        for stage, seconds in self.timings:
+            total, count = totals.get(stage, (0., 0))
+            totals[stage] = (total + seconds, count + 1)
+        return totals
+
+    def __str__(self):
+        return ' '.join('%s=%.3fs(%d)' %(stage, total, count) for stage, (total, count) in self.summary().items())
+
+
+# the timer of the stages of all pipelines of the process
+TIMER = StageTimer()
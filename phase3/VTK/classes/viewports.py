@@ -18,15 +18,31 @@
 
 """
 Phase 3: The volume visualisations.
+- The volume viewports share one volume (mapper and property)
+- The sagittal, coronal and transverse viewports are 2D slices of the same
+  image, with a linked cursor: click in a slice to move the cursor, scroll
+  to move through the slices
 """
 
 import vtk
 
+from classes.mapper import Mapper
+from classes.timer import TIMER
+
+
+# the axis of the slices of a viewport (x: sagittal, y: coronal, z: transverse)
+SLICE_AXES = {"Sagittal view": 0, "Coronal view": 1, "Transverse view": 2}
+# the view up of the camera of the slices per axis
+SLICE_VIEWUP = [(0, 0, 1), (0, 0, 1), (0, 1, 0)]
+# the color of the cursor
+CURSOR_COLOR = (0.9300, 0.5700, 0.1300)
+
 
 class Viewports():
     """ One render window, multiple viewports.
         This class defines how many viewport at the same time are visible
-        for the user. Each viewport works independently of another. """
+        for the user. The volume viewports share one volume, the slice
+        viewports share one cursor. """
 
     def __init__(self, reader):
 
@@ -42,12 +58,26 @@ class Viewports():
         self.ymins=[0,0,.5,.5]
         self.ymaxs=[0.5,0.5,1,1]
 
-    def view(self, iren_list, PATH=None, save_img = False):
-        """ The requirements for the visualisation. """
+        # the volume of the volume viewports (made once)
+        self.volume = None
+        # the slices: list of (renderer, axis, slice mapper, cursor lines)
+        self.slices = []
+        # the cursor (voxel index x, y, z), and the cursor in the volume
+        self.cursor = None
+        self.cursor3d = None
+
+    def view(self, iren_list, PATH=None, save_img = False, filename=None, offscreen=False, mapper='auto'):
+        """ The requirements for the visualisation. Offscreen the image is
+            only saved (with the filename), without a window and interaction.
+            The mapper is the backend of the volume rendering (auto, gpu,
+            fixedpoint, smart). """
 
         self.iren_list = iren_list
         self.path = PATH
         self.save_img = save_img
+        self.filename = filename
+        self.offscreen = offscreen
+        self.mapper = Mapper(mapper)
 
         self.start_pipeline()
         self.iterate()
@@ -58,9 +88,35 @@ class Viewports():
 
         # for the start of the visualisation
         self.renWin = vtk.vtkRenderWindow()
-        self.iren = vtk.vtkRenderWindowInteractor()
+        TIMER.observe(self.renWin, 'render')
+        if self.offscreen == True:
+            self.renWin.SetOffScreenRendering(1)
+            self.iren = vtk.vtkGenericRenderWindowInteractor()
+        else:
+            self.iren = vtk.vtkRenderWindowInteractor()
+            # click in a slice to move the cursor, and scroll through the
+            # slices; the volume viewports rotate as before
+            style = vtk.vtkInteractorStyleTrackballCamera()
+            style.AddObserver('LeftButtonPressEvent', self.left_button_press)
+            style.AddObserver('MouseWheelForwardEvent', self.mouse_wheel)
+            style.AddObserver('MouseWheelBackwardEvent', self.mouse_wheel)
+            self.iren.SetInteractorStyle(style)
         self.iren.SetRenderWindow(self.renWin)
 
+        # the volume mappers of the render window, with its frame times
+        self.mapper.setup(self.renWin, self.iren)
+
+        # the geometry of the image (the whole image is read once, the slices
+        # only show a part of it); the cursor starts in the center
+        self.reader.Update()
+        image = self.reader.GetOutput()
+        self.extent = image.GetExtent()
+        self.spacing = image.GetSpacing()
+        self.origin = image.GetOrigin()
+        self.bounds = image.GetBounds()
+        self.scalar_range = image.GetScalarRange()
+        self.cursor = [(self.extent[2*axis] + self.extent[2*axis+1]) // 2 for axis in range(3)]
+
     def iterate(self):
         """ iterate over the viewports. """
 
@@ -76,19 +132,22 @@ class Viewports():
             self.renWin.SetSize(600, 600)
             self.ren.SetViewport(self.xmins[i],self.ymins[i],self.xmaxs[i],self.ymaxs[i])
 
-            # show volume
-            self.generate_renderer()
+            # show the slice or the volume
+            if self.iren_list[i] in SLICE_AXES:
+                self.generate_slice(SLICE_AXES[self.iren_list[i]])
+            else:
+                self.generate_renderer()
 
             # show text
             self.show_text(i)
 
-    def generate_renderer(self):
-        """ Generate the renderer. """
+        self.set_cursor(self.cursor)
+
+    def generate_volume(self):
+        """ Generate the volume, which is shared by the volume viewports. """
 
-        # volume ray cast mapper
-        volumeMapper = vtk.vtkGPUVolumeRayCastMapper()
-        volumeMapper.SetInputConnection(self.reader.GetOutputPort())
-        volumeMapper.SetBlendModeToComposite()
+        # volume mapper of the backend
+        volumeMapper = self.mapper.new_mapper(self.reader.GetOutputPort())
 
         # color transfer function
         volumeCTF = vtk.vtkColorTransferFunction()
@@ -121,10 +180,29 @@ class Viewports():
         volume = vtk.vtkVolume()
         volume.SetMapper(volumeMapper)
         volume.SetProperty(volumeProperty)
+        return volume
+
+    def generate_renderer(self):
+        """ Generate the renderer of the volume, with the cursor. """
+
+        if self.volume is None:
+            self.volume = self.generate_volume()
+        if self.cursor3d is None:
+            self.cursor3d = vtk.vtkCursor3D()
+            self.cursor3d.SetModelBounds(self.bounds)
+            self.cursor3d.AllOff()
+            self.cursor3d.AxesOn()
+
+        cursorMapper = vtk.vtkPolyDataMapper()
+        cursorMapper.SetInputConnection(self.cursor3d.GetOutputPort())
+        cursor = vtk.vtkActor()
+        cursor.SetMapper(cursorMapper)
+        cursor.GetProperty().SetColor(CURSOR_COLOR)
 
         # visualise volume
-        self.ren.AddViewProp(volume)
-        self.ren.ResetCamera()
+        self.ren.AddViewProp(self.volume)
+        self.ren.AddViewProp(cursor)
+        self.ren.ResetCamera(self.bounds)
 
         # change start position orientation of 3D image
         self.ren.GetActiveCamera().Elevation(-180)
@@ -134,13 +212,125 @@ class Viewports():
         # camera movements and clipping planes
         self.ren.ResetCameraClippingRange()
 
+    def generate_slice(self, axis):
+        """ Generate the renderer of the slices along an axis (x: sagittal,
+            y: coronal, z: transverse), with the lines of the cursor. """
+
+        # the slice of the image (without a copy of the image)
+        sliceMapper = vtk.vtkImageSliceMapper()
+        sliceMapper.SetInputConnection(self.reader.GetOutputPort())
+        sliceMapper.SetOrientation(axis)
+
+        imageSlice = vtk.vtkImageSlice()
+        imageSlice.SetMapper(sliceMapper)
+        imageSlice.GetProperty().SetColorWindow(self.scalar_range[1] - self.scalar_range[0])
+        imageSlice.GetProperty().SetColorLevel((self.scalar_range[1] + self.scalar_range[0]) / 2.)
+        imageSlice.GetProperty().SetInterpolationTypeToNearest()
+        self.ren.AddViewProp(imageSlice)
+
+        # the lines of the cursor along the two other axes
+        lines = []
+        for line_axis in range(3):
+            if line_axis == axis:
+                continue
+            line = vtk.vtkLineSource()
+            lineMapper = vtk.vtkPolyDataMapper()
+            lineMapper.SetInputConnection(line.GetOutputPort())
+            lineActor = vtk.vtkActor()
+            lineActor.SetMapper(lineMapper)
+            lineActor.GetProperty().SetColor(CURSOR_COLOR)
+            lineActor.GetProperty().LightingOff()
+            lineActor.GetProperty().SetLineWidth(2)
+            self.ren.AddViewProp(lineActor)
+            lines.append((line_axis, line))
+
+        # the camera looks along the axis, without perspective
+        camera = self.ren.GetActiveCamera()
+        camera.ParallelProjectionOn()
+        focal_point = [(self.bounds[2*i] + self.bounds[2*i+1]) / 2. for i in range(3)]
+        position = list(focal_point)
+        position[axis] += 1.
+        camera.SetFocalPoint(focal_point)
+        camera.SetPosition(position)
+        camera.SetViewUp(SLICE_VIEWUP[axis])
+        self.ren.ResetCamera(self.bounds)
+
+        self.slices.append((self.ren, axis, sliceMapper, lines))
+
+    def set_cursor(self, cursor):
+        """ Move the cursor (voxel index x, y, z) in all viewports: the
+            slices and the lines of the cursor. """
+        self.cursor = [min(max(int(cursor[axis]), self.extent[2*axis]), self.extent[2*axis+1])
+                       for axis in range(3)]
+        position = [self.origin[axis] + self.cursor[axis] * self.spacing[axis] for axis in range(3)]
+
+        for renderer, axis, sliceMapper, lines in self.slices:
+            sliceMapper.SetSliceNumber(self.cursor[axis])
+            for line_axis, line in lines:
+                # the line lies in the slice, a bit in front of it
+                point1, point2 = list(position), list(position)
+                point1[line_axis] = self.bounds[2*line_axis]
+                point2[line_axis] = self.bounds[2*line_axis+1]
+                point1[axis] = point2[axis] = position[axis] + self.spacing[axis] / 2.
+                line.SetPoint1(point1)
+                line.SetPoint2(point2)
+
+        if self.cursor3d is not None:
+            self.cursor3d.SetFocalPoint(position)
+
+    def get_slice(self):
+        """ The slice (renderer, axis, slice mapper, lines) under the mouse,
+            or None for the other viewports. """
+        x, y = self.iren.GetEventPosition()
+        renderer = self.iren.FindPokedRenderer(x, y)
+        for item in self.slices:
+            if item[0] is renderer:
+                return item
+        return None
+
+    def left_button_press(self, style, event):
+        """ Move the cursor to the clicked voxel of a slice; rotate the
+            other viewports. """
+        item = self.get_slice()
+        if item is None:
+            style.OnLeftButtonDown()
+            return
+
+        renderer, axis = item[0], item[1]
+        x, y = self.iren.GetEventPosition()
+        renderer.SetDisplayPoint(x, y, 0)
+        renderer.DisplayToWorld()
+        world = renderer.GetWorldPoint()
+        cursor = list(self.cursor)
+        for i in range(3):
+            if i != axis:
+                cursor[i] = round((world[i] / world[3] - self.origin[i]) / self.spacing[i])
+        self.set_cursor(cursor)
+        self.renWin.Render()
+
+    def mouse_wheel(self, style, event):
+        """ Move through the slices of a slice viewport; zoom in the other
+            viewports. """
+        item = self.get_slice()
+        if item is None:
+            if event == 'MouseWheelForwardEvent':
+                style.OnMouseWheelForward()
+            else:
+                style.OnMouseWheelBackward()
+            return
+
+        cursor = list(self.cursor)
+        cursor[item[1]] += 1 if event == 'MouseWheelForwardEvent' else -1
+        self.set_cursor(cursor)
+        self.renWin.Render()
+
     def show_text(self, image):
         """ Show the text in the corner of the viewports. """
         textActor = vtk.vtkTextActor()
         textActor.SetInput(self.iren_list[image])
         textActor.SetPosition2(10,40)
         textActor.GetTextProperty().SetFontSize(24)
-        self.ren.AddActor2D(textActor)
+        self.ren.AddViewProp(textActor)
 
     def end_pipeline(self):
         """ The end of the pipeline. """
@@ -162,20 +352,36 @@ class Viewports():
                 widget.InteractiveOn();
 
             self.renWin.Render()
+            self.save_image()
 
-            windowToImageFilter = vtk.vtkWindowToImageFilter()
-            windowToImageFilter.SetInput(self.renWin)
-            windowToImageFilter.SetInputBufferTypeToRGBA()
-            windowToImageFilter.ReadFrontBufferOff()
-            windowToImageFilter.Update()
+        # the time of the stages of the pipeline until the first frames
+        print('timings:', TIMER)
+        print('mapper:', self.mapper)
 
-            # save the file
-            text = str(input("Enter the name of the file: "))
-            writer = vtk.vtkPNGWriter()
-            writer.SetFileName(self.path + '/' + text + ".png")
-            writer.SetInputConnection(windowToImageFilter.GetOutputPort())
-            writer.Write()
+        if self.offscreen == True:
+            self.renWin.Finalize()
+            return
 
         self.renWin.Render()
         self.iren.Initialize()
         self.iren.Start()
+        print('mapper:', self.mapper)
+
+    def save_image(self):
+        """ Save the render window as png; the name of the file is asked
+            when it is not given. """
+        windowToImageFilter = vtk.vtkWindowToImageFilter()
+        windowToImageFilter.SetInput(self.renWin)
+        windowToImageFilter.SetInputBufferTypeToRGBA()
+        windowToImageFilter.ReadFrontBufferOff()
+        windowToImageFilter.Update()
+
+        # save the file
+        if self.filename is not None:
+            text = self.filename
+        else:
+            text = str(input("Enter the name of the file: "))
+        writer = vtk.vtkPNGWriter()
+        writer.SetFileName(self.path + '/' + text + ".png")
+        writer.SetInputConnection(windowToImageFilter.GetOutputPort())
+        writer.Write()
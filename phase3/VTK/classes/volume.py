@@ -22,6 +22,9 @@ Phase 3: The volume visualisations.
 
 import vtk
 
+from classes.mapper import Mapper
+from classes.timer import TIMER
+
 
 class Volume():
     """
@@ -33,9 +36,18 @@ class Volume():
         # the reader which will be rendered as a volume
         self.reader = 0
 
-    def pipeline_volume(self, reader, PATH=None, save_img = False, planes = False):
+    def pipeline_volume(self, reader, PATH=None, save_img = False, planes = False, filename=None,
+                        offscreen=False, bounds=None, mapper='auto', surface=False, camera=None, size=(600, 600)):
         """ The start of the pipeline of several volume visualisations.
-            Either render the volume (True) or render the planes (False). """
+            Either render the volume (True) or render the planes (False).
+            With surface the reader is a surface (polydata), which is
+            rendered instead of the volume.
+            Offscreen the image is only saved (with the filename), without
+            a window and interaction. The mapper is the backend of the
+            volume rendering (auto, gpu, fixedpoint, smart). The camera
+            turns the start position further, e.g. {'azimuth': 30, 'zoom': 1.5}
+            (azimuth, elevation, roll in degrees, and zoom). The size is the
+            size of the render window (pixels). """
 
         # the reader which will be rendered as a volume
         self.reader = reader
@@ -43,6 +55,12 @@ class Volume():
         self.path = PATH
         self.planes = planes
         self.save_img = save_img
+        self.filename = filename
+        self.offscreen = offscreen
+        # the bounds of the camera (e.g. of the whole image when it is cropped)
+        self.bounds = bounds
+        self.surface = surface
+        self.camera = camera if camera is not None else {}
 
         # render the background
         self.ren = vtk.vtkRenderer()
@@ -53,26 +71,42 @@ class Volume():
         # the renderwindow
         self.renWin = vtk.vtkRenderWindow()
         self.renWin.AddRenderer(self.ren)
-        self.renWin.SetSize(600, 600)
-
-        self.iren = vtk.vtkRenderWindowInteractor()
+        self.renWin.SetSize(*size)
+        TIMER.observe(self.renWin, 'render')
+        if self.offscreen == True:
+            self.renWin.SetOffScreenRendering(1)
+            self.iren = vtk.vtkGenericRenderWindowInteractor()
+        else:
+            self.iren = vtk.vtkRenderWindowInteractor()
         self.iren.SetRenderWindow(self.renWin)
 
+        # the volume mapper of the render window, with its frame times
+        self.mapper = Mapper(mapper)
+        self.mapper.setup(self.renWin, self.iren)
+
         # whether to load the planes or not
-        self.render_volume()
+        if self.surface == True:
+            self.render_surface()
+        else:
+            self.render_volume()
         if self.planes == True:
             self.render_planes()
 
-        # The end of the pipeline
-        self.iren.Start()
+        # the time of the stages of the pipeline until the first frames
+        print('timings:', TIMER)
+        print('mapper:', self.mapper)
+
+        # The end of the pipeline (offscreen the window stays available,
+        # e.g. for more frames)
+        if self.offscreen == False:
+            self.iren.Start()
+            print('mapper:', self.mapper)
 
     def render_volume(self):
         """ Render the volume. """
 
-        # volume ray cast mapper
-        volumeMapper = vtk.vtkGPUVolumeRayCastMapper()
-        volumeMapper.SetInputConnection(self.reader.GetOutputPort())
-        volumeMapper.SetBlendModeToComposite()
+        # volume mapper of the backend
+        volumeMapper = self.mapper.new_mapper(self.reader.GetOutputPort())
 
         # color transfer function
         volumeCTF = vtk.vtkColorTransferFunction()
@@ -107,14 +141,47 @@ class Volume():
         volume.SetProperty(volumeProperty)
 
         # visualise volume
-        self.ren.AddViewProp(volume)
-        self.ren.ResetCamera()
+        self.show(volume)
+
+    def render_surface(self):
+        """ Render the surface, in the color of the volume. """
+
+        surfaceMapper = vtk.vtkPolyDataMapper()
+        surfaceMapper.SetInputConnection(self.reader.GetOutputPort())
+        surfaceMapper.ScalarVisibilityOff()
+
+        surface = vtk.vtkActor()
+        surface.SetMapper(surfaceMapper)
+        surface.GetProperty().SetColor(1.0, 0.5, 0.3)
+        surface.GetProperty().SetAmbient(0.2)
+        surface.GetProperty().SetDiffuse(0.7)
+        surface.GetProperty().SetSpecular(0.2)
+        surface.GetProperty().SetSpecularPower(20)
+
+        # visualise surface
+        self.show(surface)
+
+    def show(self, prop):
+        """ Show the volume or surface with the start position of the
+            camera, and save the image. """
+        self.ren.AddViewProp(prop)
+        if self.bounds is not None:
+            self.ren.ResetCamera(self.bounds)
+        else:
+            self.ren.ResetCamera()
 
         # change start position orientation of 3D image
         self.ren.GetActiveCamera().Elevation(-180)
         self.ren.GetActiveCamera().Roll(70)
         self.ren.GetActiveCamera().Azimuth(-25)
 
+        # the requested camera movements
+        self.ren.GetActiveCamera().Azimuth(self.camera.get('azimuth', 0))
+        self.ren.GetActiveCamera().Elevation(self.camera.get('elevation', 0))
+        self.ren.GetActiveCamera().Roll(self.camera.get('roll', 0))
+        self.ren.GetActiveCamera().Zoom(self.camera.get('zoom', 1))
+        self.ren.GetActiveCamera().OrthogonalizeViewUp()
+
         # camera movements and clipping planes
         self.ren.ResetCameraClippingRange()
 
@@ -133,24 +200,35 @@ class Volume():
             widget.InteractiveOn();
 
             self.renWin.Render()
+            self.save_image()
 
-            windowToImageFilter = vtk.vtkWindowToImageFilter()
-            windowToImageFilter.SetInput(self.renWin)
-            windowToImageFilter.SetInputBufferTypeToRGBA()
-            windowToImageFilter.ReadFrontBufferOff()
-            windowToImageFilter.Update()
-
-            # save the file
-            text = str(input("Enter the name of the file: "))
-            writer = vtk.vtkPNGWriter()
-            writer.SetFileName(self.path + '/' + text + ".png")
-            writer.SetInputConnection(windowToImageFilter.GetOutputPort())
-            writer.Write()
+        # offscreen the saved image is the last frame
+        if self.offscreen == True:
+            return
 
         self.renWin.Render()
         self.iren.Initialize()
         # self.iren.Start() #complete pipeline
 
+    def save_image(self):
+        """ Save the render window as png; the name of the file is asked
+            when it is not given. """
+        windowToImageFilter = vtk.vtkWindowToImageFilter()
+        windowToImageFilter.SetInput(self.renWin)
+        windowToImageFilter.SetInputBufferTypeToRGBA()
+        windowToImageFilter.ReadFrontBufferOff()
+        windowToImageFilter.Update()
+
+        # save the file
+        if self.filename is not None:
+            text = self.filename
+        else:
+            text = str(input("Enter the name of the file: "))
+        writer = vtk.vtkPNGWriter()
+        writer.SetFileName(self.path + '/' + text + ".png")
+        writer.SetInputConnection(windowToImageFilter.GetOutputPort())
+        writer.Write()
+
 
     def render_planes(self):
         """ Render the volume with 2D planes in sagittal, axial,
@@ -159,7 +237,6 @@ class Volume():
         # create outline which provides context around the data
         outlineData = vtk.vtkOutlineFilter()
         outlineData.SetInputConnection(self.reader.GetOutputPort())
-        outlineData.Update()
 
         mapOutline = vtk.vtkPolyDataMapper()
         mapOutline.SetInputConnection(outlineData.GetOutputPort())
@@ -197,7 +274,6 @@ class Volume():
         sagittalColors = vtk.vtkImageMapToColors()
         sagittalColors.SetInputConnection(self.reader.GetOutputPort())
         sagittalColors.SetLookupTable(bwLut)
-        sagittalColors.Update()
 
         sagittal = vtk.vtkImageActor()
         sagittal.GetMapper().SetInputConnection(sagittalColors.GetOutputPort())
@@ -209,7 +285,6 @@ class Volume():
         axialColors = vtk.vtkImageMapToColors()
         axialColors.SetInputConnection(self.reader.GetOutputPort())
         axialColors.SetLookupTable(hueLut)
-        axialColors.Update()
 
         axial = vtk.vtkImageActor()
         axial.GetMapper().SetInputConnection(axialColors.GetOutputPort())
@@ -220,7 +295,6 @@ class Volume():
         coronalColors = vtk.vtkImageMapToColors()
         coronalColors.SetInputConnection(self.reader.GetOutputPort())
         coronalColors.SetLookupTable(satLut)
-        coronalColors.Update()
 
         coronal = vtk.vtkImageActor()
         coronal.GetMapper().SetInputConnection(coronalColors.GetOutputPort())
@@ -23,6 +23,8 @@ Phase 3: The volume visualisations.
 import os
 import pickle
 
+from helpers.store import load_volume
+
 
 """ Create folders. """
 def create_folder(PATH):
@@ -80,6 +82,21 @@ def load_unet_model(PATH, datatype, simulation):
     print(datatype + '_unet_images' + simulation, "opened")
     return new_data
 
+def load_smoothed_image(PATH, dataset):
+    """ Load only the smoothed image of one dataset (from the store of the
+        smoothed images, with a memory map). """
+    volume, spacing = load_volume(PATH, 'smoothed_images', dataset)
+    print('smoothed image', dataset, "opened")
+    return volume
+
+def load_unet_image(PATH, datatype, simulation, key):
+    """ Load only one image of a simulation of the U-net model, e.g. the key
+        dataset3_relu_org1 (from the store of the simulation, with a memory
+        map). """
+    volume, spacing = load_volume(PATH, datatype + '_unet_images' + simulation, key)
+    print(datatype + '_unet_images' + simulation, key, "opened")
+    return volume
+
 
 """ Save functions. """
 def save_metadata(PATH, dataset, filename, datatype):
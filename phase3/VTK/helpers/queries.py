@@ -219,6 +219,52 @@ def query_function_simulation(question, default='1'):
         else:
             sys.stdout.write("Please respond with '1' until '6' ")
 
+def query_function_render(question, default='volume'):
+    """ How do you want to render the mask? """
+
+    prompt = " [volume/surface -- vo/su]"
+    volume = {'volume', 'vo', 'v', ''}
+    surface = {'surface', 'su', 's'}
+
+    while True:
+        sys.stdout.write(question + prompt)
+        # input returns the empty string for "enter"
+        choice = input().lower()
+        if default is not None and choice == '':
+            return default
+        elif choice in volume:
+            return 'volume'
+        elif choice in surface:
+            return 'surface'
+        else:
+            sys.stdout.write("Please respond with 'volume' or 'surface' ")
+
+def query_function_mapper(question, default='auto'):
+    """ Which volume mapper do you want? """
+
+    prompt = " [auto/gpu/fixedpoint/smart -- au/gp/fi/sm]"
+    auto = {'auto', 'au', 'a', ''}
+    gpu = {'gpu', 'gp', 'g'}
+    fixedpoint = {'fixedpoint', 'fi', 'f', 'cpu'}
+    smart = {'smart', 'sm', 's'}
+
+    while True:
+        sys.stdout.write(question + prompt)
+        # input returns the empty string for "enter"
+        choice = input().lower()
+        if default is not None and choice == '':
+            return default
+        elif choice in auto:
+            return 'auto'
+        elif choice in gpu:
+            return 'gpu'
+        elif choice in fixedpoint:
+            return 'fixedpoint'
+        elif choice in smart:
+            return 'smart'
+        else:
+            sys.stdout.write("Please respond with 'auto', 'gpu', 'fixedpoint', or 'smart' ")
+
 def query_function_saving(question, default='no'):
     """ Do you want to save the visualisation? """
 
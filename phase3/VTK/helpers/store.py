@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisation in VTK.
+# You can run this file to store many volumes in one indexed file, of which
+# each volume can be loaded on its own with a memory map.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+- The store of volumes: <name>.dat with the voxels of all volumes, and
+  <name>_index.pkl with per key the offset, shape, dtype and spacing
+- The stores are made once from the pickle files of the converted data
+"""
+
+import os
+import pickle
+import numpy as np
+
+
+# the version of the layout of a store: another version is made again
+VERSION = 1
+# the alignment (bytes) of the volumes in the data file
+ALIGNMENT = 64
+
+
+def get_filenames(PATH, name):
+    """ The data file and the index file of a store. """
+    return os.path.join(PATH, name + '.dat'), os.path.join(PATH, name + '_index.pkl')
+
+def write_store(PATH, name, volumes, spacings=None):
+    """ Write the volumes {key: array} in a store, with the spacings
+        {key: (x, y, z)} when they are known. The files are written under a
+        temporary name first (per process) and replaced at the end. """
+    datafile, indexfile = get_filenames(PATH, name)
+    suffix = '.' + str(os.getpid()) + '.tmp'
+
+    entries = {}
+    offset = 0
+    with open(datafile + suffix, 'wb') as f:
+        for key, volume in volumes.items():
+            volume = np.ascontiguousarray(volume)
+            f.write(b'\0' * (-offset % ALIGNMENT))
+            offset += -offset % ALIGNMENT
+            entries[key] = {'offset': offset, 'shape': volume.shape, 'dtype': volume.dtype.str,
+                            'spacing': None if spacings is None else spacings.get(key)}
+            f.write(volume.tobytes())
+            offset += volume.nbytes
+
+    with open(indexfile + suffix, 'wb') as f:
+        pickle.dump({'version': VERSION, 'entries': entries}, f)
+    os.replace(datafile + suffix, datafile)
+    os.replace(indexfile + suffix, indexfile)
+    print('store', name, 'created')
+
+def load_index(PATH, name):
+    """ Load the index of a store using pickle; None when there is no store
+        (of this version). """
+    try:
+        with open(get_filenames(PATH, name)[1], 'rb') as f:
+            index = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    return index if index.get('version') == VERSION else None
+
+def convert_pickle(PATH, name):
+    """ Make the store of a pickle file with a dictionary of volumes. """
+    with open(os.path.join(PATH, name + '.pkl'), 'rb') as f:
+        volumes = pickle.load(f)
+    write_store(PATH, name, volumes)
+    return load_index(PATH, name)
+
+def get_index(PATH, name):
+    """ The index of a store; the store is made from the pickle file when it
+        does not exist yet, or when the pickle file is newer. """
+    datafile, indexfile = get_filenames(PATH, name)
+    picklefile = os.path.join(PATH, name + '.pkl')
+    index = load_index(PATH, name)
+    if os.path.exists(picklefile) and (index is None or not os.path.exists(datafile)
+                                       or os.path.getmtime(picklefile) > os.path.getmtime(indexfile)):
+        index = convert_pickle(PATH, name)
+    if index is None:
+        raise FileNotFoundError("The store " + os.path.join(PATH, name) + " does not exist.")
+    return index
+
+def load_volume(PATH, name, key):
+    """ Load one volume of a store with a memory map (read-only): only the
+        voxels of the volume are read, when they are used.
+        Output: the volume and its spacing (or None). """
+    entry = get_index(PATH, name)['entries'][key]
+    volume = np.memmap(get_filenames(PATH, name)[0], dtype=np.dtype(entry['dtype']), mode='r',
+                       offset=entry['offset'], shape=entry['shape'])
+    return volume, entry['spacing']
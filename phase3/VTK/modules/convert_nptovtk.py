@@ -25,9 +25,31 @@ import vtk
 from vtk.util import numpy_support
 
 
-def numpy_array_as_vtk_image_data(source_numpy_array, metadata):
+# the number of rows (of x voxels) which are swapped at once in the in place flip
+FLIP_BLOCK = 4096
+
+
+def flip_inplace(array):
+    """ Flip the first two axes of a C-contiguous 3D array in place (like
+        np.flipud and np.fliplr together). Flipping both axes reverses the
+        order of the rows of x voxels, so the rows are swapped in blocks;
+        only one block is copied at the same time. """
+    rows = array.reshape(-1, array.shape[2])
+    n = len(rows)
+    for start in range(0, n // 2, FLIP_BLOCK):
+        stop = min(start + FLIP_BLOCK, n // 2)
+        top = rows[start:stop].copy()
+        rows[start:stop] = rows[n - stop:n - start][::-1]
+        rows[n - stop:n - start] = top[::-1]
+    return array
+
+def numpy_array_as_vtk_image_data(source_numpy_array, metadata, inplace=False):
     """ Convert a numpy dataset to vtk in order to visualise it in VTK.
         Note: Channels are flipped of the np.ndarray source.
+        The flipped voxels are put in one contiguous copy, or with inplace
+        True in the array itself (no copy, but the array is changed). VTK
+        uses the memory of that array (no deep copy); the array is kept
+        alive by the vtkImageData.
         The function returns vtk.vtkImageData. """
 
     # check datatype and dimension
@@ -62,15 +84,33 @@ def numpy_array_as_vtk_image_data(source_numpy_array, metadata):
 
     vtk_datatype = vtk_type_by_numpy_type[source_numpy_array.dtype.type]
 
-    source_numpy_array = np.flipud(source_numpy_array)
-    source_numpy_array = np.fliplr(source_numpy_array)
+    # flip the channels (the first two axes) in one contiguous array
+    # with the byte order of VTK
+    if inplace == True and source_numpy_array.flags['C_CONTIGUOUS'] and source_numpy_array.flags['WRITEABLE'] \
+            and source_numpy_array.dtype.isnative:
+        source_numpy_array = flip_inplace(source_numpy_array)
+    else:
+        source_numpy_array = np.ascontiguousarray(source_numpy_array[::-1, ::-1],
+                                                  dtype=source_numpy_array.dtype.newbyteorder('='))
 
-    depth_array = numpy_support.numpy_to_vtk(source_numpy_array.ravel(), deep=True, array_type=vtk_datatype)
+    depth_array = numpy_support.numpy_to_vtk(source_numpy_array.reshape(-1), deep=False, array_type=vtk_datatype)
     depth_array.SetNumberOfComponents(1)
     output_vtk_image.SetSpacing(spacing[0], spacing[1], spacing[2])
     output_vtk_image.SetOrigin(origin[0], origin[1], origin[2])
     output_vtk_image.SetExtent(extent[0], extent[1], extent[2], extent[3], extent[4], extent[5])
     output_vtk_image.GetPointData().SetScalars(depth_array)
 
+    # the owner of the memory stays alive with the image
+    output_vtk_image.numpy_array = source_numpy_array
+
     output_vtk_image.Modified()
     return output_vtk_image
+
+def vtk_image_data_as_numpy_array(vtk_image):
+    """ The voxels of a vtkImageData as numpy array (z, y, x), with the
+        channels flipped back like the source of numpy_array_as_vtk_image_data.
+        The array is a view on the memory of the image (no copy); the image
+        has to stay alive as long as the array is used. """
+    x, y, z = vtk_image.GetDimensions()
+    array = numpy_support.vtk_to_numpy(vtk_image.GetPointData().GetScalars())
+    return array.reshape(z, y, x)[::-1, ::-1]
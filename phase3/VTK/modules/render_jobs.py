@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisation in VTK.
+# You can run this file to load the images of a visualisation (a job) and to
+# render the jobs offscreen to PNG files, in parallel worker processes.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+- A job: the answers of the questions (visualise, dataset, image, model,
+  heuristic, activation, simulation)
+- Loading the images of a job, with a cache of the loaded images
+- Batch rendering offscreen: the jobs of a dataset in the same worker process
+- The masks can be rendered as volume or as surface (cached in
+  results_VTK_surface)
+"""
+
+import os
+import time
+import multiprocessing
+from functools import partial
+
+from classes.reader import Reader
+from classes.volume import Volume
+from classes.viewports import Viewports
+from classes.mask import Mask
+from classes.surface import Surface
+from classes.cache import LRUCache
+from classes.timer import TIMER
+from helpers.loadsave import *
+from modules.convert_nptovtk import numpy_array_as_vtk_image_data
+
+
+# Constants
+DATA_PATH = '../../datasets/'
+RESULTS_PATH = 'results_VTK'
+RESULTS_IMG_PATH = os.path.join(RESULTS_PATH, 'results_VTK_img')
+RESULTS_META_PATH =  os.path.join(RESULTS_PATH, 'results_VTK_metadata')
+RESULTS_SURFACE_PATH = os.path.join(RESULTS_PATH, 'results_VTK_surface')
+
+DATA_SMOOTHED_PATH = '../results_volumes/results_volumes_convert/convert_smoothed'
+DATA_HEURISTICS_PATH = '../../phase2a/results_heuristic_models/results_heuristics_img'
+DATA_UNET_PATH = '../results_volumes/results_volumes_convert/convert_unet'
+
+# the default answers of the questions (the default image depends on the visualisation)
+DEFAULT_JOB = {'visualise': 'volume', 'dataset': 'dataset1', 'model': 'ground_truth',
+               'heuristic': 'ws_semiauto', 'activation': 'relu', 'simulation': '1', 'render': 'volume'}
+DEFAULT_IMAGE = {'volume': 'crop_org', 'mask': 'org', 'tool': 'crop_org'}
+
+# the viewports of the tool
+TOOL_VIEWS = ["Sagittal view", "Transverse view", "Volume", "Coronal view"]
+
+# the loaded images of a worker process, which are kept warm across its jobs
+WORKER_CACHE = {}
+
+
+""" The jobs. """
+def get_job(**answers):
+    """ A job with the given answers, the other answers are the defaults. """
+    job = dict(DEFAULT_JOB)
+    job.update(answers)
+    job.setdefault('image', DEFAULT_IMAGE[job['visualise']])
+    return job
+
+def get_jobname(job):
+    """ The name of the image of a job, e.g. volume_dataset1_crop_org,
+        mask_dataset1_org_heuristic_ws_semiauto, mask_dataset1_org_unet_relu1
+        or mask_dataset1_org_ground_truth_surface. """
+    parts = [job['visualise'], job['dataset']]
+    if job['visualise'] == 'volume':
+        parts.append(job['image'])
+    elif job['visualise'] == 'mask':
+        parts += [job['image'], job['model']]
+        if job['model'] == 'heuristic':
+            parts.append(job['heuristic'])
+        elif job['model'] == 'unet':
+            parts.append(job['activation'] + job['simulation'])
+        if job['render'] == 'surface':
+            parts.append('surface')
+    return '_'.join(parts)
+
+
+""" Loading the images. """
+def cached(cache, key, function, *args):
+    """ The value of a key in the cache; it is computed with the function
+        when it is not in the cache (or there is no cache). """
+    if cache is None:
+        return function(*args)
+    if isinstance(cache, LRUCache):
+        return cache.load(key, function, *args)
+    if key not in cache:
+        cache[key] = function(*args)
+    return cache[key]
+
+def read_dicom(PATH):
+    """ Read a dicom directory or file. """
+    read = Reader()
+    read.input_image(PATH)
+    return read
+
+def read_frames(PATH):
+    """ Read a multi-frame dicom file (or the directory which contains it)
+        with all its frames; the vtkDICOMImageReader reads only the first
+        frame of such a file. """
+    read = Reader()
+    read.read_frames(PATH)
+    return read
+
+def read_volume(PATH, dataset, datatype, read_function=read_dicom):
+    """ Read the real original or cropped original image, and save its
+        metadata for other use (e.g. the smoothed image). """
+    read = read_function(PATH)
+    create_folder(RESULTS_PATH)
+    create_folder(RESULTS_META_PATH)
+    save_metadata(PATH=RESULTS_META_PATH, dataset=read.generate_metadata(), filename=dataset, datatype=datatype)
+    return read
+
+def get_metadata(dataset, cache=None):
+    """ The metadata of the cropped original image of a dataset; it is
+        generated when it has not been saved before. """
+    if os.path.exists(os.path.join(RESULTS_META_PATH, dataset + '_croporg.pkl')):
+        return cached(cache, ('metadata', dataset), load_metadata, RESULTS_META_PATH, dataset, 'croporg')
+    paths = import_paths(DATA_PATH, dataset)
+    return cached(cache, ('croporg', dataset), read_volume, paths['org'], dataset, 'croporg').generate_metadata()
+
+def load_smoothed(dataset, metadata):
+    """ The smoothed image of a dataset as vtk image. """
+    np_smoothed_img = load_smoothed_image(DATA_SMOOTHED_PATH, dataset)
+    return numpy_array_as_vtk_image_data(np_smoothed_img, metadata)
+
+def load_volume(job, cache=None):
+    """ The image of a volume job: the real original image, the cropped
+        original image or the cropped smoothed image. """
+    paths = import_paths(DATA_PATH, job['dataset'])
+    if job['image'] == 'real_org':
+        # the real original image is one multi-frame dicom file
+        return cached(cache, ('realorg', job['dataset']), read_volume, paths['realorg'], job['dataset'],
+                      'realorg', read_frames).reader
+    elif job['image'] == 'crop_org':
+        return cached(cache, ('croporg', job['dataset']), read_volume, paths['org'], job['dataset'],
+                      'croporg').reader
+    elif job['image'] == 'crop_smoothed':
+        metadata = get_metadata(job['dataset'], cache)
+        smoothed = cached(cache, ('smoothed', job['dataset']), load_smoothed, job['dataset'], metadata)
+        return Reader().cast_image(smoothed)
+    raise ValueError("The image " + str(job['image']) + " does not exist.")
+
+def get_unet_metadata(dataset, np_image, cache=None):
+    """ The metadata of the cropped original image with the dimensionality
+        of a U-net image. """
+    new_pixeldims = (np_image.shape[2], np_image.shape[1], np_image.shape[0])
+    new_extent = (0, np_image.shape[2]-1, 0, np_image.shape[1]-1, 0, np_image.shape[0]-1)
+    return dict(get_metadata(dataset, cache), ConstPixelDims=new_pixeldims, ConstExtent=new_extent)
+
+def get_unet_key(job):
+    """ The name of the U-net images of a mask job. """
+    return job['dataset'] + '_' + job['activation'] + '_' + job['image'] + job['simulation']
+
+def load_input_image(job, cache=None):
+    """ The input image of a mask job: the original or smoothed image, or the
+        input image of the U-net. """
+    read = Reader()
+    paths = import_paths(DATA_PATH, job['dataset'])
+
+    # the U-net input image
+    if job['model'] == 'unet':
+        key = get_unet_key(job)
+        np_input_image = cached(cache, ('unet', 'org', key), load_unet_image, DATA_UNET_PATH, 'org',
+                                job['simulation'], key)
+        metadata = get_unet_metadata(job['dataset'], np_input_image, cache)
+        return read.cast_image(numpy_array_as_vtk_image_data(np_input_image, metadata))
+
+    # the original or smoothed input image
+    if job['image'] == 'org':
+        croporg = cached(cache, ('croporg', job['dataset']), read_volume, paths['org'], job['dataset'],
+                         'croporg')
+        return read.cast_image(croporg.reader)
+    elif job['image'] == 'smoothed':
+        metadata = get_metadata(job['dataset'], cache)
+        smoothed = cached(cache, ('smoothed', job['dataset']), load_smoothed, job['dataset'], metadata)
+        return read.cast_image(smoothed)
+    raise ValueError("The image " + str(job['image']) + " does not exist.")
+
+def load_mask_image(job, cache=None):
+    """ The mask image (binary) of a mask job, without its input image. """
+    read = Reader()
+    paths = import_paths(DATA_PATH, job['dataset'])
+
+    # the ground truth mask images (binary)
+    if job['model'] == 'ground_truth':
+        groundtruth = cached(cache, ('gt', job['dataset']), read_dicom, paths['gt'])
+        return read.cast_image(groundtruth.reader)
+
+    # the heuristic segmentation mask images (binary)
+    elif job['model'] == 'heuristic':
+        metadata = get_metadata(job['dataset'], cache)
+        np_model = cached(cache, ('heuristic', job['dataset'], job['heuristic'], job['image']), load_heuristic_model,
+                          DATA_HEURISTICS_PATH, job['dataset'], job['heuristic'], job['image'])
+        return read.cast_image(numpy_array_as_vtk_image_data(np_model, metadata))
+
+    # the U-net mask images
+    elif job['model'] == 'unet':
+        key = get_unet_key(job)
+        np_mask_image = cached(cache, ('unet', 'pred', key), load_unet_image, DATA_UNET_PATH, 'pred',
+                               job['simulation'], key)
+        metadata = get_unet_metadata(job['dataset'], np_mask_image, cache)
+        return read.cast_image(numpy_array_as_vtk_image_data(np_mask_image, metadata))
+    raise ValueError("The model " + str(job['model']) + " does not exist.")
+
+def load_mask(job, cache=None):
+    """ The input image and the mask image of a mask job. """
+    return load_input_image(job, cache), load_mask_image(job, cache)
+
+def load_surface(job, cache=None):
+    """ The surface of the mask of a mask job; it is extracted when it is
+        not in the cache on disk. """
+    # only the mask: the input image is not rendered with the surface
+    mask_image = load_mask_image(job, cache)
+    create_folder(RESULTS_PATH)
+    create_folder(RESULTS_SURFACE_PATH)
+    return Surface(mask_image, RESULTS_SURFACE_PATH, get_jobname(job))
+
+def export_surface(job, filename, cache=None):
+    """ Export the surface of the mask of a mask job (.stl, .ply, .obj, .vtp). """
+    load_surface(job, cache).export(filename)
+
+def load_job(job, cache=None, crop=True):
+    """ The image which is rendered for a job: the volume, the masked image
+        (cropped to the bounding box of the mask) or the surface of the mask,
+        or the cropped original image of the tool. Output: the image and the
+        bounds of the camera (the bounds of the whole image when it is
+        cropped, otherwise None). """
+    if job['visualise'] == 'volume':
+        return load_volume(job, cache), None
+    elif job['visualise'] == 'mask' and job['render'] == 'surface':
+        surface = load_surface(job, cache)
+        return surface.output_surface, surface.bounds
+    elif job['visualise'] == 'mask':
+        input_image, mask_image = load_mask(job, cache)
+        mask = Mask(input_image, mask_image, crop=crop)
+        return mask.output_mask, mask.bounds
+    elif job['visualise'] == 'tool':
+        paths = import_paths(DATA_PATH, job['dataset'])
+        return cached(cache, ('croporg', job['dataset']), read_volume, paths['org'], job['dataset'],
+                      'croporg').reader, None
+    raise ValueError("The visualisation " + str(job['visualise']) + " does not exist.")
+
+
+""" Batch rendering. """
+def render_job(job, PATH, cache=None, mapper='auto', camera=None, filename=None):
+    """ Render a job offscreen and save it as PNG (the filename, or the name
+        of the job). The camera turns the volume (not the tool). The loaded
+        image of the job is kept in the cache too.
+        Output: the mapper of the render window, with its frame times. """
+    image, bounds = cached(cache, ('job', get_jobname(job)), load_job, job, cache)
+    if filename is None:
+        filename = get_jobname(job)
+    if job['visualise'] == 'tool':
+        viewports = Viewports(image)
+        viewports.view(TOOL_VIEWS, PATH=PATH, save_img=True, filename=filename, offscreen=True, mapper=mapper)
+        return viewports.mapper
+    volume = Volume()
+    volume.pipeline_volume(image, PATH=PATH, save_img=True, filename=filename, offscreen=True, bounds=bounds,
+                           mapper=mapper, surface=(job['render'] == 'surface'), camera=camera)
+    return volume.mapper
+
+def run_jobs(jobs, PATH, mapper='auto'):
+    """ Render the jobs of one dataset in a worker process; the loaded images
+        of the previous dataset are released first.
+        Output: list of (name of the job, status, runtime (sec), timings of
+        the stages and the frames of the mapper). """
+    WORKER_CACHE.clear()
+    results = []
+    for job in jobs:
+        TIMER.reset()
+        start = time.perf_counter()
+        try:
+            frames = render_job(job, PATH, WORKER_CACHE, mapper)
+            status = 'complete'
+        except Exception as error:
+            print(get_jobname(job), 'failed:', error)
+            status = 'failed'
+            frames = mapper
+        results.append((get_jobname(job), status, time.perf_counter() - start, '%s %s' %(TIMER, frames)))
+    return results
+
+def run_batch(jobs, PATH, processes=2, overwrite=False, mapper='auto'):
+    """ Render all jobs offscreen with a number of worker processes and the
+        mapper (auto, gpu, fixedpoint, smart). The jobs of a dataset go to
+        the same process, so its images are loaded once. Jobs of which the
+        PNG already exists are skipped (unless overwrite).
+        Output: list of (name of the job, status, runtime (sec), timings of
+        the stages and the frames of the mapper). """
+    todo = [job for job in jobs
+            if overwrite == True or not os.path.exists(os.path.join(PATH, get_jobname(job) + '.png'))]
+    print('jobs:', len(jobs), 'to render:', len(todo))
+
+    groups = {}
+    for job in todo:
+        groups.setdefault(job['dataset'], []).append(job)
+
+    if processes <= 1:
+        return [result for group in groups.values() for result in run_jobs(group, PATH, mapper)]
+
+    results = []
+    with multiprocessing.Pool(processes) as pool:
+        for group_results in pool.imap_unordered(partial(run_jobs, PATH=PATH, mapper=mapper), list(groups.values())):
+            for name, status, runtime, timings in group_results:
+                print('finished:', name, status, '%.1f sec' %runtime)
+            results += group_results
+    return results
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# This file is part of a program that is used to develop an objective way to
+# segment the fetus from ultrasound images, and to analyse the effectiveness of
+# using the resulting mask to produce an unobstructed visualisation of the fetus.
+# The research is organised in three phases: (1) noise reduction filters,
+# (2a) heuristic segmentation models, (2b) deep learning segmentation
+# approach (U-net), and (3) the volume visualisation. The program is developed
+# for the master Computational Science at the UvA from February to November 2020.
+#
+# This file contains code for the volume visualisation in VTK.
+# You can run this file to render requests with a long-running render
+# service, which keeps the recently used images in memory (warm), behind a
+# Unix socket.
+#
+# Made by Romy Meester
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+Phase 3: The volume visualisations.
+- A request: a json object with the answers of a job (visualise, dataset,
+  image, model, ...), and optionally the camera (azimuth, elevation, roll,
+  zoom), the output path of the PNG and the mapper
+- A response: a json object with the status, the output path, the time
+  (sec) and whether the images of the job were warm
+- The requests are rendered one after another (VTK is not thread-safe)
+"""
+
+import os
+import json
+import time
+import socket
+import socketserver
+
+from classes.cache import LRUCache, MEMORY_CAP
+from classes.timer import TIMER
+from helpers.loadsave import *
+from modules.render_jobs import *
+
+
+# Constants
+SOCKET_PATH = os.path.join(RESULTS_PATH, 'render_service.sock')
+# the keys of a request which are not answers of a job
+REQUEST_KEYS = ['camera', 'output', 'mapper', 'command']
+
+
+def get_request_job(request):
+    """ The job of a request. """
+    return get_job(**{key: value for key, value in request.items() if key not in REQUEST_KEYS})
+
+def handle_request(request, cache):
+    """ Render a request with the images in the cache (they are loaded when
+        they are not in the cache), and release the least recently used
+        images above the memory cap. Output: the response. """
+    start = time.perf_counter()
+    TIMER.reset()
+    try:
+        job = get_request_job(request)
+        output = request.get('output') or os.path.join(RESULTS_IMG_PATH, get_jobname(job) + '.png')
+        PATH, filename = os.path.split(os.path.splitext(output)[0])
+        PATH = PATH or '.'
+        create_folder(PATH)
+
+        warm = ('job', get_jobname(job)) in cache
+        frames = render_job(job, PATH, cache, request.get('mapper', 'auto'), request.get('camera'), filename)
+    except Exception as error:
+        return {'status': 'failed', 'error': str(error), 'time': time.perf_counter() - start}
+    finally:
+        released = cache.evict()
+        if len(released) > 0:
+            print('released:', released)
+    return {'status': 'complete', 'output': os.path.join(PATH, filename + '.png'), 'warm': warm,
+            'time': time.perf_counter() - start, 'timings': '%s %s' %(TIMER, frames)}
+
+
+""" The render service. """
+class RequestHandler(socketserver.StreamRequestHandler):
+    """ The requests of a connection: one json object per line, each line
+        is answered with the response (a json object). """
+
+    def handle(self):
+        for line in self.rfile:
+            request = json.loads(line.decode())
+            if request.get('command') == 'stop':
+                response = {'status': 'stopped'}
+                self.server.running = False
+            elif request.get('command') == 'status':
+                response = {'status': 'running', 'images': len(self.server.cache),
+                            'memory': self.server.cache.memory(), 'memory_cap': self.server.cache.memory_cap}
+            else:
+                response = handle_request(request, self.server.cache)
+                print(response)
+            self.wfile.write((json.dumps(response) + '\n').encode())
+            self.wfile.flush()
+
+def serve(PATH=SOCKET_PATH, memory_cap=MEMORY_CAP):
+    """ Start the render service on a Unix socket, until the stop command. """
+    create_folder(os.path.dirname(PATH))
+    if os.path.exists(PATH):
+        os.remove(PATH)
+
+    server = socketserver.UnixStreamServer(PATH, RequestHandler)
+    server.cache = LRUCache(memory_cap)
+    server.running = True
+    print('render service on:', PATH, 'memory cap: %d MB' %memory_cap)
+    try:
+        while server.running == True:
+            server.handle_request()
+    finally:
+        server.server_close()
+        os.remove(PATH)
+
+def send_request(request, PATH=SOCKET_PATH):
+    """ Send a request to the render service. Output: the response. """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(PATH)
+        client.sendall((json.dumps(request) + '\n').encode())
+        with client.makefile('rb') as f:
+            return json.loads(f.readline().decode())